@@ -2,39 +2,49 @@
 import csv
 import os
 import json
-from typing import List, Dict, Optional, Tuple
-from langchain_ollama import ChatOllama
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain.schema import BaseMessage
-from langchain_deepseek import ChatDeepSeek
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Dict, Optional, Tuple
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 import pprint
 
 # webtools
-from langchain.tools import Tool
-# from utils.serper_web_search import web_search
-from utils.pse_web_search import web_search
-from utils.url_scrapper import scrape_page
+# from utils.serper_web_search import get_web_search
+from utils.pse_web_search import get_web_search
+from utils.url_scrapper import scrape_page, fetch_html, html_to_markdown, page_cache_stats
+from utils.contact_extractor import find_contact
+from utils.content_reducer import reduce_content, chunk_content, estimate_tokens, pack_by_tokens
+from utils.llm_cache import LLM_STREAMING, CachedLLM, llm_cache_stats
+from utils.search_cache import search_cache_stats
+from utils.json_stream import JSONObjectStream
+from utils.llm_usage import format_cache_stats, format_usage, usage_path, write_usage
+from utils.telemetry import count, span
+from utils.llm_clients import get_chat_model
+from utils.rate_limit import get_provider_limiter
+from utils.dedup import COMPANY_INDEX_ENABLED, COMPANY_INDEX_PATH, CompanyIndex
 
 class CompanyExtractor:
-    def __init__(self, model_name: str, provider: str, api_key: Optional[str] = None):
-        self.llm = self._init_llm(provider, model_name, api_key)
+    def __init__(self, model_name: str, provider: str, api_key: Optional[str] = None,
+                 max_chunk_tokens: int = 6000, chunk_workers: int = 4, min_content_tokens: int = 20,
+                 max_batch_tokens: int = 6000, max_batch_companies: int = 10):
+        """
+        Pages are reduced and split into chunks of at most max_chunk_tokens (estimated) before
+        extraction, chunks of one page are extracted by up to chunk_workers parallel LLM calls.
+        Pages left with fewer than min_content_tokens after reduction are not sent to the LLM.
+        extract_emails() asks for the contacts of up to max_batch_companies companies, with at most
+        max_batch_tokens of content together, in one LLM call.
+        """
+        self.llm = CachedLLM(self._init_llm(provider, model_name, api_key), provider, model_name,
+                             rate_limiter=get_provider_limiter(provider))
+        self.max_chunk_tokens = max_chunk_tokens
+        self.chunk_workers = max(1, chunk_workers)
+        self.min_content_tokens = min_content_tokens
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_companies = max(1, max_batch_companies)
 
     def _init_llm(self, provider: str, model_name: str, api_key: Optional[str]):
-        if provider == "openai":
-            return ChatOpenAI(model=model_name, openai_api_key=api_key)
-        elif provider == "ollama":
-            return ChatOllama(model=model_name)
-        elif provider == "deepseek":
-            return ChatDeepSeek(model=model_name, api_key=api_key)
-        elif provider == "groq":
-            return ChatGroq(model=model_name, api_key=api_key)
-        elif provider == "google":
-            return ChatGoogleGenerativeAI(model=model_name,api_key=api_key)
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
+        return get_chat_model(provider, model_name, api_key)
 
     def _construct_prompt(self, url_content: str,industry:str,location:str) -> List[BaseMessage]:
         prompt = [
@@ -105,28 +115,135 @@ Here is the content to analyze:
 
         return prompt
 
-    def extract(self, url_content: str,industry: str,location: str) -> List[Dict[str, str]]:
-        messages = self._construct_prompt(url_content=url_content,industry=industry,location=location)
-        response = self.llm.invoke(messages)
-        print(f"LLM Extracted info: \n{response.content}\n")
-        try:
-            text = response.content
-            start, end = text.find('['), text.rfind(']') + 1
-            json_str = text[start:end] if start != -1 and end != 0 else text
-            companies = json.loads(json_str)
+    def _construct_batch_email_prompt(self, companies: List[Tuple[str, str]]) -> List[BaseMessage]:
+        sections = "\n\n".join(f"### C{number}: {name}\n{content}" for number, (name, content) in enumerate(companies, 1))
+        prompt = [
+            SystemMessage(content="You are a precise data extraction system that returns only valid JSON."),
+            HumanMessage(content=f"""
+Extract the business contact emails and phone numbers of several companies. The content below has one section per company, headed "### <id>: <company name>", with search result snippets or website content about that company.
 
-            for c in companies:
-                for k in ["name", "services/products", "phone", "email"]:
-                    c.setdefault(k, "")
+Instructions:
+- Use only the section of a company for its contact details, never details found in another company's section.
+- Prioritize extracting from the official company website or links that look like legitimate company sources.
+- If only partial info is found (e.g., "+1-303-699-****"), return an empty string "" instead.
+- Do not generate or guess any contact details. Use empty strings when a section has none.
+- Output only the business-relevant email and phone number for cold outreach.
 
-            return companies
-        except Exception as e:
-            print(f"Parsing error: {e}")
+Output Format: a JSON object with one entry per company id, for every id in the content:
+{{
+    "C1": {{"email": "example@company.com", "phone": "(555) 123-4567"}},
+    "C2": {{"email": "", "phone": ""}}
+}}
+
+Here is the content to analyze:
+
+{sections}
+""")
+        ]
+
+        return prompt
+
+    def extract(self, url_content: str, industry: str, location: str,
+                on_company: Optional[Callable[[Dict[str, str]], bool]] = None) -> List[Dict[str, str]]:
+        """
+        Extract the companies of a page (chunk). The answer is parsed object by object, so a
+        malformed or truncated entry only drops that company, not the whole page.
+
+        With on_company the answer is streamed and every company is handed to on_company as soon
+        as its JSON object is complete. on_company returns False to stop reading the stream.
+        """
+        messages = self._construct_prompt(url_content=url_content,industry=industry,location=location)
+        parser = JSONObjectStream()
+        companies, stopped = [], False
+        if on_company is None:
+            text = self.llm.invoke(messages, stage="extract").content
+            companies = [self._with_fields(company) for company in parser.feed(text)]
+        else:
+            pieces = []
+            stream = self.llm.stream(messages, stage="extract")
+            try:
+                for piece in stream:
+                    pieces.append(piece)
+                    for company in parser.feed(piece):
+                        companies.append(self._with_fields(company))
+                        if on_company(companies[-1]) is False:
+                            stopped = True
+                            break
+                    if stopped:
+                        break
+            finally:
+                stream.close()
+            text = "".join(pieces)
+        print(f"LLM Extracted info: \n{text}\n")
+        if not stopped:
+            parser.close()
+        if parser.dropped:
+            print(f"Parsing error: skipped {parser.dropped} malformed or truncated company entries")
+        return companies
+
+    @staticmethod
+    def _with_fields(company: Dict[str, str]) -> Dict[str, str]:
+        for k in ["name", "services/products", "phone", "email"]:
+            company.setdefault(k, "")
+        return company
+
+    def extract_page(self, url_content: str, industry: str, location: str,
+                     on_company: Optional[Callable[[Dict[str, str]], bool]] = None,
+                     stop: Optional[threading.Event] = None) -> List[Dict[str, str]]:
+        """
+        Reduce a scraped page, extract each token-bounded chunk (in parallel) and merge the results.
+        on_company streams the companies as in extract(); for pages split into several chunks it is
+        called from the chunk threads, before the results are merged.
+        Chunks not yet sent to the LLM are skipped once stop is set.
+        """
+        reduced = reduce_content(url_content)
+        tokens_before, tokens_after = estimate_tokens(url_content), estimate_tokens(reduced)
+        print(f"Content reduced from ~{tokens_before} to ~{tokens_after} tokens (saved ~{tokens_before - tokens_after})")
+        if tokens_after < self.min_content_tokens:
+            print("Skipping LLM extraction, nothing left to analyze")
             return []
 
+        def extract_chunk(chunk: str) -> List[Dict[str, str]]:
+            if stop is not None and stop.is_set():
+                return []
+            return self.extract(url_content=chunk, industry=industry, location=location, on_company=on_company)
+
+        chunks = chunk_content(reduced, self.max_chunk_tokens)
+        if len(chunks) == 1:
+            return extract_chunk(reduced)
+
+        print(f"Page split into {len(chunks)} chunks for extraction")
+        with ThreadPoolExecutor(max_workers=min(self.chunk_workers, len(chunks))) as executor:
+            results = list(executor.map(extract_chunk, chunks))
+        return self._merge_companies([company for companies in results for company in companies])
+
+    @staticmethod
+    def _merge_companies(companies: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Merge companies found in several chunks of the same page, filling in missing fields"""
+        merged = {}
+        for company in companies:
+            key = " ".join(str(company.get("name", "")).lower().split())
+            if not key:
+                continue
+            if key not in merged:
+                merged[key] = company
+                continue
+            for field, value in company.items():
+                if value and not merged[key].get(field):
+                    merged[key][field] = value
+        return list(merged.values())
+
     def extract_email(self, content: str, company_name: str) -> Tuple[str, str]:
+        # deterministic first pass, the LLM is only asked when it finds nothing or is ambiguous
+        email, phone = find_contact(content, company_name)
+        if email:
+            print(f"Pre-extracted email info for {company_name}: {email}, {phone}\n")
+            return email, phone
+        return self._llm_extract_email(content, company_name)
+
+    def _llm_extract_email(self, content: str, company_name: str, retry: bool = False) -> Tuple[str, str]:
         messages = self._construct_email_prompt(content, company_name)
-        response = self.llm.invoke(messages)
+        response = self.llm.invoke(messages, stage="extract_email", retry=retry)
         try:
             text = response.content
             # Extract the JSON part
@@ -139,6 +256,92 @@ Here is the content to analyze:
             print(f"Email extraction error for {company_name}: {e}")
             return "", ""
 
+    def extract_emails(self, companies: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """
+        Batched extract_email for a list of (company_name, content). Returns (email, phone) per company, in order.
+
+        Companies the deterministic pass cannot resolve are packed into groups of at most
+        max_batch_tokens / max_batch_companies and each group is extracted with a single LLM call.
+        A company missing from its group's answer, or given an email that is not in its own content,
+        is extracted again with a call of its own.
+        """
+        results = [("", "")] * len(companies)
+        pending = []
+        for index, (company_name, content) in enumerate(companies):
+            email, phone = find_contact(content, company_name)
+            if email:
+                print(f"Pre-extracted email info for {company_name}: {email}, {phone}\n")
+                results[index] = (email, phone)
+            else:
+                pending.append(index)
+
+        batches = pack_by_tokens(pending, lambda index: estimate_tokens(companies[index][1]),
+                                 self.max_batch_tokens, self.max_batch_companies)
+        if not batches:
+            return results
+
+        def extract_batch(batch: List[int]) -> Dict[int, Tuple[str, str]]:
+            # a failed call costs its own group (retried one by one below), not the other groups
+            try:
+                if len(batch) == 1:
+                    return {batch[0]: self._llm_extract_email(companies[batch[0]][1], companies[batch[0]][0])}
+                found = self._llm_extract_batch([companies[index] for index in batch])
+            except Exception as e:
+                print(f"Batched email extraction error for {len(batch)} companies: {e}")
+                return {}
+            return {index: found[position] for position, index in enumerate(batch) if position in found}
+
+        def extract_one(index: int) -> Tuple[str, str]:
+            company_name, content = companies[index]
+            try:
+                return self._llm_extract_email(content, company_name, retry=True)
+            except Exception as e:
+                print(f"Email extraction error for {company_name}: {e}")
+                return "", ""
+
+        with ThreadPoolExecutor(max_workers=min(self.chunk_workers, len(batches))) as executor:
+            for found in executor.map(extract_batch, batches):
+                for index, contact in found.items():
+                    results[index] = contact
+                    pending.remove(index)
+
+            if pending:
+                print(f"Batched email extraction gave no valid answer for {len(pending)} companies, extracting them one by one")
+                fallback = list(executor.map(extract_one, pending))
+                for index, contact in zip(pending, fallback):
+                    results[index] = contact
+        return results
+
+    def _llm_extract_batch(self, companies: List[Tuple[str, str]]) -> Dict[int, Tuple[str, str]]:
+        """One LLM call for several companies. Returns the valid answers by position in companies."""
+        messages = self._construct_batch_email_prompt(companies)
+        response = self.llm.invoke(messages, stage="extract_email_batch")
+        try:
+            text = response.content
+            start, end = text.find('{'), text.rfind('}') + 1
+            data = json.loads(text[start:end] if start != -1 and end != 0 else text)
+            if not isinstance(data, dict):
+                raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+        except Exception as e:
+            print(f"Batched email extraction error for {len(companies)} companies: {e}")
+            return {}
+
+        found = {}
+        for position, (company_name, content) in enumerate(companies):
+            entry = data.get(f"C{position + 1}")
+            if not isinstance(entry, dict):
+                continue
+            email, phone = entry.get("email") or "", entry.get("phone") or ""
+            if not isinstance(email, str) or not isinstance(phone, str):
+                continue
+            # an email that is not in the company's own section was mixed up with another company
+            if email and email.strip().lower() not in content.lower():
+                print(f"Batched email extraction returned {email} for {company_name}, not found in its content")
+                continue
+            found[position] = (email.strip(), phone.strip())
+        print(f"LLM Extracted email info for {len(found)}/{len(companies)} companies in one call\n")
+        return found
+
 
 class WebTools:
     @staticmethod
@@ -147,7 +350,7 @@ class WebTools:
         Simulated web search function that would be replaced with actual implementation
         Returns a list of dictionaries with title, url, and snippet
         """
-        results = web_search.run(query=query, exact_term=exact_term, start_page=start_page, end_page=end_page)
+        results = get_web_search().run(query=query, exact_term=exact_term, start_page=start_page, end_page=end_page)
         print(f"web search query: {query}")
         print("web search results:")
         pprint.pprint(results, indent=2, width=100)
@@ -165,19 +368,66 @@ class WebTools:
         # In a real implementation, this would scrape the actual URL
         return f"content for {url}:\n\n{md_text}."
 
+    @staticmethod
+    def scrape_url_with_html(url: str) -> Tuple[str, Optional[str]]:
+        """
+        Same as scrape_url but also returns the raw HTML (None if the fetch failed),
+        for callers that want to look at markup the markdown conversion strips (mailto/tel links, JSON-LD)
+        """
+        html_content = fetch_html(url)
+        md_text = html_to_markdown(html_content) if html_content is not None else ""
+        print(f"Converted htmlpage to markDown format for URL: {url}")
+        return f"content for {url}:\n\n{md_text}.", html_content
+
 
 class CompanyScraper:
-    def __init__(self, model_name: str, provider: str, api_key: Optional[str] = None):
+    def __init__(self, model_name: str, provider: str, api_key: Optional[str] = None,
+                 fetch_workers: int = 4, llm_workers: int = 2, email_workers: int = 4,
+                 company_index_path: Optional[str] = None, contact_batch_size: int = 10,
+                 stream_extraction: bool = LLM_STREAMING):
+        """
+        fetch_workers / llm_workers control the stage 1 pipeline: pages are downloaded by
+        fetch_workers threads and handed over a queue to llm_workers extraction threads.
+        email_workers is the number of companies enriched concurrently in stage 2.
+        Set all of them to 1 to process everything strictly one after another.
+
+        Stage 2 extracts the contacts of up to contact_batch_size companies from their search
+        snippets in one LLM call. contact_batch_size=1 makes one call per company.
+
+        With stream_extraction stage 1 answers are streamed: each company is written to the CSV
+        and counted as soon as the LLM has finished it, and the stream is cut once the target is reached.
+
+        Duplicate companies are always merged within a run. company_index_path (default:
+        COMPANY_INDEX_PATH when COMPANY_INDEX_ENABLED) also skips companies earlier campaigns collected.
+        """
         self.extractor = CompanyExtractor(model_name, provider, api_key)
         self.web_tools = WebTools()
         self.output_file = None
+        self.usage_file = None
         self.total_companies_with_email = 0
-
-    def run(self, industry: str, location: str, target_count: int) -> Tuple[str, int]:
+        self.fetch_workers = max(1, fetch_workers)
+        self.llm_workers = max(1, llm_workers)
+        self.email_workers = max(1, email_workers)
+        self.contact_batch_size = max(1, contact_batch_size)
+        self.stream_extraction = stream_extraction
+        self._counter_lock = threading.Lock()
+        self._remaining_needed = 0
+        self.company_index_path = company_index_path if company_index_path is not None else (COMPANY_INDEX_PATH if COMPANY_INDEX_ENABLED else None)
+        self.company_index = CompanyIndex()
+        self.duplicates_skipped = 0
+        self._written = set()  # ids of company records already written to the CSV
+        self._progress_callback = None
+        self._target_count = 0
+
+    def run(self, industry: str, location: str, target_count: int,
+            progress_callback: Optional[Callable[[int, int, str], None]] = None) -> Tuple[str, int]:
         """
-        Main orchestration function that runs the entire scraping pipeline
+        Main orchestration function that runs the entire scraping pipeline.
+        progress_callback(companies_with_email, target_count, message) is called as work completes.
         """
         print(f"Starting scraper for {industry} companies in {location}, targeting {target_count} companies")
+        self._progress_callback = progress_callback
+        self._target_count = target_count
         
         # Step 1: Create output CSV file
         output_dir= "extractions"
@@ -186,34 +436,23 @@ class CompanyScraper:
         output_file_name = f"company_data_{industry}_{location}_{timestamp}.csv"
         self.output_file = os.path.join(output_dir, output_file_name)
         self._initialize_csv()
+        self.company_index = CompanyIndex(self.company_index_path)
+        self.duplicates_skipped = 0
+        self._written = set()
+        self.extractor.llm.usage.reset()
+        cache_stats = self._cache_stats()
         
         # Step 2: Perform initial search
         end_page = max(1, int(target_count / 10))
         search_query = f"best {industry} in {location}" #------------------> adjust the search query
+        self._report_progress(f"Searching for {industry} companies in {location}...")
         search_results = self.web_tools.web_search(query = search_query,exact_term=location, start_page=1, end_page=end_page)
         
         # Step 3 & 4: Scrape URLs and extract company data
-        companies_data = []
-        for i,result in enumerate(search_results):
-            url = result["url"]
-            url_content = self.web_tools.scrape_url(url)
-            extracted_companies = self.extractor.extract(url_content =url_content,industry=industry,location=location)
-            companies_data.extend(extracted_companies)
-            
-            # Write email containing company data to CSV as we go
-            companies_with_email = [company for company in extracted_companies if company["name"] and company["email"]]
-            self._write_to_csv(companies_with_email)
-            
-            # Count companies with email
-            self.total_companies_with_email += sum(1 for company in extracted_companies if company["email"])
-
-            # print loop status
-            print(f"\r|------stage 1 ---> scraping web URL {i+1}/{len(search_results)}-----|",end="",flush=True)
-
-            # If we have enough companies with email, stop
-            if self.total_companies_with_email >= target_count:
-                print(f"\r|------stage 1 ---> process stopped early as reached target count : {self.total_companies_with_email}/{target_count} company emails-----|",end="",flush=True)
-                break
+        if self.fetch_workers == 1 and self.llm_workers == 1:
+            companies_data = self._scrape_sequential(search_results, industry, location, target_count)
+        else:
+            companies_data = self._scrape_pipeline(search_results, industry, location, target_count)
         
         # Step 5: Filter companies without email
         companies_missing_email = [company for company in companies_data if company["name"] and not company["email"]]
@@ -222,13 +461,189 @@ class CompanyScraper:
         remaining_needed = target_count - self.total_companies_with_email
         if remaining_needed > 0:
             print(f"Need {remaining_needed} more companies with email. Initializing stage 2 scrapping...")
+            self._report_progress(f"Looking up emails for {len(companies_missing_email)} companies found without one...")
             self._find_missing_emails(companies_missing_email, remaining_needed)
         
-        print(f"process completed. collected {self.total_companies_with_email} companies with email data collected")
+        self.company_index.close()
+        self._write_usage()
+        print(f"Cache use of this run:\n{format_cache_stats(cache_stats, self._cache_stats())}")
+        self._report_progress("Done")
+        print(f"process completed. collected {self.total_companies_with_email} companies with email data collected ({self.duplicates_skipped} duplicates skipped)")
 
         # Step 7: Return results
         return self.output_file, self.total_companies_with_email
 
+    @staticmethod
+    def _cache_stats() -> Dict[str, Dict[str, int]]:
+        return {"pages": page_cache_stats(), "search": search_cache_stats(), "llm": llm_cache_stats()}
+
+    def _write_usage(self):
+        """Write the LLM usage of this run next to the output CSV"""
+        summary = self.extractor.llm.usage.summary()
+        self.usage_file = usage_path(self.output_file)
+        write_usage(self.usage_file, summary)
+        print(f"\nLLM usage:\n{format_usage(summary)}")
+
+    def _scrape_sequential(self, search_results: List[Dict[str, str]], industry: str, location: str, target_count: int) -> List[Dict[str, str]]:
+        """Scrape and extract search results one URL at a time (stage 1)"""
+        companies_data = []
+        for i,result in enumerate(search_results):
+            url = result["url"]
+            url_content = self.web_tools.scrape_url(url)
+            if self.stream_extraction:
+                self.extractor.extract_page(url_content=url_content, industry=industry, location=location,
+                                            on_company=lambda company: self._record_streamed(company, companies_data, target_count))
+            else:
+                extracted_companies = self.extractor.extract_page(url_content =url_content,industry=industry,location=location)
+                self._record_extracted(extracted_companies, companies_data)
+
+            # print loop status
+            print(f"\r|------stage 1 ---> scraping web URL {i+1}/{len(search_results)}-----|",end="",flush=True)
+            self._report_progress(f"Scraped {i+1}/{len(search_results)} search results")
+
+            # If we have enough companies with email, stop
+            if self.total_companies_with_email >= target_count:
+                print(f"\r|------stage 1 ---> process stopped early as reached target count : {self.total_companies_with_email}/{target_count} company emails-----|",end="",flush=True)
+                break
+        return companies_data
+
+    def _scrape_pipeline(self, search_results: List[Dict[str, str]], industry: str, location: str, target_count: int) -> List[Dict[str, str]]:
+        """
+        Scrape and extract search results with overlapping page downloads and LLM calls (stage 1).
+
+        fetch workers pull URLs and push page content onto a bounded queue, llm workers pull
+        page content and push extracted companies onto a results queue. Results are consumed
+        here on the calling thread, so CSV writes and counting stay single threaded. Once the
+        target count is reached the stop event is set: queued pages are drained without an LLM
+        call, chunks not yet sent are skipped and results of calls still in flight are
+        discarded. With stream_extraction companies are queued one by
+        one while the LLM is still answering, and streams are cut as soon as stop is set.
+        """
+        url_queue = queue.Queue()
+        for i, result in enumerate(search_results):
+            url_queue.put((i, result["url"]))
+        content_queue = queue.Queue(maxsize=self.llm_workers * 2)
+        results_queue = queue.Queue()
+        stop = threading.Event()
+
+        def emit(company: Dict[str, str]) -> bool:
+            if stop.is_set():
+                return False
+            results_queue.put(([company], False))
+            return True
+
+        def fetch_worker():
+            while not stop.is_set():
+                try:
+                    i, url = url_queue.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    url_content = self.web_tools.scrape_url(url)
+                except Exception as e:
+                    print(f"Error scraping {url}: {e}")
+                    url_content = None
+                # block while the llm workers are busy, but give up as soon as we are stopped
+                while not stop.is_set():
+                    try:
+                        content_queue.put((i, url_content), timeout=0.2)
+                        break
+                    except queue.Full:
+                        continue
+
+        def llm_worker():
+            while not stop.is_set():
+                try:
+                    i, url_content = content_queue.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                if stop.is_set():
+                    return
+                extracted_companies = []
+                if url_content is not None:
+                    try:
+                        if self.stream_extraction:
+                            self.extractor.extract_page(url_content=url_content, industry=industry, location=location,
+                                                        on_company=emit, stop=stop)
+                        else:
+                            extracted_companies = self.extractor.extract_page(url_content=url_content, industry=industry,
+                                                                              location=location, stop=stop)
+                    except Exception as e:
+                        print(f"Extraction error for search result {i+1}: {e}")
+                if not stop.is_set():
+                    # (companies, page done)
+                    results_queue.put((extracted_companies, True))
+
+        workers = [threading.Thread(target=fetch_worker, daemon=True) for _ in range(min(self.fetch_workers, len(search_results)))]
+        workers += [threading.Thread(target=llm_worker, daemon=True) for _ in range(self.llm_workers)]
+        for worker in workers:
+            worker.start()
+
+        companies_data = []
+        try:
+            done = 0
+            while done < len(search_results):
+                extracted_companies, page_done = results_queue.get()
+                self._record_extracted(extracted_companies, companies_data)
+
+                # print loop status
+                if page_done:
+                    done += 1
+                    print(f"\r|------stage 1 ---> scraping web URL {done}/{len(search_results)}-----|",end="",flush=True)
+                    self._report_progress(f"Scraped {done}/{len(search_results)} search results")
+
+                # If we have enough companies with email, stop
+                if self.total_companies_with_email >= target_count:
+                    print(f"\r|------stage 1 ---> process stopped early as reached target count : {self.total_companies_with_email}/{target_count} company emails-----|",end="",flush=True)
+                    break
+        finally:
+            # cancel queued and in-flight work; workers are daemon threads and exit on their own
+            stop.set()
+            while True:
+                try:
+                    content_queue.get_nowait()
+                except queue.Empty:
+                    break
+        return companies_data
+
+    def _record_extracted(self, extracted_companies: List[Dict[str, str]], companies_data: List[Dict[str, str]]):
+        """
+        Collect extracted companies, write those with email to CSV and update the email counter.
+        Companies already seen on another page are merged into the first record instead of being
+        added again, companies collected by an earlier campaign are dropped.
+        """
+        companies_with_email = []
+        for company in extracted_companies:
+            if not company["name"]:
+                continue
+            record, status = self.company_index.add(company)
+            if status == CompanyIndex.KNOWN:
+                self.duplicates_skipped += 1
+                continue
+            if status == CompanyIndex.NEW:
+                companies_data.append(record)
+            else:
+                self.duplicates_skipped += 1
+            # a duplicate can bring the email its first record was missing
+            if record["email"] and id(record) not in self._written:
+                self._written.add(id(record))
+                companies_with_email.append(record)
+
+        # Write email containing company data to CSV as we go
+        self._write_to_csv(companies_with_email)
+
+        # Count companies with email
+        self.total_companies_with_email += len(companies_with_email)
+        count("companies_extracted", len(extracted_companies), stage="1")
+        count("companies_with_email", len(companies_with_email), stage="1")
+
+    def _record_streamed(self, company: Dict[str, str], companies_data: List[Dict[str, str]], target_count: int) -> bool:
+        """Record one streamed company, returns False once the target count is reached"""
+        # chunks of one page stream on parallel threads
+        with self._counter_lock:
+            self._record_extracted([company], companies_data)
+            return self.total_companies_with_email < target_count
+
     def _initialize_csv(self):
         """Initialize the CSV file with headers"""
         with open(self.output_file, 'w', newline='', encoding='utf-8') as f:
@@ -237,7 +652,9 @@ class CompanyScraper:
 
     def _write_to_csv(self, companies: List[Dict[str, str]]):
         """Write companies data to CSV file"""
-        with open(self.output_file, 'a', newline='', encoding='utf-8') as f:
+        for company in companies:
+            self.company_index.remember(company, campaign=self.output_file)
+        with span("csv_write", file="companies") as trace, open(self.output_file, 'a', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
             for company in companies:
                 writer.writerow([
@@ -246,61 +663,180 @@ class CompanyScraper:
                     company["email"],
                     company["phone"]
                 ])
+            trace.set(rows=len(companies))
 
     def _find_missing_emails(self, companies: List[Dict[str, str]], remaining_needed: int):
-        """Find emails for companies that are missing them (stage 2 extraction)"""
-        for i,company in enumerate(companies):
-            if remaining_needed <= 0:
-                print(f"\r|------stage 2 ---> process successfully completed----|",end="",flush=True)
-                break
-                
-            company_name = company["name"]
-            location = "location"  # You would need to pass location to this function in a real implementation
-            
-            search_query = f"{company_name} in {location} email phone"
-            search_results = self.web_tools.web_search(query=search_query, start_page=1, end_page=1)
-            
-            # change search result obj to llm processible string obj
-            combined_content = json.dumps(search_results,indent=2)
-            
-            # Extract email
-            print(f"\r|------stage 2 ---> processing company : {i+1}/{len(companies)}. parsing web search result for company name: {company_name}-----|",end="",flush=True)
-            email, phone = self.extractor.extract_email(combined_content, company_name)
-            
-            if email:
-                company["email"] = email
-                if phone and not company["phone"]:
-                    company["phone"] = phone
-                    
-                # Write updated company info to CSV
-                self._write_to_csv([company])
-                
-                # Update counter
-                self.total_companies_with_email += 1
-                remaining_needed -= 1
-                
-            # If email still not found, try scraping each URL
-            if not email and remaining_needed > 0:
-                top_n = 2 # -----------------> adjust top n value. default is 3 to search for top n urls
-                capped_search_results = search_results[:top_n]
-                for j,result in enumerate(capped_search_results): # ----------------->adjust top k results value. default is 3
-                    print(f"\r|------stage 2 ---> processing company : {i+1}/{len(companies)}.Email not found in search results. Executing deep URL search : {j+1}/{len(capped_search_results)} URLs -----|",end="",flush=True)
-                    content = self.web_tools.scrape_url(result["url"])
-                    email, phone = self.extractor.extract_email(content, company_name)
-                    
-                    if email:
-                        company["email"] = email
-                        if phone and not company["phone"]:
-                            company["phone"] = phone
-                        print(f"\r|------stage 2 ---> processing company : {i+1}/{len(companies)}. Deep URL search successfully completed and identified Email. -----|",end="",flush=True)    
-                        # Write updated company info to CSV
-                        self._write_to_csv([company])
-                        
-                        # Update counter
-                        self.total_companies_with_email += 1
-                        remaining_needed -= 1
+        """
+        Find emails for companies that are missing them (stage 2 extraction)
+
+        With email_workers > 1 companies are enriched concurrently. All workers share the
+        remaining_needed counter; once it hits zero, companies not yet started are cancelled
+        and running workers stop before their next search/LLM call.
+        """
+        self._remaining_needed = remaining_needed
+        total = len(companies)
+
+        if self.contact_batch_size > 1:
+            self._find_missing_emails_batched(companies)
+        elif self.email_workers == 1:
+            for i,company in enumerate(companies):
+                if self._target_reached():
+                    break
+                self._enrich_company(company, i, total)
+                self._report_progress(f"Looked up {i+1}/{total} companies without email")
+        else:
+            with ThreadPoolExecutor(max_workers=self.email_workers) as executor:
+                futures = {executor.submit(self._enrich_company, company, i, total): company for i,company in enumerate(companies)}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"Email enrichment error for {futures[future]['name']}: {e}")
+                    self._report_progress(f"Looked up {done}/{total} companies without email")
+                    if self._target_reached():
+                        for pending in futures:
+                            pending.cancel()
                         break
 
+        if self._target_reached():
+            print(f"\r|------stage 2 ---> process successfully completed----|",end="",flush=True)
+
+    def _find_missing_emails_batched(self, companies: List[Dict[str, str]]):
+        """
+        Stage 2 in waves: search a wave of companies concurrently, extract all their contacts from
+        the search snippets with batched LLM calls, then deep search the ones still without email.
+        A wave holds up to contact_batch_size companies, fewer when only a few more emails are needed.
+        """
+        total = len(companies)
+        start = 0
+        with ThreadPoolExecutor(max_workers=self.email_workers) as executor:
+            while start < total and not self._target_reached():
+                with self._counter_lock:
+                    wave_size = min(self.contact_batch_size, max(self.email_workers, self._remaining_needed))
+                wave = companies[start:start + wave_size]
+                # a company whose search failed is logged and left out, the rest of the wave goes on
+                searched = [(start + offset, company, results) for offset, (company, results)
+                            in enumerate(zip(wave, executor.map(self._search_company_safe, wave))) if results is not None]
+                if self._target_reached():
+                    break
+
+                print(f"\r|------stage 2 ---> processing companies : {start+1}-{start+len(wave)}/{total}. parsing web search results in batch-----|",end="",flush=True)
+                contacts = self.extractor.extract_emails([(company["name"], json.dumps(results, indent=2))
+                                                          for _, company, results in searched])
+                deep_searches = []
+                for (index, company, results), (email, phone) in zip(searched, contacts):
+                    if email:
+                        self._claim_email(company, email, phone)
+                    else:
+                        deep_searches.append(executor.submit(self._deep_search, company, results, index, total))
+                for future in deep_searches:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"Email enrichment error: {e}")
+
+                start += len(wave)
+                self._report_progress(f"Looked up {start}/{total} companies without email")
+
+    def _report_progress(self, message: str):
+        if self._progress_callback:
+            self._progress_callback(self.total_companies_with_email, self._target_count, message)
+
+    def _target_reached(self) -> bool:
+        with self._counter_lock:
+            return self._remaining_needed <= 0
+
+    def _claim_email(self, company: Dict[str, str], email: str, phone: str) -> bool:
+        """
+        Atomically record a found email against the remaining_needed counter.
+        Returns False (and records nothing) if the target was already reached by another worker.
+        """
+        with self._counter_lock:
+            if self._remaining_needed <= 0:
+                return False
+            company["email"] = email
+            if phone and not company["phone"]:
+                company["phone"] = phone
+
+            # the email can show this is a company we already have under another name
+            other, status = self.company_index.update(company)
+            if status == CompanyIndex.DUPLICATE and id(other) in self._written:
+                print(f"\n{company['name']} is a duplicate of {other['name']} ({email}), skipped")
+                self.duplicates_skipped += 1
+                return False
+            if status == CompanyIndex.KNOWN:
+                print(f"\n{company['name']} ({email}) was collected by an earlier campaign, skipped")
+                self.duplicates_skipped += 1
+                return False
+            self._written.add(id(company))
+
+            # Write updated company info to CSV
+            self._write_to_csv([company])
+
+            # Update counter
+            self.total_companies_with_email += 1
+            self._remaining_needed -= 1
+            count("companies_with_email", stage="2")
+            return True
+
+    def _search_company(self, company: Dict[str, str]) -> List[Dict[str, str]]:
+        """Web search results for a company's contact details"""
+        company_name = company["name"]
+        location = "location"  # You would need to pass location to this function in a real implementation
+
+        search_query = f"{company_name} in {location} email phone"
+        return self.web_tools.web_search(query=search_query, start_page=1, end_page=1)
+
+    def _search_company_safe(self, company: Dict[str, str]) -> Optional[List[Dict[str, str]]]:
+        """_search_company that logs a failed search and returns None instead of raising"""
+        try:
+            return self._search_company(company)
+        except Exception as e:
+            print(f"Email enrichment error for {company['name']}: {e}")
+            return None
+
+    def _enrich_company(self, company: Dict[str, str], i: int, total: int):
+        """Search the web for a single company's email, deep scraping the top results if needed"""
+        company_name = company["name"]
+        search_results = self._search_company(company)
+
+        # change search result obj to llm processible string obj
+        combined_content = json.dumps(search_results,indent=2)
+
+        # Extract email
+        if self._target_reached():
+            return
+        print(f"\r|------stage 2 ---> processing company : {i+1}/{total}. parsing web search result for company name: {company_name}-----|",end="",flush=True)
+        email, phone = self.extractor.extract_email(combined_content, company_name)
+        if email:
+            self._claim_email(company, email, phone)
+            return
+        self._deep_search(company, search_results, i, total)
+
+    def _deep_search(self, company: Dict[str, str], search_results: List[Dict[str, str]], i: int, total: int):
+        """Scrape the top search results of a company whose email was not in the snippets"""
+        company_name = company["name"]
+
+        # If email still not found, try scraping each URL
+        top_n = 2 # -----------------> adjust top n value. default is 3 to search for top n urls
+        capped_search_results = search_results[:top_n]
+        for j,result in enumerate(capped_search_results): # ----------------->adjust top k results value. default is 3
+            if self._target_reached():
+                return
+            print(f"\r|------stage 2 ---> processing company : {i+1}/{total}.Email not found in search results. Executing deep URL search : {j+1}/{len(capped_search_results)} URLs -----|",end="",flush=True)
+            content, html_content = self.web_tools.scrape_url_with_html(result["url"])
+            if self._target_reached():
+                return
+            # look at the raw markup first, it keeps the JSON-LD and mailto/tel links
+            email, phone = find_contact(html_content or "", company_name, site_url=result["url"])
+            if not email:
+                email, phone = self.extractor.extract_email(content, company_name)
+
+            if email:
+                if self._claim_email(company, email, phone):
+                    print(f"\r|------stage 2 ---> processing company : {i+1}/{total}. Deep URL search successfully completed and identified Email. -----|",end="",flush=True)
+                return
+
     def _get_timestamp(self):
         """Generate a timestamp for the output file"""
         from datetime import datetime
@@ -3,7 +3,6 @@ import streamlit as st
 import pandas as pd
 import os
 import base64
-import time
 from datetime import datetime
 import sys
 from dotenv import load_dotenv
@@ -14,8 +13,10 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import our custom modules
 from ai_company_info_scrapper import CompanyScraper
-from email_composer import EmailGenerator
+from email_composer import EmailGenerator, ComposedEmailsCSV
 from send_mails import send_emails_from_csv
+from utils.jobs import DONE, JobManager
+from utils.llm_usage import read_usage, usage_path
 
 # Set page configuration
 st.set_page_config(
@@ -48,13 +49,116 @@ def get_csv_download_link(df, filename, text):
 # Function to save uploaded file to a temp directory
 def save_uploaded_file(uploaded_file):
     try:
-        with open(os.path.join("temp", uploaded_file.name), "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        return os.path.join("temp", uploaded_file.name)
+        path = os.path.join("temp", uploaded_file.name)
+        data = uploaded_file.getbuffer()
+        # the uploader hands the same file back on every rerun; rewriting it would change its
+        # modification time and invalidate the cached dataframe
+        if os.path.exists(path) and os.path.getsize(path) == len(data):
+            with open(path, "rb") as f:
+                if f.read() == bytes(data):
+                    return path
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
     except Exception as e:
         st.error(f"Error saving uploaded file: {e}")
         return None
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def _load_csv(path, mtime, **read_csv_kwargs):
+    return pd.read_csv(path, **read_csv_kwargs)
+
+def load_csv(path, **read_csv_kwargs):
+    """pd.read_csv cached across reruns, a new modification time of the file invalidates it"""
+    return _load_csv(path, os.path.getmtime(path), **read_csv_kwargs)
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    """One background job runner for the whole app, it survives reruns"""
+    return JobManager(max_workers=4)
+
+# Background jobs: they run on the job manager's threads and only report through the job,
+# never through Streamlit elements
+def run_scrape_job(job, model, provider, api_key, industry, location, target_count):
+    job.update(0, target_count, "Initializing scraper...")
+    scraper = CompanyScraper(model, provider, api_key)
+    return scraper.run(industry, location, target_count, progress_callback=job.progress_callback)
+
+def run_compose_job(job, model, provider, api_key, cache_generations, max_workers, batch_size, csv_path, output_file,
+                    company_name, company_desc, additional_instructions):
+    job.update(message="Initializing email generator...")
+    generator = EmailGenerator(model, provider, api_key, cache_generations=cache_generations, max_workers=max_workers,
+                               batch_size=batch_size)
+    
+    # Each email is written as soon as it is composed. Re-running with the same
+    # output filename resumes: companies already in the file are skipped.
+    with ComposedEmailsCSV(output_file, name_column="Company Name") as output:
+        companies = [company for company in generator.iter_company_data(csv_path) if not output.is_done(company)]
+        total = len(companies)
+        job.update(0, total, f"Composing {total} emails...")
+        
+        # emails are composed in parallel and come back in the input order
+        for company, email in generator.generate_emails(
+            companies, 
+            company_name, 
+            company_desc, 
+            additional_instructions,
+            progress_callback=lambda done, company: job.update(done, total, f"Composed email for {company['Name']} ({done}/{total})")
+        ):
+            output.write(company, email)
+    generator.write_usage(output_file)
+    return output_file
+
+def run_send_job(job, csv_path, sender_email, sender_password):
+    job.update(message="Connecting to the mail server...")
+    return send_emails_from_csv(csv_path, sender_email, sender_password, progress_callback=job.progress_callback)
+
+@st.fragment(run_every=1.0)
+def job_progress(job_key, on_finished):
+    """
+    Poll the background job whose id is in st.session_state[job_key] once a second. When it
+    finishes on_finished(job) records the outcome in the session state and the app reruns.
+    """
+    job = get_job_manager().get(st.session_state.get(job_key))
+    if job is None or job.finished:
+        st.session_state[job_key] = None
+        if job is not None:
+            on_finished(job)
+        st.rerun()
+    snapshot = job.snapshot()
+    st.text(f"{snapshot['message']} ({snapshot['elapsed']:.0f}s)")
+    st.progress(snapshot['fraction'])
+
+def show_notice(notice_key):
+    """Show (once) the message a finished job left in the session state"""
+    notice = st.session_state.pop(notice_key, None)
+    if notice:
+        kind, text = notice
+        if kind == "error":
+            st.error(text)
+        else:
+            st.success(text)
+
+def show_usage(output_path):
+    """LLM calls, tokens, latency and estimated cost of the step that wrote output_path"""
+    summary = read_usage(usage_path(output_path)) if output_path else None
+    if not summary:
+        return
+    total = summary["total"]
+    with st.expander("📊 LLM usage"):
+        cols = st.columns(4)
+        cols[0].metric("LLM calls", total["calls"], help=f"{total['cache_hits']} answered from the cache")
+        cols[1].metric("Input tokens", f"{total['input_tokens']:,}")
+        cols[2].metric("Output tokens", f"{total['output_tokens']:,}")
+        cols[3].metric("Estimated cost", "n/a" if total["cost_usd"] is None else f"${total['cost_usd']:.4f}")
+        st.dataframe(pd.DataFrame([
+            {"Stage": stage, "Calls": t["calls"], "Cache hits": t["cache_hits"], "Retries": t["retries"], "Errors": t["errors"],
+             "Input tokens": t["input_tokens"], "Output tokens": t["output_tokens"],
+             "Avg latency (s)": round(t["latency_s"] / t["calls"], 2) if t["calls"] else 0.0,
+             "Max latency (s)": round(t["max_latency_s"], 2), "Cost ($)": t["cost_usd"]}
+            for stage, t in summary["stages"].items()
+        ]), hide_index=True)
+
 # Create temp directory if it doesn't exist
 if not os.path.exists("temp"):
     os.makedirs("temp")
@@ -66,6 +170,9 @@ if 'scraped_data' not in st.session_state:
     st.session_state.scraped_data = None
 if 'composed_emails_path' not in st.session_state:
     st.session_state.composed_emails_path = None
+for job_key in ('scrape_job_id', 'compose_job_id', 'send_job_id'):
+    if job_key not in st.session_state:
+        st.session_state[job_key] = None
 
 # Load API keys (in real app, these would be in .env or secrets)
 # For Streamlit deployment, you should use Streamlit secrets
@@ -145,79 +252,55 @@ if page == "Scrape Company Info":
             st.error("Please fill in both industry and location fields.")
         elif not st.session_state[llm_api_key_map[llm_model]]:
             st.error("Please provide an OpenAI API key in the sidebar settings.")
+        elif st.session_state.scrape_job_id:
+            st.warning("A scrape is already running.")
         else:
-            try:
-                # Show progress
-                progress_placeholder = st.empty()
-                progress_bar = st.progress(0)
-                
-                # Create scraper
-                progress_placeholder.text("Initializing scraper...")
-                scraper = CompanyScraper(llm_model, llm_provider, st.session_state[llm_api_key_map[llm_model]])
-                
-                # Run scraper with progress updates
-                progress_placeholder.text(f"Searching for {industry} companies in {location}...")
-                
-                # This is a workaround since we can't modify the scraper's run method
-                # In a real app, you'd modify the scraper to report progress
-                for i in range(10):
-                    progress_bar.progress((i+1) * 10)
-                    time.sleep(2)  # Simulate work
-                
-                output_file, count = scraper.run(industry, location, target_count)
-                
-                # Save results to session state
-                st.session_state.scraped_data_path = output_file
-                st.session_state.scraped_data = pd.read_csv(output_file)
-                
-                # Show success message
-                progress_placeholder.empty()
-                progress_bar.empty()
-                st.success(f"Successfully scraped {count} companies with emails!")
-                
-                # Display the scraped data
-                if st.session_state.scraped_data is not None:
-                    st.subheader("Scraped Company Data")
-                    st.dataframe(st.session_state.scraped_data)
-                    
-                    # Provide download link
-                    st.markdown(
-                        get_csv_download_link(
-                            st.session_state.scraped_data, 
-                            f"companies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                            "Download Scraped Data"
-                        ),
-                        unsafe_allow_html=True
-                    )
-                    
-                    # Guide to next step
-                    st.info("Now proceed to the 'Compose Emails' step in the sidebar.")
-                
-            except Exception as e:
-                st.error(f"Error during scraping: {e}")
-                progress_placeholder.empty()
-                progress_bar.empty()
+            # Run the scraper in the background, progress is polled below
+            job = get_job_manager().submit(
+                "scrape", run_scrape_job, llm_model, llm_provider, st.session_state[llm_api_key_map[llm_model]],
+                industry, location, target_count
+            )
+            st.session_state.scrape_job_id = job.id
     
-    # Show existing data if available
-    elif st.session_state.scraped_data is not None:
-        st.subheader("Previously Scraped Company Data")
-        st.dataframe(st.session_state.scraped_data)
-        
-        # Provide download link
-        st.markdown(
-            get_csv_download_link(
-                st.session_state.scraped_data, 
-                f"companies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                "Download Scraped Data"
-            ),
-            unsafe_allow_html=True
-        )
-        
-        # Option to clear data and start again
-        if st.button("Clear data and scrape again"):
-            st.session_state.scraped_data = None
-            st.session_state.scraped_data_path = None
-            st.experimental_rerun()
+    def on_scrape_finished(job):
+        if job.status == DONE:
+            output_file, count = job.result
+            # Save results to session state
+            st.session_state.scraped_data_path = output_file
+            st.session_state.scraped_data = load_csv(output_file)
+            st.session_state.scrape_notice = ("success", f"Successfully scraped {count} companies with emails!")
+        else:
+            st.session_state.scrape_notice = ("error", f"Error during scraping: {job.error}")
+    
+    if st.session_state.scrape_job_id:
+        job_progress("scrape_job_id", on_scrape_finished)
+    
+    # Show scraped data if available
+    else:
+        show_notice("scrape_notice")
+        if st.session_state.scraped_data is not None:
+            st.subheader("Scraped Company Data")
+            st.dataframe(st.session_state.scraped_data)
+            show_usage(st.session_state.scraped_data_path)
+            
+            # Provide download link
+            st.markdown(
+                get_csv_download_link(
+                    st.session_state.scraped_data, 
+                    f"companies_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    "Download Scraped Data"
+                ),
+                unsafe_allow_html=True
+            )
+            
+            # Guide to next step
+            st.info("Now proceed to the 'Compose Emails' step in the sidebar.")
+            
+            # Option to clear data and start again
+            if st.button("Clear data and scrape again"):
+                st.session_state.scraped_data = None
+                st.session_state.scraped_data_path = None
+                st.rerun()
 
 # Page 2: Compose Emails
 elif page == "Compose Emails":
@@ -235,7 +318,7 @@ elif page == "Compose Emails":
                 file_path = save_uploaded_file(uploaded_file)
                 
                 # Read the CSV
-                st.session_state.scraped_data = pd.read_csv(file_path)
+                st.session_state.scraped_data = load_csv(file_path)
                 st.session_state.scraped_data_path = file_path
                 
                 st.success("File uploaded successfully!")
@@ -269,6 +352,24 @@ elif page == "Compose Emails":
                 value=f"composed_emails_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             )
             
+            compose_workers = st.slider(
+                "Emails composed in parallel",
+                min_value=1, max_value=16, value=8,
+                help="Requests are still spaced out to stay within the provider's rate limit."
+            )
+            
+            emails_per_request = st.slider(
+                "Emails per LLM request",
+                min_value=1, max_value=10, value=1,
+                help="Compose several emails in one request. Sends the shared instructions once, so it costs fewer input tokens."
+            )
+            
+            fresh_drafts = st.checkbox(
+                "Generate fresh drafts",
+                value=False,
+                help="By default an identical request reuses the previously generated email. Tick this to ask the LLM for new drafts."
+            )
+            
             submit_compose = st.form_submit_button("✉️ Compose Emails")
         
         # Handle compose form submission
@@ -277,102 +378,67 @@ elif page == "Compose Emails":
                 st.error("Please fill in your company name and description.")
             elif not st.session_state[llm_api_key_map[llm_model]]:
                 st.error("Please provide an API key in the sidebar settings.")
+            elif st.session_state.compose_job_id:
+                st.warning("Emails are already being composed.")
+            else:
+                # Create the output directory if it doesn't exist
+                if not os.path.exists("output"):
+                    os.makedirs("output")
+                
+                # Compose in the background, progress is polled below
+                st.info(f"Creating EmailGenerator with model={llm_model}, provider={llm_provider}")
+                job = get_job_manager().submit(
+                    "compose", run_compose_job, llm_model, llm_provider, st.session_state[llm_api_key_map[llm_model]],
+                    not fresh_drafts, compose_workers, emails_per_request, st.session_state.scraped_data_path, f"output/{output_filename}.csv",
+                    company_name, company_desc, additional_instructions
+                )
+                st.session_state.compose_job_id = job.id
+        
+        def on_compose_finished(job):
+            if job.status == DONE:
+                # Save to session state
+                st.session_state.composed_emails_path = job.result
+                st.session_state.compose_notice = ("success", f"Successfully composed {job.done} emails!")
             else:
-                try:
-                    # Show progress
-                    progress_placeholder = st.empty()
-                    progress_bar = st.progress(0)
-                    progress_placeholder.text("Initializing email generator...")
-                    
-                    # Create email generator
-                    # Create email generator with debug info
-                    st.info(f"Creating EmailGenerator with model={llm_model}, provider={llm_provider}")
-                    generator = EmailGenerator(llm_model, llm_provider, st.session_state[llm_api_key_map[llm_model]])
-                    
-                    # Process companies
-                    csv_path = st.session_state.scraped_data_path
-                    
-                    # Create a wrapper function that reports progress
-                    def process_with_progress():
-                        companies = generator.read_company_data(csv_path)
-                        total = len(companies)
-                        emails = []
-                        
-                        for i, company in enumerate(companies):
-                            progress_placeholder.text(f"Composing email for {company['Name']} ({i+1}/{total})...")
-                            progress_bar.progress((i+1)/total)
-                            
-                            email = generator.generate_email(
-                                company, 
-                                company_name, 
-                                company_desc, 
-                                additional_instructions
-                            )
-                            
-                            # Add to emails list
-                            emails.append({
-                                "Company Name": company["Name"],
-                                "Email": company["Email"],
-                                "Subject": email["subject"],
-                                "Body": email["body"]
-                            })
-                        
-                        # Create the output directory if it doesn't exist
-                        if not os.path.exists("output"):
-                            os.makedirs("output")
-                        
-                        # Write to CSV
-                        output_file = f"output/{output_filename}.csv"
-                        emails_df = pd.DataFrame(emails)
-                        emails_df.to_csv(output_file, index=False, sep='|')
-                        
-                        return output_file, emails_df
-                    
-                    # Run the processing
-                    output_file, emails_df = process_with_progress()
-                    
-                    # Save to session state
-                    st.session_state.composed_emails_path = output_file
-                    
-                    # Clear progress indicators
-                    progress_placeholder.empty()
-                    progress_bar.empty()
-                    
-                    # Show success message
-                    st.success(f"Successfully composed {len(emails_df)} emails!")
-                    
-                    # Preview the emails
-                    with st.expander("Preview Composed Emails", expanded=True):
-                        for i, row in emails_df.iterrows():
-                            st.subheader(f"Email for {row['Company Name']}")
-                            st.write(f"**To:** {row['Email']}")
-                            st.write(f"**Subject:** {row['Subject']}")
-                            st.text_area(f"Body {i+1}", value=row['Body'], height=150, key=f"body_{i}")
-                            st.divider()
-                    
-                    # Provide download link
-                    st.markdown(
-                        get_csv_download_link(
-                            emails_df, 
-                            f"{output_filename}.csv",
-                            "Download Composed Emails CSV"
-                        ),
-                        unsafe_allow_html=True
-                    )
-                    
-                    # Note about CSV format
-                    st.info("""
-                    **Note:** The CSV file uses '|' as a delimiter. If you need to edit the emails before sending, 
-                    download the file, make your changes, and then upload the edited file in the 'Send Emails' step.
-                    """)
-                    
-                    # Guide to next step
-                    st.info("Now proceed to the 'Send Emails' step in the sidebar.")
-                    
-                except Exception as e:
-                    st.error(f"Error composing emails: {e}")
-                    progress_placeholder.empty()
-                    progress_bar.empty()
+                st.session_state.compose_notice = ("error", f"Error composing emails: {job.error}")
+        
+        if st.session_state.compose_job_id:
+            job_progress("compose_job_id", on_compose_finished)
+        
+        else:
+            show_notice("compose_notice")
+            if st.session_state.composed_emails_path and os.path.exists(st.session_state.composed_emails_path):
+                output_file = st.session_state.composed_emails_path
+                emails_df = load_csv(output_file, sep='|', dtype=str, keep_default_na=False)
+                show_usage(output_file)
+                
+                # Preview the emails
+                with st.expander("Preview Composed Emails", expanded=True):
+                    for i, row in emails_df.iterrows():
+                        st.subheader(f"Email for {row['Company Name']}")
+                        st.write(f"**To:** {row['Email']}")
+                        st.write(f"**Subject:** {row['Subject']}")
+                        st.text_area(f"Body {i+1}", value=row['Body'], height=150, key=f"body_{i}")
+                        st.divider()
+                
+                # Provide download link
+                st.markdown(
+                    get_csv_download_link(
+                        emails_df, 
+                        os.path.basename(output_file),
+                        "Download Composed Emails CSV"
+                    ),
+                    unsafe_allow_html=True
+                )
+                
+                # Note about CSV format
+                st.info("""
+                **Note:** The CSV file uses '|' as a delimiter. If you need to edit the emails before sending, 
+                download the file, make your changes, and then upload the edited file in the 'Send Emails' step.
+                """)
+                
+                # Guide to next step
+                st.info("Now proceed to the 'Send Emails' step in the sidebar.")
 
 # Page 3: Send Emails
 elif page == "Send Emails":
@@ -395,7 +461,7 @@ elif page == "Send Emails":
         
         # Preview the data
         try:
-            emails_df = pd.read_csv(emails_csv_path, sep='|')
+            emails_df = load_csv(emails_csv_path, sep='|')
             with st.expander("Preview Emails to Send", expanded=True):
                 st.dataframe(emails_df[["Company Name", "Email", "Subject"]])
         except Exception as e:
@@ -410,7 +476,7 @@ elif page == "Send Emails":
                 file_path = save_uploaded_file(uploaded_file)
                 
                 # Read the CSV
-                emails_df = pd.read_csv(file_path, sep='|')
+                emails_df = load_csv(file_path, sep='|')
                 
                 st.success("File uploaded successfully!")
                 
@@ -439,49 +505,23 @@ elif page == "Send Emails":
         if submit_send:
             if not sender_email or not sender_password:
                 st.error("Please provide both email address and app password.")
+            elif st.session_state.send_job_id:
+                st.warning("Emails are already being sent.")
+            else:
+                # Send in the background, progress is polled below
+                job = get_job_manager().submit("send", run_send_job, emails_csv_path, sender_email, sender_password)
+                st.session_state.send_job_id = job.id
+        
+        def on_send_finished(job):
+            if job.status == DONE:
+                st.session_state.send_notice = ("success", f"Successfully sent {job.result} emails!")
             else:
-                try:
-                    # Show progress
-                    progress_placeholder = st.empty()
-                    progress_bar = st.progress(0)
-                    progress_placeholder.text("Preparing to send emails...")
-                    
-                    # Read emails data to count total
-                    emails_df = pd.read_csv(emails_csv_path, sep='|')
-                    total_emails = len(emails_df)
-                    
-                    # We can't directly modify the send_emails_from_csv function,
-                    # so create a wrapper that updates progress
-                    def send_with_progress():
-                        # This would normally call send_emails_from_csv, but we'll simulate it
-                        # to show progress since we can't modify the original function
-                        progress_placeholder.text(f"Sending {total_emails} emails...")
-                        
-                        # Simulate sending emails with progress
-                        for i in range(total_emails):
-                            progress_bar.progress((i+1)/total_emails)
-                            time.sleep(1)  # Simulate sending
-                        
-                        # In a real app, you would call:
-                        send_emails_from_csv(emails_csv_path, sender_email, sender_password)
-                        
-                    # Send the emails
-                    send_with_progress()
-                    
-                    # In a real implementation, replace the above with:
-                    # send_emails_from_csv(emails_csv_path, sender_email, sender_password)
-                    
-                    # Clear progress indicators
-                    progress_placeholder.empty()
-                    progress_bar.empty()
-                    
-                    # Show success message
-                    st.success(f"Successfully sent {total_emails} emails!")
-                    
-                except Exception as e:
-                    st.error(f"Error sending emails: {e}")
-                    progress_placeholder.empty()
-                    progress_bar.empty()
+                st.session_state.send_notice = ("error", f"Error sending emails: {job.error}")
+        
+        if st.session_state.send_job_id:
+            job_progress("send_job_id", on_send_finished)
+        else:
+            show_notice("send_notice")
     else:
         st.warning("Please choose a source for emails to send.")
 
@@ -0,0 +1,291 @@
+# batch_runner.py
+"""
+Headless batch mode: runs scrape -> compose -> (optional) send for every job of a campaign file.
+
+usage: python batch_runner.py campaign.json [--processes 4] [--send]
+
+The campaign file is JSON, either a list of jobs or an object with default settings and a "jobs" list:
+
+    {
+        "provider": "google", "model": "gemini-2.0-flash",
+        "company_name": "infomerica inc", "company_description": "IT services ...",
+        "jobs": [
+            {"industry": "construction company", "location": "colorado", "target_count": 20},
+            {"industry": "law firm", "location": "denver", "target_count": 10, "model": "gemini-2.0-flash-lite"}
+        ]
+    }
+
+or a CSV with one job per row (industry, location, target_count and any other setting as columns).
+A setting of a job overrides the campaign defaults, which override the command line flags.
+
+Jobs run in parallel in a process pool. All processes share the on-disk page/search/LLM caches,
+and one budget of LLM and search calls in flight plus the per-provider request rate (LLM_RPM_*).
+Emails are sent from this process, one job after the other, so the sender account limits hold.
+Every finished job is appended to a summary CSV; running the same campaign again skips jobs
+that are already done there and resumes their sending.
+"""
+import os
+import re
+import csv
+import json
+import time
+import argparse
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from multiprocessing.managers import SyncManager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+from dotenv import load_dotenv
+
+from ai_company_info_scrapper import CompanyScraper
+from email_composer import EmailGenerator
+from send_mails import send_emails_from_csv
+from utils.concurrency import LLM, SEARCH, LLM_MAX_CONCURRENCY, SEARCH_MAX_CONCURRENCY, set_budget
+from utils.rate_limit import TokenBucket, provider_rpm, set_provider_limiter
+from utils.llm_usage import format_usage, merge_usage, read_usage, write_usage
+
+load_dotenv()
+
+# .env variable holding the api key of each provider
+API_KEY_ENV = {
+    "openai": "OPENAI_API_KEY",
+    "google": "GOOGLE_AI_API_KEY",
+    "deepseek": "DEEPSEEK_API_KEY",
+    "groq": "GROQ_API_KEY",
+}
+
+SUMMARY_FIELDS = ["Job", "Industry", "Location", "Target", "Status", "Companies CSV", "Companies With Email",
+                  "Emails CSV", "Emails Composed", "Emails Sent", "LLM Calls", "Input Tokens", "Output Tokens",
+                  "Cost USD", "Seconds", "Error"]
+DONE, FAILED = "done", "failed"
+
+
+class BatchManager(SyncManager):
+    """Manager process hosting the semaphores and provider rate limiters shared by the job processes"""
+
+
+BatchManager.register("TokenBucket", TokenBucket, exposed=("acquire", "try_acquire"))
+
+
+def slugify(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", text).strip("_").lower()
+
+
+def job_id(job: Dict) -> str:
+    return f"{job['industry']} / {job['location']} / {job['target_count']}"
+
+
+def to_bool(value) -> bool:
+    return value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def load_campaign(path: str, defaults: Dict) -> List[Dict]:
+    """Read the jobs of a campaign file (JSON or CSV), each with the full set of settings filled in"""
+    with open(path, "r", encoding="utf-8") as file:
+        if path.lower().endswith(".json"):
+            data = json.load(file)
+            campaign_defaults, jobs = ({}, data) if isinstance(data, list) else ({k: v for k, v in data.items() if k != "jobs"}, data.get("jobs", []))
+        else:
+            sample = file.read(4096)
+            file.seek(0)
+            dialect = csv.Sniffer().sniff(sample, delimiters=",|;\t")
+            # empty cells fall back to the defaults
+            campaign_defaults, jobs = {}, [{k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()}
+                                           for row in csv.DictReader(file, dialect=dialect)]
+
+    settings = []
+    for number, job in enumerate(jobs, 1):
+        job = {**defaults, **campaign_defaults, **job}
+        if not job.get("industry") or not job.get("location"):
+            raise ValueError(f"job {number} in {path} needs an industry and a location")
+        job["target_count"] = int(job.get("target_count") or 10)
+        job["send"] = to_bool(job.get("send", False))
+        job["compose"] = to_bool(job.get("compose", True))
+        if job["compose"] and not (job.get("company_name") and job.get("company_description")):
+            raise ValueError(f"job {number} in {path} composes emails but has no company_name/company_description")
+        settings.append(job)
+    return settings
+
+
+def load_summary(path: str) -> Dict[str, Dict[str, str]]:
+    """Last summary row of every job in an earlier run of the campaign"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        return {row["Job"]: row for row in csv.DictReader(file, delimiter="|")}
+
+
+def append_summary(path: str, row: Dict):
+    is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_FIELDS, delimiter="|", extrasaction="ignore")
+        if is_new:
+            writer.writeheader()
+        writer.writerow(row)
+
+
+def _init_worker(budgets: Dict, limiters: Dict):
+    """Runs once in every job process: use the budgets and rate limiters shared through the manager"""
+    for name, semaphore in budgets.items():
+        set_budget(name, semaphore)
+    for provider, limiter in limiters.items():
+        set_provider_limiter(provider, limiter)
+
+
+def run_job(job: Dict, emails_file_name: str, log_path: str, usage_file: str) -> Dict:
+    """
+    Scrape and compose one job (in a pool process). Its output goes to log_path and the LLM usage
+    of both steps to usage_file. Returns the summary row.
+    """
+    started = time.time()
+    row = {"Job": job_id(job), "Industry": job["industry"], "Location": job["location"], "Target": job["target_count"],
+           "Status": FAILED, "Companies CSV": "", "Companies With Email": 0, "Emails CSV": "", "Emails Composed": 0,
+           "Emails Sent": 0, "Error": ""}
+    usage = []
+    with open(log_path, "a", encoding="utf-8") as log, redirect_stdout(log), redirect_stderr(log):
+        try:
+            provider, model = job["provider"], job["model"]
+            api_key = os.getenv(API_KEY_ENV.get(provider, ""), "") or None
+
+            scraper = CompanyScraper(model, provider, api_key)
+            try:
+                companies_csv, with_email = scraper.run(job["industry"], job["location"], job["target_count"])
+            finally:
+                usage.append(scraper.extractor.llm.usage.summary())
+            row.update({"Companies CSV": companies_csv, "Companies With Email": with_email})
+
+            if job["compose"] and with_email:
+                generator = EmailGenerator(model, provider, api_key, batch_size=int(job.get("email_batch_size") or 1))
+                try:
+                    row["Emails Composed"] = generator.process_companies(
+                        companies_csv, emails_file_name, job["company_name"], job["company_description"],
+                        job.get("additional_instructions", ""))
+                finally:
+                    usage.append(generator.usage.summary())
+                row["Emails CSV"] = os.path.join("composed_emails", emails_file_name)
+            row["Status"] = DONE
+        except Exception as e:
+            traceback.print_exc()
+            row["Error"] = str(e)
+
+    total = merge_usage(usage)
+    write_usage(usage_file, total)
+    row.update({"LLM Calls": total["total"]["calls"], "Input Tokens": total["total"]["input_tokens"],
+                "Output Tokens": total["total"]["output_tokens"], "Cost USD": total["total"]["cost_usd"]})
+    row["Seconds"] = round(time.time() - started, 1)
+    return row
+
+
+def send_job_emails(row: Dict, sender: Tuple[str, str]):
+    """Send (what is still unsent of) a job's composed emails from this process"""
+    if not row.get("Emails CSV") or not os.path.exists(row["Emails CSV"]):
+        return
+    try:
+        row["Emails Sent"] = int(row.get("Emails Sent") or 0) + send_emails_from_csv(row["Emails CSV"], *sender)
+    except Exception as e:
+        traceback.print_exc()
+        row["Status"], row["Error"] = FAILED, f"sending failed: {e}"
+
+
+def run_campaign(args) -> int:
+    defaults = {"provider": args.provider, "model": args.model, "company_name": args.company_name,
+                "company_description": args.company_description, "additional_instructions": args.instructions,
+                "send": args.send, "compose": not args.scrape_only, "email_batch_size": args.email_batch_size}
+    jobs = load_campaign(args.campaign, defaults)
+    campaign_name = slugify(os.path.splitext(os.path.basename(args.campaign))[0])
+    summary_path = args.summary or os.path.join("extractions", f"batch_{campaign_name}_summary.csv")
+    log_dir = os.path.join("extractions", "logs", campaign_name)
+    usage_file = os.path.join("extractions", f"batch_{campaign_name}_usage.json")
+    os.makedirs(log_dir, exist_ok=True)
+
+    sender = None
+    if any(job["send"] for job in jobs):
+        sender = (os.getenv("SENDER_EMAIL", ""), os.getenv("GOOGLE_APP_PASSWORD", ""))
+        if not all(sender):
+            raise ValueError("sending needs SENDER_EMAIL and GOOGLE_APP_PASSWORD in .env")
+
+    previous = load_summary(summary_path) if args.resume else {}
+    pending = [job for job in jobs if previous.get(job_id(job), {}).get("Status") != DONE]
+    print(f"📋 {len(jobs)} jobs in {args.campaign}, {len(jobs) - len(pending)} already done, running {len(pending)} "
+          f"on {args.processes} processes. Summary: {summary_path}, logs: {log_dir}")
+
+    # jobs done in an earlier run may still have emails the daily limit held back
+    for job in jobs:
+        row = previous.get(job_id(job))
+        if sender and job["send"] and row and row.get("Status") == DONE:
+            sent_before = int(row.get("Emails Sent") or 0)
+            send_job_emails(row, sender)
+            if int(row.get("Emails Sent") or 0) > sent_before:
+                append_summary(summary_path, row)
+
+    if not pending:
+        return 0
+
+    failed = 0
+    with BatchManager() as manager:
+        budgets = {LLM: manager.BoundedSemaphore(args.llm_concurrency) if args.llm_concurrency > 0 else None,
+                   SEARCH: manager.BoundedSemaphore(args.search_concurrency) if args.search_concurrency > 0 else None}
+        limiters = {}
+        for provider in sorted({job["provider"] for job in pending}):
+            rpm = provider_rpm(provider)
+            if rpm > 0:
+                limiters[provider] = manager.TokenBucket(rpm / 60, 1)
+
+        with ProcessPoolExecutor(max_workers=args.processes, initializer=_init_worker, initargs=(budgets, limiters)) as executor:
+            futures = {}
+            for job in pending:
+                slug = slugify(job_id(job))
+                # a fixed file name per job, so a re-run resumes composing where it stopped
+                futures[executor.submit(run_job, job, f"batch_{campaign_name}_{slug}.csv",
+                                        os.path.join(log_dir, f"{slug}.log"),
+                                        os.path.join(log_dir, f"{slug}_usage.json"))] = job
+            try:
+                for finished, future in enumerate(as_completed(futures), 1):
+                    job = futures[future]
+                    row = future.result()
+                    if row["Status"] == DONE and sender and job["send"]:
+                        send_job_emails(row, sender)
+                    append_summary(summary_path, row)
+                    if row["Status"] == DONE:
+                        print(f"✅ [{finished}/{len(pending)}] {row['Job']}: {row['Companies With Email']} companies, "
+                              f"{row['Emails Composed']} emails composed, {row['Emails Sent']} sent, "
+                              f"{row['LLM Calls']} LLM calls in {row['Seconds']}s")
+                    else:
+                        failed += 1
+                        print(f"❌ [{finished}/{len(pending)}] {row['Job']}: {row['Error']}")
+            except KeyboardInterrupt:
+                print("⏹️ Interrupted, cancelling the jobs not started yet. Run again to resume.")
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    print(f"🏁 Campaign finished: {len(pending) - failed} jobs done, {failed} failed")
+    write_campaign_usage(jobs, log_dir, usage_file)
+    return 1 if failed else 0
+
+
+def write_campaign_usage(jobs: List[Dict], log_dir: str, path: str):
+    """LLM usage of the whole campaign, from the usage files of its jobs (including earlier runs)"""
+    summary = merge_usage(read_usage(os.path.join(log_dir, f"{slugify(job_id(job))}_usage.json")) for job in jobs)
+    write_usage(path, summary)
+    print(f"📊 LLM usage of the campaign ({path}):\n{format_usage(summary)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("campaign", help="campaign file (.json or .csv)")
+    parser.add_argument("--provider", default="google", help="default LLM provider")
+    parser.add_argument("--model", default="gemini-2.0-flash", help="default LLM model")
+    parser.add_argument("--company-name", default="", help="default name of your company, used in the emails")
+    parser.add_argument("--company-description", default="", help="default description of what your company offers")
+    parser.add_argument("--instructions", default="", help="default additional instructions for the emails")
+    parser.add_argument("--email-batch-size", type=int, default=1, help="default number of emails composed per LLM request")
+    parser.add_argument("--scrape-only", action="store_true", help="collect companies without composing emails")
+    parser.add_argument("--send", action="store_true", help="send the composed emails (SENDER_EMAIL / GOOGLE_APP_PASSWORD)")
+    parser.add_argument("--processes", type=int, default=4, help="jobs running at the same time")
+    parser.add_argument("--llm-concurrency", type=int, default=LLM_MAX_CONCURRENCY or 8,
+                        help="LLM calls in flight across all processes (0 = unlimited)")
+    parser.add_argument("--search-concurrency", type=int, default=SEARCH_MAX_CONCURRENCY or 4,
+                        help="search API calls in flight across all processes (0 = unlimited)")
+    parser.add_argument("--summary", default="", help="summary CSV (default: extractions/batch_<campaign>_summary.csv)")
+    parser.add_argument("--no-resume", dest="resume", action="store_false", help="run jobs already done in the summary again")
+    raise SystemExit(run_campaign(parser.parse_args()))
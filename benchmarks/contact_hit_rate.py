@@ -0,0 +1,56 @@
+# benchmarks/contact_hit_rate.py
+"""
+Measure how often the deterministic contact pre-extractor answers without an LLM call.
+
+usage: python benchmarks/contact_hit_rate.py [fixtures_dir]
+
+fixtures_dir holds saved HTML pages plus an expected.json mapping
+file name -> {"company": ..., "email": ...} (email "" when the page has none).
+"""
+import os
+import sys
+import json
+import time
+
+# Add the repo root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.contact_extractor import find_contact
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "contacts")
+
+
+def run(fixtures_dir: str = DEFAULT_FIXTURES_DIR):
+    with open(os.path.join(fixtures_dir, "expected.json"), "r", encoding="utf-8") as f:
+        expected = json.load(f)
+
+    hits, wrong, fallbacks = 0, 0, 0
+    elapsed = 0.0
+    for file_name, case in sorted(expected.items()):
+        with open(os.path.join(fixtures_dir, file_name), "r", encoding="utf-8") as f:
+            html_content = f.read()
+
+        start = time.perf_counter()
+        email, phone = find_contact(html_content, case["company"])
+        elapsed += time.perf_counter() - start
+
+        if not email:
+            fallbacks += 1
+            status = "LLM fallback"
+        elif email == case["email"]:
+            hits += 1
+            status = "hit"
+        else:
+            wrong += 1
+            status = f"WRONG (expected {case['email'] or 'nothing'})"
+        print(f"{file_name:35} {status:35} {email} {phone}")
+
+    total = len(expected)
+    print("-" * 80)
+    print(f"pages: {total} | hits: {hits} ({hits / total:.0%}) | wrong: {wrong} | LLM fallbacks: {fallbacks}")
+    print(f"avg time per page: {elapsed / total * 1000:.3f} ms")
+    return hits, wrong, fallbacks
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FIXTURES_DIR)
@@ -0,0 +1,179 @@
+# benchmarks/end_to_end.py
+"""
+Offline end-to-end throughput benchmark: scrape -> compose -> send.
+
+usage: python benchmarks/end_to_end.py [--companies 20] [--llm-latency 0.5] ...
+
+Runs CompanyScraper.run, EmailGenerator.process_companies and send_emails_from_csv against
+the stand-ins in benchmarks/fakes.py (fake chat model, fixture HTTP server, fake search,
+local SMTP sink), so it needs no API keys or network. Disk caches are disabled so every
+run measures real work. Reports wall time and throughput per stage and latency percentiles
+per operation.
+"""
+import os
+import csv
+import sys
+import time
+import smtplib
+import argparse
+import tempfile
+import threading
+import contextlib
+from collections import defaultdict
+
+# benchmarks measure real work, not cache hits. must be set before our modules are imported
+for _cache in ("PAGE_CACHE_ENABLED", "SEARCH_CACHE_ENABLED", "LLM_CACHE_ENABLED"):
+    os.environ[_cache] = "false"
+
+# Add the repo root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_company_info_scrapper
+from ai_company_info_scrapper import CompanyScraper, CompanyExtractor
+from email_composer import EmailGenerator
+from send_mails import send_emails_from_csv
+from fakes import FakeChatModel, FakeWebSearch, FixtureServer, SMTPSink
+
+
+class Recorder:
+    """Collects latency samples per operation from wrapped callables"""
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def wrap(self, name, fn):
+        def wrapped(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.samples[name].append(time.perf_counter() - start)
+        return wrapped
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def print_report(stages, recorder):
+    print("\n" + "=" * 78)
+    print(f"{'stage':12} {'wall s':>9} {'items':>7} {'items/s':>9}")
+    for name, (wall, items) in stages.items():
+        print(f"{name:12} {wall:9.2f} {items:7d} {items / wall if wall else 0:9.2f}")
+    total_wall = sum(wall for wall, _ in stages.values())
+    print(f"{'total':12} {total_wall:9.2f}")
+
+    print("-" * 78)
+    print(f"{'operation':28} {'calls':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for name, values in recorder.samples.items():
+        print(f"{name:28} {len(values):6d} {percentile(values, 50) * 1000:9.1f} {percentile(values, 90) * 1000:9.1f} "
+              f"{percentile(values, 99) * 1000:9.1f} {max(values) * 1000:9.1f}")
+    print("=" * 78)
+
+
+@contextlib.contextmanager
+def patched(target, name, value):
+    original = getattr(target, name)
+    setattr(target, name, value)
+    try:
+        yield
+    finally:
+        setattr(target, name, original)
+
+
+def run(args):
+    recorder = Recorder()
+    fake_llm = FakeChatModel(latency=args.llm_latency, tokens_per_second=args.tokens_per_second,
+                             extract_format=args.extract_format, truncate=args.truncate)
+    stages = {}
+    cwd = os.getcwd()
+
+    with FixtureServer(per_page=args.per_page, latency=args.fetch_latency, repeat=args.repeat) as fixture, \
+         SMTPSink(latency=args.smtp_latency) as sink, \
+         tempfile.TemporaryDirectory() as workdir, \
+         patched(CompanyExtractor, "_init_llm", lambda self, *a: fake_llm), \
+         patched(EmailGenerator, "_init_llm", lambda self, *a: fake_llm), \
+         patched(ai_company_info_scrapper, "get_web_search",
+                 lambda search=FakeWebSearch(fixture.url, latency=args.search_latency): search), \
+         patched(smtplib.SMTP, "send_message", recorder.wrap("smtp send_message", smtplib.SMTP.send_message)):
+        os.chdir(workdir)
+
+        # stage 1 + 2: scrape
+        scraper = CompanyScraper("fake-model", "fake", fetch_workers=args.fetch_workers,
+                                 llm_workers=args.llm_workers, email_workers=args.email_workers,
+                                 contact_batch_size=args.contact_batch_size, stream_extraction=args.stream)
+        tools, extractor = scraper.web_tools, scraper.extractor
+        tools.web_search = recorder.wrap("search", tools.web_search)
+        tools.scrape_url = recorder.wrap("fetch + markdown", tools.scrape_url)
+        tools.scrape_url_with_html = recorder.wrap("fetch + markdown (stage 2)", tools.scrape_url_with_html)
+        extractor.extract = recorder.wrap("llm extract", extractor.extract)
+        extractor.extract_email = recorder.wrap("extract_email", extractor.extract_email)
+        extractor._llm_extract_email = recorder.wrap("llm extract_email", extractor._llm_extract_email)
+        extractor._llm_extract_batch = recorder.wrap("llm extract_email batch", extractor._llm_extract_batch)
+        first_company = []
+        write_to_csv = scraper._write_to_csv
+
+        def record_first_company(companies):
+            if companies and not first_company:
+                first_company.append(time.perf_counter() - start)
+            write_to_csv(companies)
+        scraper._write_to_csv = record_first_company
+
+        start = time.perf_counter()
+        companies_csv, found = scraper.run("construction company", "colorado", args.companies)
+        stages["scrape"] = (time.perf_counter() - start, found)
+
+        # compose
+        generator = EmailGenerator("fake-model", "fake", batch_size=args.email_batch_size)
+        generator.generate_email = recorder.wrap("llm generate_email", generator.generate_email)
+        generator._request_batch = recorder.wrap("llm generate_email batch", generator._request_batch)
+        start = time.perf_counter()
+        generator.process_companies(companies_csv, "benchmark_emails.csv", "Benchmark Inc",
+                                    "IT services and automation for construction companies.")
+        emails_csv = os.path.join("composed_emails", "benchmark_emails.csv")
+        with open(emails_csv, "r", encoding="utf-8") as f:
+            composed = sum(1 for _ in csv.DictReader(f, delimiter="|"))
+        stages["compose"] = (time.perf_counter() - start, composed)
+
+        # send
+        start = time.perf_counter()
+        send_emails_from_csv(emails_csv, "bench@example.com", "password",
+                             smtp_server=sink.host, smtp_port=sink.port, use_tls=False,
+                             connections=args.smtp_connections, rate_limit=False)
+        stages["send"] = (time.perf_counter() - start, sink.received)
+
+        os.chdir(cwd)
+
+    print_report(stages, recorder)
+    print(f"SMTP connections opened: {sink.connections} for {sink.received} messages")
+    if first_company:
+        print(f"First company with email written after {first_company[0]:.2f} s")
+    return stages, recorder
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--companies", type=int, default=20, help="target number of companies with email")
+    parser.add_argument("--per-page", type=int, default=8, help="companies per fixture listing page")
+    parser.add_argument("--repeat", type=int, default=0, help="companies of the previous listing page repeated on each page")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fake LLM time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="fake LLM output token rate")
+    parser.add_argument("--fetch-latency", type=float, default=0.2, help="fixture server latency per page (s)")
+    parser.add_argument("--search-latency", type=float, default=0.3, help="fake search latency per call (s)")
+    parser.add_argument("--smtp-latency", type=float, default=0.05, help="SMTP sink latency per message (s)")
+    parser.add_argument("--fetch-workers", type=int, default=4)
+    parser.add_argument("--llm-workers", type=int, default=2)
+    parser.add_argument("--email-workers", type=int, default=4)
+    parser.add_argument("--contact-batch-size", type=int, default=10, help="stage 2 companies per contact extraction call (1 = one call each)")
+    parser.add_argument("--email-batch-size", type=int, default=1, help="emails composed per LLM request")
+    parser.add_argument("--extract-format", choices=["wrapped", "array"], default="wrapped",
+                        help='fake extraction answers as {"companies": [...]} or as a bare array')
+    parser.add_argument("--truncate", type=float, default=0.0, help="fraction of extraction answers cut off mid-company")
+    parser.add_argument("--stream", action="store_true", help="stream stage 1 extraction (LLM_STREAMING)")
+    parser.add_argument("--smtp-connections", type=int, default=1, help="parallel SMTP connections for sending")
+    run(parser.parse_args())
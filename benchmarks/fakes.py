@@ -0,0 +1,357 @@
+# benchmarks/fakes.py
+"""
+Offline stand-ins for everything the pipeline normally talks to over the network:
+
+- FakeChatModel: deterministic LangChain chat model with configurable latency and token rate
+- FixtureServer: local HTTP server with generated directory listing and company pages
+- FakeWebSearch: drop-in for WebSearch.run pointing at the fixture server
+- SMTPSink: local SMTP server (no TLS, accepts any login) that counts received messages
+"""
+import re
+import json
+import time
+import threading
+import zlib
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+PHONE_RE = re.compile(r"\(\d{3}\) \d{3}-\d{4}")
+
+
+def _stable_fraction(text: str) -> float:
+    """Deterministic pseudo random number in [0, 1) derived from text"""
+    return (zlib.crc32(text.encode("utf-8")) % 1000) / 1000
+
+
+# ---------------------------------------------------------------- fake LLM
+
+def _fake_extract_companies(content: str, extract_format: str = "wrapped", truncate: float = 0.0) -> str:
+    """
+    Answer a company extraction prompt by reading the fixture page structure. extract_format "wrapped"
+    answers {"companies": [...]} as the prompt asks, "array" a bare array. A truncate fraction of the
+    answers is cut off inside the last company, like an answer that ran into the output token limit.
+    """
+    companies = []
+    for block in re.split(r"\n(?=#{2,3} )", content):
+        heading = re.match(r"#{2,3} (.+)", block)
+        if not heading:
+            continue
+        email = EMAIL_RE.search(block)
+        phone = PHONE_RE.search(block)
+        services = re.search(r"Services: (.+)", block)
+        companies.append({
+            "name": heading.group(1).strip(),
+            "services/products": services.group(1).strip() if services else "",
+            "phone": phone.group(0) if phone else "",
+            "email": email.group(0) if email else "",
+        })
+    answer = json.dumps({"companies": companies} if extract_format == "wrapped" else companies, indent=2)
+    if companies and _stable_fraction(content) < truncate:
+        answer = answer[:answer.rfind('"email"')]
+    return answer
+
+
+def _fake_extract_contact(content: str) -> str:
+    email = EMAIL_RE.search(content)
+    phone = PHONE_RE.search(content)
+    return json.dumps({"email": email.group(0) if email else "", "phone": phone.group(0) if phone else ""})
+
+
+def _fake_extract_contacts(content: str) -> str:
+    """Answer a batched contact prompt: one "### C<n>: <name>" section per company"""
+    contacts = {}
+    for block in re.split(r"\n(?=### C\d+: )", content):
+        heading = re.match(r"### (C\d+): ", block)
+        if heading:
+            contacts[heading.group(1)] = json.loads(_fake_extract_contact(block))
+    return json.dumps(contacts, indent=2)
+
+
+def _fake_compose_email(prompt: str) -> str:
+    match = re.search(r"Create a personalized cold email from (.+?) to (.+?)\.\n", prompt)
+    sender, target = match.groups() if match else ("Us", "there")
+    body = (f"Hi {target} team,\n\n"
+            + " ".join(["We help companies like yours streamline operations and grow revenue."] * 8)
+            + f"\n\nWould you be open to a short call next week?\n\nBest Regards,\nTeam {sender}")
+    return json.dumps({"subject": f"{sender} x {target}: a quick idea", "body": body})
+
+
+def _fake_compose_emails(prompt: str) -> str:
+    """Answer a batched email prompt: one email per "- R<n>:" recipient"""
+    sender = re.search(r"Create a personalized cold email from (.+?) to each of", prompt)
+    emails = []
+    for recipient, name in re.findall(r"- (R\d+):\n\s+Company Name: (.+)", prompt):
+        email = json.loads(_fake_compose_email(f"Create a personalized cold email from {sender.group(1) if sender else 'Us'} to {name}.\n"))
+        emails.append({"id": recipient, "company": name, **email})
+    return json.dumps(emails, indent=2)
+
+
+def fake_response(prompt: str, extract_format: str = "wrapped", truncate: float = 0.0) -> str:
+    """Deterministic completion for the prompts this project sends"""
+    content = prompt.split("Here is the content to analyze:", 1)[-1]
+    if "Extract company information" in prompt:
+        return _fake_extract_companies(content, extract_format, truncate)
+    if "Extract the business contact emails" in prompt:
+        return _fake_extract_contacts(content)
+    if "Extract the business contact email" in prompt:
+        return _fake_extract_contact(content)
+    if "to each of the recipient companies" in prompt:
+        return _fake_compose_emails(prompt)
+    if "Create a personalized cold email" in prompt:
+        return _fake_compose_email(prompt)
+    return "{}"
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model for benchmarks: each call sleeps latency seconds plus
+    output_tokens / tokens_per_second, then returns a deterministic response.
+    extract_format and truncate shape the company extraction answers, see _fake_extract_companies.
+    """
+    latency: float = 0.5
+    tokens_per_second: float = 200.0
+    extract_format: str = "wrapped"
+    truncate: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        text = fake_response(prompt, self.extract_format, self.truncate)
+        input_tokens, output_tokens = len(prompt) // 4, len(text) // 4
+        time.sleep(self.latency + output_tokens / self.tokens_per_second)
+        message = AIMessage(content=text, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        """Same answer as _generate, delivered in ~4 token pieces at tokens_per_second after latency"""
+        prompt = "\n".join(str(message.content) for message in messages)
+        text = fake_response(prompt, self.extract_format, self.truncate)
+        input_tokens, output_tokens = len(prompt) // 4, len(text) // 4
+        time.sleep(self.latency)
+        for start in range(0, len(text), 16):
+            time.sleep(4 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text[start:start + 16]))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }))
+
+
+# ---------------------------------------------------------------- fixture web site
+
+SERVICES = [
+    "commercial construction and tenant improvements.",
+    "residential remodeling, kitchens and baths.",
+    "design-build projects for offices and retail.",
+    "concrete foundations, flatwork and site prep.",
+    "roofing, siding and storm damage repair.",
+]
+
+
+def _listing(page: int, i: int, suffix: str = "") -> str:
+    company_id = f"{page}-{i}"
+    email = f"<p>Email: info@company{page}x{i}.com</p>" if _stable_fraction(company_id) < 0.5 else ""
+    return f"""
+<div class="listing">
+  <h2>Fixture Company {company_id}{suffix}</h2>
+  <p>Services: {SERVICES[(page + i) % len(SERVICES)]}</p>
+  <p>Phone: (303) 555-{page % 100:02d}{i:02d}</p>
+  {email}
+  <a href="/company/{company_id}">View profile</a>
+</div>"""
+
+
+def listing_page(page: int, per_page: int, repeat: int = 0) -> str:
+    """
+    Directory page listing per_page companies, roughly half of them with an email. The first
+    `repeat` companies of the previous page are listed again (as "..., Inc."), like directories
+    that overlap.
+    """
+    rows = [_listing(page, i) for i in range(per_page)]
+    if page > 1:
+        rows += [_listing(page - 1, i, suffix=", Inc.") for i in range(min(repeat, per_page))]
+    return f"""<!DOCTYPE html>
+<html><head><title>Top construction companies - page {page}</title><script>var tracking = 1;</script></head>
+<body><nav>{'<a href="/">Home</a>' * 20}</nav>
+<h1>Top construction companies - page {page}</h1>
+{''.join(rows)}
+<footer>All rights reserved</footer></body></html>"""
+
+
+def company_page(company_id: str) -> str:
+    page, i = company_id.split("-", 1)
+    return f"""<!DOCTYPE html>
+<html><head><title>Fixture Company {company_id}</title></head>
+<body><h1>Fixture Company {company_id}</h1>
+<p>Contact us: <a href="mailto:hello@company{page}x{i}.com">hello@company{page}x{i}.com</a></p>
+<p>Phone: <a href="tel:+1303555{int(page) % 100:02d}{int(i):02d}">(303) 555-{int(page) % 100:02d}{int(i):02d}</a></p>
+</body></html>"""
+
+
+class FixtureServer:
+    """Local HTTP server for scrape_page: /listing/<n> directory pages and /company/<page>-<i> profiles"""
+    def __init__(self, per_page: int = 8, latency: float = 0.2, repeat: int = 0):
+        self.per_page = per_page
+        self.latency = latency
+        self.repeat = repeat
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(fixture.latency)
+                listing = re.fullmatch(r"/listing/(\d+)", self.path)
+                company = re.fullmatch(r"/company/(\d+-\d+)", self.path)
+                if listing:
+                    body = listing_page(int(listing.group(1)), fixture.per_page, fixture.repeat)
+                elif company:
+                    body = company_page(company.group(1))
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeWebSearch:
+    """
+    Stand-in for the utils.*_web_search client (get_web_search()). Listing queries return fixture directory
+    pages, stage 2 "<company> ... email phone" queries return that company's profile page,
+    with the email already in the snippet for about a third of the companies.
+    """
+    def __init__(self, base_url: str, latency: float = 0.3):
+        self.base_url = base_url
+        self.latency = latency
+
+    def run(self, query: str, exact_term: str = "", start_page: int = 1, end_page: int = 1) -> List[Dict[str, str]]:
+        time.sleep(self.latency)
+        company = re.search(r"Fixture Company (\d+)-(\d+)", query)
+        if company:
+            page, i = company.groups()
+            snippet = f"Fixture Company {page}-{i}, construction."
+            if _stable_fraction(query) < 0.33:
+                snippet += f" Contact hello@company{page}x{i}.com"
+            return [
+                {"title": f"Fixture Company {page}-{i}", "snippet": snippet, "url": f"{self.base_url}/company/{page}-{i}"},
+                {"title": "Directory", "snippet": "Construction directory", "url": f"{self.base_url}/listing/{page}"},
+            ]
+        return [{"title": f"Listing {n}", "snippet": "Top construction companies", "url": f"{self.base_url}/listing/{n}"}
+                for n in range((start_page - 1) * 10 + 1, end_page * 10 + 1)]
+
+
+# ---------------------------------------------------------------- SMTP sink
+
+class SMTPSink:
+    """
+    Minimal local SMTP server for send benchmarks: no TLS, accepts any AUTH PLAIN/LOGIN,
+    counts delivered messages. latency is added to every accepted message. With drop_after > 0
+    the server hangs up after that many messages on a connection, like a provider session cap.
+    With quota > 0 every MAIL FROM after that many delivered messages gets gmail's daily quota 550.
+    """
+    def __init__(self, latency: float = 0.0, drop_after: int = 0, quota: int = 0):
+        self.latency = latency
+        self.drop_after = drop_after
+        self.quota = quota
+        self.received = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line: str):
+                self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+            def handle(self):
+                with sink._lock:
+                    sink.connections += 1
+                self.reply("220 localhost benchmark SMTP sink")
+                in_data = False
+                accepted = 0
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    if in_data:
+                        if line in (b".\r\n", b".\n"):
+                            in_data = False
+                            time.sleep(sink.latency)
+                            with sink._lock:
+                                sink.received += 1
+                            self.reply("250 OK queued")
+                            accepted += 1
+                        continue
+                    if sink.drop_after and accepted >= sink.drop_after:
+                        return
+                    command = line.decode("utf-8", "replace").strip()
+                    verb = command.split(" ", 1)[0].upper()
+                    if verb == "EHLO":
+                        self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n")
+                    elif verb == "AUTH":
+                        parts = command.split()
+                        if parts[1].upper() == "LOGIN":
+                            self.reply("334 VXNlcm5hbWU6")
+                            self.rfile.readline()
+                            self.reply("334 UGFzc3dvcmQ6")
+                            self.rfile.readline()
+                        elif len(parts) == 2:
+                            self.reply("334 ")
+                            self.rfile.readline()
+                        self.reply("235 Authentication successful")
+                    elif verb == "DATA":
+                        in_data = True
+                        self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    elif verb == "MAIL" and sink.quota and sink.received >= sink.quota:
+                        self.reply("550 5.4.5 Daily user sending quota exceeded.")
+                    elif verb in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                        self.reply("250 OK")
+                    elif verb == "QUIT":
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("502 Command not implemented")
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,89 @@
+# benchmarks/html_pipeline.py
+"""
+Per-page CPU time and peak memory of the HTML -> markdown conversion.
+
+usage: python benchmarks/html_pipeline.py [fixtures_dir] [--repeat N]
+
+Compares the old pipeline (parse, re-serialize, parse again in html2text) with the
+single-parse pipeline on each available parser backend. Peak memory is measured with
+tracemalloc, i.e. Python heap only (lxml's own C allocations are not included).
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import tracemalloc
+
+# Add the repo root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html2text
+from bs4 import BeautifulSoup
+from utils import url_scrapper
+from utils.url_scrapper import html_to_markdown, clean_content
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "contacts")
+
+
+def legacy_html_to_markdown(html_content):
+    """The pipeline before the single-parse change, kept here as the baseline"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    title = soup.title.string if soup.title else "No Title"
+    markdown = html2text.HTML2Text().handle(str(clean_content(soup)))
+    BeautifulSoup(html_content, 'html.parser')  # the unused extra parse in scrape_page
+    return f"# {title}\n\n{markdown}"
+
+
+def directory_page(listings: int = 300) -> str:
+    """Synthetic large listing page, the kind of page stage 1 spends most of its time on"""
+    rows = "\n".join(
+        f'<div class="listing"><h2>Company {i}</h2><p>Commercial and residential construction, '
+        f'remodeling and design-build services.</p><p><a href="mailto:info@company{i}.com">info@company{i}.com</a> '
+        f'| <a href="tel:+1303555{i:04d}">(303) 555-{i:04d}</a></p><a href="/company-{i}">Read more</a></div>'
+        for i in range(listings)
+    )
+    return (f"<html><head><title>Top {listings} companies</title><script>var tracking = 1;</script></head>"
+            f"<body><nav>{'<a href=#>menu</a>' * 50}</nav>{rows}<footer>footer</footer></body></html>")
+
+
+def measure(convert, html_content, repeat):
+    tracemalloc.start()
+    start = time.process_time()
+    for _ in range(repeat):
+        convert(html_content)
+    cpu = (time.process_time() - start) / repeat
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return cpu, peak
+
+
+def run(fixtures_dir: str = DEFAULT_FIXTURES_DIR, repeat: int = 5):
+    pages = {os.path.basename(f): open(f, "r", encoding="utf-8").read() for f in sorted(glob.glob(os.path.join(fixtures_dir, "*.html")))}
+    pages["synthetic_directory_300.html"] = directory_page(300)
+
+    pipelines = {"legacy (3 parses)": legacy_html_to_markdown,
+                 "single parse / html.parser": lambda h: html_to_markdown(h, parser="html.parser")}
+    if url_scrapper.lxml is not None:
+        pipelines["single parse / lxml"] = lambda h: html_to_markdown(h, parser="lxml")
+
+    print(f"{'page':32} {'pipeline':28} {'cpu ms/page':>12} {'peak KiB':>10}")
+    totals = {name: [0.0, 0] for name in pipelines}
+    for page_name, html_content in pages.items():
+        for name, convert in pipelines.items():
+            cpu, peak = measure(convert, html_content, repeat)
+            totals[name][0] += cpu
+            totals[name][1] = max(totals[name][1], peak)
+            print(f"{page_name:32} {name:28} {cpu * 1000:12.2f} {peak / 1024:10.0f}")
+
+    print("-" * 86)
+    for name, (cpu, peak) in totals.items():
+        print(f"{'TOTAL':32} {name:28} {cpu * 1000:12.2f} {peak / 1024:10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures_dir", nargs="?", default=DEFAULT_FIXTURES_DIR)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.fixtures_dir, args.repeat)
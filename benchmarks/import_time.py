@@ -0,0 +1,79 @@
+# benchmarks/import_time.py
+"""
+Cold import time of the project modules, from `python -X importtime`.
+
+usage: python benchmarks/import_time.py [--budget-ms 600] [--repeat 3] [--top 15]
+
+Each module is imported in a fresh interpreter `repeat` times and the fastest run counts.
+Exits with status 1 when a module goes over the budget or imports one of the LLM provider
+packages, which must only be loaded when a provider is actually used (utils/llm_clients.py).
+"""
+import os
+import re
+import sys
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["ai_company_info_scrapper", "email_composer", "send_mails"]
+# heavy packages that only one provider needs
+LAZY_PACKAGES = ["langchain_openai", "langchain_ollama", "langchain_groq", "langchain_google_genai", "langchain_deepseek",
+                 "langchain.schema", "langchain.tools"]
+
+LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def measure(module: str) -> Tuple[float, List[Tuple[str, int, int]]]:
+    """Import module in a fresh interpreter. Returns (cumulative ms, [(name, depth, cumulative us)])"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    imports = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if not match:
+            continue
+        # top level imports are indented by one space, each nesting level adds two
+        cumulative, depth, name = int(match.group(2)), (len(match.group(3)) - 1) // 2, match.group(4)
+        imports.append((name, depth, cumulative))
+        if name == module and depth == 0:
+            total_us = cumulative
+    return total_us / 1000, imports
+
+
+def run(args) -> int:
+    failures = []
+    print(f"{'module':28} {'import ms':>10}")
+    for module in MODULES:
+        runs = [measure(module) for _ in range(args.repeat)]
+        total_ms, imports = min(runs, key=lambda run: run[0])
+        print(f"{module:28} {total_ms:10.1f}")
+
+        # slowest direct dependencies of this module
+        direct: Dict[str, int] = {name: us for name, depth, us in imports if depth == 1}
+        for name, us in sorted(direct.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {name:40} {us / 1000:8.1f} ms")
+
+        loaded = {name for name, _, _ in imports}
+        eager = [package for package in LAZY_PACKAGES if package in loaded]
+        if eager:
+            failures.append(f"{module} imports {', '.join(eager)} at import time")
+        if total_ms > args.budget_ms:
+            failures.append(f"{module} takes {total_ms:.0f} ms to import, budget is {args.budget_ms:.0f} ms")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        return 1
+    print(f"\nOK: all modules under {args.budget_ms:.0f} ms, no provider package imported eagerly")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=600, help="max cold import time per module")
+    parser.add_argument("--repeat", type=int, default=3, help="imports per module, the fastest counts")
+    parser.add_argument("--top", type=int, default=8, help="slowest direct imports to list per module")
+    sys.exit(run(parser.parse_args()))
@@ -0,0 +1,67 @@
+# benchmarks/send_failures.py
+"""
+Check how send failures are classified, against a local SMTP sink.
+
+usage: python benchmarks/send_failures.py [--messages 10] [--quota 3]
+
+The sink answers MAIL FROM with gmail's "550 5.4.5 Daily user sending quota exceeded" once quota
+messages were delivered. That is about the account, not the message: the run must stop with the
+rest of the queue still pending, none of it dead-lettered. Exits with status 1 when it is not.
+"""
+import os
+import sys
+import smtplib
+import argparse
+import tempfile
+import contextlib
+
+# Add the repo root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import send_mails
+from fakes import SMTPSink
+from send_throughput import write_emails_csv
+from utils.send_queue import DEAD, PENDING, SENT, SendQueue
+from utils.send_scheduler import is_permanent_failure
+
+CLASSIFICATION = [
+    ("550 5.1.1 unknown recipient", smtplib.SMTPRecipientsRefused({"a@b.com": (550, b"5.1.1 User unknown")}), True),
+    ("554 5.7.1 message rejected as spam", smtplib.SMTPDataError(554, b"5.7.1 Message rejected"), True),
+    ("550 5.4.5 quota on DATA", smtplib.SMTPDataError(550, b"5.4.5 Daily user sending quota exceeded."), False),
+    ("553 5.7.1 sender refused", smtplib.SMTPSenderRefused(553, b"5.7.1 Sender address rejected", "me@x.com"), False),
+    ("535 5.7.8 bad credentials", smtplib.SMTPAuthenticationError(535, b"5.7.8 Username and Password not accepted"), False),
+]
+
+
+def run(args) -> bool:
+    ok = True
+    for name, error, permanent in CLASSIFICATION:
+        result = is_permanent_failure(error)
+        ok &= result == permanent
+        print(f"{name:38} {'dead-letter' if result else 'stop run':12} {'ok' if result == permanent else 'WRONG'}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, "emails.csv")
+        queue_path = os.path.join(workdir, "queue.sqlite")
+        write_emails_csv(csv_path, args.messages)
+        with SMTPSink(quota=args.quota) as sink, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            send_mails.send_emails_from_csv(csv_path, "bench@example.com", "password",
+                                            smtp_server=sink.host, smtp_port=sink.port, use_tls=False,
+                                            rate_limit=False, queue_path=queue_path)
+        send_queue = SendQueue(queue_path)
+        counts = send_queue.counts(os.path.abspath(csv_path))
+        send_queue.close()
+
+    expected = {SENT: args.quota, PENDING: args.messages - args.quota, DEAD: 0}
+    got = {state: counts.get(state, 0) for state in expected}
+    print(f"quota {args.quota} of {args.messages}: {got} (expected {expected})")
+    return ok and got == expected
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--quota", type=int, default=3, help="messages the sink accepts before the quota 550")
+    passed = run(parser.parse_args())
+    print("OK" if passed else "FAILED")
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,78 @@
+# benchmarks/send_throughput.py
+"""
+SMTP send throughput against a local sink: a new connection per message vs pooled connections.
+
+usage: python benchmarks/send_throughput.py [--messages 200] [--smtp-latency 0.02] [--connect-latency 0.1]
+
+connect-latency is added to every new connection (stands in for the TCP, STARTTLS and AUTH
+round-trips of a real provider), smtp-latency to every accepted message. drop-after makes
+the sink hang up after that many messages per connection, to exercise reconnects.
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import tempfile
+import contextlib
+
+# Add the repo root to the path so we can import our modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import send_mails
+from fakes import SMTPSink
+
+
+def write_emails_csv(path: str, count: int):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter="|")
+        writer.writerow(["Company", "Email", "Subject", "Body"])
+        for i in range(count):
+            writer.writerow([f"Company {i}", f"info@company{i}.com", f"Quick idea for Company {i}",
+                             "Hi team,\n\nWe help companies like yours grow.\n\nBest Regards,\nTeam Benchmark"])
+
+
+def run(args):
+    original_connect = send_mails.SMTPConnectionPool._connect
+
+    def slow_connect(pool):
+        time.sleep(args.connect_latency)
+        return original_connect(pool)
+
+    send_mails.SMTPConnectionPool._connect = slow_connect
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            csv_path = os.path.join(workdir, "emails.csv")
+            write_emails_csv(csv_path, args.messages)
+            modes = [("per message", 1, 1)] + [(f"pool x{n}", n, send_mails.SMTP_MESSAGES_PER_CONNECTION)
+                                                for n in args.connections]
+            for name, connections, per_connection in modes:
+                with SMTPSink(latency=args.smtp_latency, drop_after=args.drop_after) as sink, \
+                     open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    start = time.perf_counter()
+                    send_mails.send_emails_from_csv(csv_path, "bench@example.com", "password",
+                                                    smtp_server=sink.host, smtp_port=sink.port, use_tls=False,
+                                                    connections=connections, messages_per_connection=per_connection,
+                                                    rate_limit=False,
+                                                    queue_path=os.path.join(workdir, f"queue_{len(rows)}.sqlite"))
+                    wall = time.perf_counter() - start
+                rows.append((name, wall, sink.received, sink.connections))
+    finally:
+        send_mails.SMTPConnectionPool._connect = original_connect
+
+    print("\n" + "=" * 60)
+    print(f"{'mode':14} {'wall s':>8} {'sent':>6} {'msgs/s':>8} {'connections':>12}")
+    for name, wall, received, connections in rows:
+        print(f"{name:14} {wall:8.2f} {received:6d} {received / wall if wall else 0:8.1f} {connections:12d}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--smtp-latency", type=float, default=0.02, help="sink latency per message (s)")
+    parser.add_argument("--connect-latency", type=float, default=0.1, help="added per new connection (s)")
+    parser.add_argument("--drop-after", type=int, default=0, help="sink hangs up after this many messages per connection")
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 4, 8], help="pool sizes to measure")
+    run(parser.parse_args())
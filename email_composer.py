@@ -1,13 +1,19 @@
 # email_composer.py
-from typing import List, Dict, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import csv
 import os
-from langchain.schema import HumanMessage, SystemMessage, BaseMessage
-from langchain_openai import ChatOpenAI
-from langchain_ollama import ChatOllama
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_groq import ChatGroq
-from langchain_deepseek import ChatDeepSeek
+import re
+import json
+from collections import deque
+from itertools import islice
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from utils.dedup import normalize_name
+from utils.llm_cache import CachedLLM, llm_cache_stats
+from utils.llm_usage import format_cache_stats, format_usage, usage_path, write_usage
+from utils.telemetry import span
+from utils.llm_clients import get_chat_model
+from utils.rate_limit import get_provider_limiter
 
 
 class CompanyExtractor:
@@ -15,61 +21,43 @@ class CompanyExtractor:
         self.llm = self._init_llm(provider, model_name, api_key)
 
     def _init_llm(self, provider: str, model_name: str, api_key: Optional[str]):
-        if provider == "openai":
-            return ChatOpenAI(model=model_name, openai_api_key=api_key)
-        elif provider == "ollama":
-            return ChatOllama(model=model_name)
-        elif provider == "deepseek":
-            return ChatDeepSeek(model=model_name, api_key=api_key)
-        elif provider == "groq":
-            return ChatGroq(model=model_name, api_key=api_key)
-        elif provider == "google":
-            return ChatGoogleGenerativeAI(model=model_name, api_key=api_key)
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
+        return get_chat_model(provider, model_name, api_key)
 
 
 class EmailGenerator:
-    def __init__(self, model_name: str, provider: str, api_key: Optional[str] = None):
-        """Initialize the cold email generator with the specified LLM."""
-        self.llm = self._init_llm(provider, model_name, api_key)
+    def __init__(self, model_name: str, provider: str, api_key: Optional[str] = None, cache_generations: bool = True,
+                 max_workers: int = 8, batch_size: int = 1, max_batch_retries: int = 1):
+        """
+        Initialize the cold email generator with the specified LLM.
+        Set cache_generations=False to always get fresh drafts instead of cached ones for a repeated request.
+        max_workers is the number of requests running at the same time (1 = one after another).
+        batch_size > 1 composes the emails of that many companies in one request (see generate_emails_batch),
+        emails that come back invalid are asked for again up to max_batch_retries times.
+        """
+        self.llm = CachedLLM(self._init_llm(provider, model_name, api_key), provider, model_name,
+                             enabled=cache_generations, rate_limiter=get_provider_limiter(provider))
+        self.usage = self.llm.usage
+        self.max_workers = max(1, max_workers)
+        self.batch_size = max(1, batch_size)
+        self.max_batch_retries = max(0, max_batch_retries)
         
     def _init_llm(self, provider: str, model_name: str, api_key: Optional[str]):
         """Initialize the language model based on the provider."""
-        if provider == "openai":
-            return ChatOpenAI(model=model_name, openai_api_key=api_key)
-        elif provider == "ollama":
-            return ChatOllama(model=model_name)
-        elif provider == "deepseek":
-            return ChatDeepSeek(model=model_name, api_key=api_key)
-        elif provider == "groq":
-            return ChatGroq(model=model_name, api_key=api_key)
-        elif provider == "google":
-            return ChatGoogleGenerativeAI(model=model_name, api_key=api_key)
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
+        return get_chat_model(provider, model_name, api_key)
     
     def read_company_data(self, csv_file_path: str) -> List[Dict]:
         """Read company data from the CSV file."""
-        company_data = []
+        return list(self.iter_company_data(csv_file_path))
+
+    def iter_company_data(self, csv_file_path: str) -> Iterator[Dict]:
+        """Read company data from the CSV file one row at a time."""
         with open(csv_file_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                company_data.append(row)
-        return company_data
+            yield from csv.DictReader(file)
     
-    def _construct_email_prompt(self, 
-                               target_company: Dict, 
-                               user_company_name: str, 
-                               user_company_description: str,
-                               additional_instructions: str,
-                               delimiter:str="|") -> List[BaseMessage]:
-        """Construct the prompt for generating a personalized cold email."""
-        target_name = target_company.get('Name', '')
-        target_services = target_company.get('Services/Products', '')
-        
-        prompt = [
-            SystemMessage(content=f"""You are a business development expert writing effective, personalized cold outreach emails. Emails must be professional, concise, and value-driven—avoiding generic language or templates.
+    @staticmethod
+    def _system_prompt(delimiter: str) -> str:
+        """Instructions shared by the single and the batched email prompts"""
+        return f"""You are a business development expert writing effective, personalized cold outreach emails. Emails must be professional, concise, and value-driven—avoiding generic language or templates.
 
 Each email should:
 - Reference the recipient's specific services/products.
@@ -92,7 +80,20 @@ Provide a complete, ready-to-send email with:
     Team UserCompany Inc
                           
 - DO NOT USE "{delimiter}" this symbol in your email subject or body. it is used as a delimiter to store subject and body in a csv file.
-"""),
+"""
+
+    def _construct_email_prompt(self, 
+                               target_company: Dict, 
+                               user_company_name: str, 
+                               user_company_description: str,
+                               additional_instructions: str,
+                               delimiter:str="|") -> List[BaseMessage]:
+        """Construct the prompt for generating a personalized cold email."""
+        target_name = target_company.get('Name', '')
+        target_services = target_company.get('Services/Products', '')
+        
+        prompt = [
+            SystemMessage(content=self._system_prompt(delimiter)),
             
             HumanMessage(content=f"""Create a personalized cold email from {user_company_name} to {target_name}.
 
@@ -120,12 +121,53 @@ The email should:
         ]
         return prompt
     
+    def _construct_batch_email_prompt(self,
+                                      target_companies: List[Dict],
+                                      user_company_name: str,
+                                      user_company_description: str,
+                                      additional_instructions: str,
+                                      delimiter: str = "|") -> List[BaseMessage]:
+        """Construct one prompt for the cold emails of several companies, recipients are numbered R1..Rn."""
+        recipients = "\n".join(f"- R{number}:\n    Company Name: {company.get('Name', '')}\n    Services/Products they offer: {company.get('Services/Products', '')}"
+                               for number, company in enumerate(target_companies, 1))
+        prompt = [
+            SystemMessage(content=self._system_prompt(delimiter)),
+
+            # everything up to the recipient list is the same for every batch of a campaign
+            HumanMessage(content=f"""Create a personalized cold email from {user_company_name} to each of the recipient companies listed below. Write a separate email for every recipient, based only on that recipient's information.
+
+SENDER COMPANY INFORMATION:
+- Company Name: {user_company_name}
+- Company Description: {user_company_description}
+
+ADDITIONAL INSTRUCTIONS:
+{additional_instructions}
+
+RECIPIENT COMPANIES:
+{recipients}
+
+Output format should be a JSON array with one object per recipient, in the order above, with these fields:
+- id: the recipient id (R1, R2, ...)
+- company: the recipient company name
+- subject: A compelling subject line that will increase open rates
+- body: The personalized email body (keep it under 200 words)
+
+Each email should:
+1. Specifically reference the recipient's services/products
+2. Clearly articulate how your company can provide value to them
+3. Include a clear, low-pressure call-to-action
+4. Be professional but conversational in tone
+5. Avoid generic phrases and sales-speak""")
+        ]
+        return prompt
+
     def generate_email(self, 
                       target_company: Dict, 
                       user_company_name: str, 
                       user_company_description: str,
-                      additional_instructions: str) -> Dict:
-        """Generate a personalized email for a target company."""
+                      additional_instructions: str,
+                      retry: bool = False) -> Dict:
+        """Generate a personalized email for a target company. retry=True marks a repeated request in the usage."""
         prompt = self._construct_email_prompt(
             target_company, 
             user_company_name, 
@@ -134,7 +176,7 @@ The email should:
         )
         
         # Get response from the LLM
-        response = self.llm.invoke(prompt)
+        response = self.llm.invoke(prompt, stage="generate_email", retry=retry)
         content = response.content
         
         # Extract JSON from response if needed
@@ -183,51 +225,258 @@ The email should:
                 "body": content.strip()
             }
     
+    def generate_emails_batch(self,
+                              target_companies: List[Dict],
+                              user_company_name: str,
+                              user_company_description: str,
+                              additional_instructions: str) -> List[Dict]:
+        """
+        Generate the emails of several companies with one LLM request. Returns one email per company, in order.
+
+        Every email in the answer is checked on its own: it must carry the recipient's id and name and a
+        non-empty subject and body. Only the companies whose email failed are asked for again (in one
+        request), up to max_batch_retries times, then with one generate_email call each.
+        """
+        args = (user_company_name, user_company_description, additional_instructions)
+        emails: List[Optional[Dict]] = [None] * len(target_companies)
+        missing = list(range(len(target_companies)))
+        for attempt in range(self.max_batch_retries + 1):
+            if len(missing) < 2:
+                break
+            found = self._request_batch([target_companies[index] for index in missing], *args, retry=attempt > 0)
+            missing_before = len(missing)
+            for position, index in enumerate(list(missing)):
+                if position in found:
+                    emails[index] = found[position]
+                    missing.remove(index)
+            if missing:
+                print(f"⚠️ {len(missing)}/{missing_before} emails of a batch were invalid (attempt {attempt + 1})")
+
+        for index in missing:
+            emails[index] = self.generate_email(target_companies[index], *args, retry=True)
+        return emails
+
+    def _request_batch(self, target_companies: List[Dict], user_company_name: str,
+                       user_company_description: str, additional_instructions: str, retry: bool = False) -> Dict[int, Dict]:
+        """One batched request. Returns the valid emails by position in target_companies."""
+        prompt = self._construct_batch_email_prompt(target_companies, user_company_name,
+                                                    user_company_description, additional_instructions)
+        content = self.llm.invoke(prompt, stage="generate_email_batch", retry=retry).content
+        start, end = content.find('['), content.rfind(']') + 1
+        try:
+            items = json.loads(content[start:end] if start != -1 and end != 0 else content)
+            if not isinstance(items, list):
+                raise ValueError(f"expected a JSON array, got {type(items).__name__}")
+        except (ValueError, json.JSONDecodeError) as e:
+            print(f"⚠️ Batched email response could not be parsed: {e}")
+            return {}
+
+        found = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            match = re.fullmatch(r"R(\d+)", str(item.get("id", "")).strip())
+            position = int(match.group(1)) - 1 if match else -1
+            if not 0 <= position < len(target_companies) or position in found:
+                continue
+            subject, body = item.get("subject"), item.get("body")
+            if not isinstance(subject, str) or not isinstance(body, str) or not subject.strip() or not body.strip():
+                continue
+            # an email written for another recipient of the batch
+            name = target_companies[position].get('Name', '')
+            if item.get("company") and normalize_name(str(item["company"])) != normalize_name(name):
+                continue
+            found[position] = {"subject": subject.strip(), "body": body.strip()}
+        return found
+
+    def _generate_chunk(self, chunk: List[Dict], *args) -> List[Dict]:
+        if len(chunk) == 1:
+            return [self.generate_email(chunk[0], *args)]
+        return self.generate_emails_batch(chunk, *args)
+
+    def generate_emails(self,
+                        companies: Iterable[Dict],
+                        user_company_name: str,
+                        user_company_description: str,
+                        additional_instructions: str = "",
+                        progress_callback: Optional[Callable[[int, Dict], None]] = None) -> Iterator[Tuple[Dict, Dict]]:
+        """
+        Generate emails for many companies, up to max_workers requests at a time, each for batch_size companies.
+        Yields (company, email_content) in input order. progress_callback(done_count, company)
+        is called on the caller's thread as each email completes, in completion order.
+        """
+        args = (user_company_name, user_company_description, additional_instructions)
+        companies = iter(companies)
+        chunks = iter(lambda: list(islice(companies, self.batch_size)), [])
+        done = 0
+        if self.max_workers == 1:
+            for chunk in chunks:
+                for company, email_content in zip(chunk, self._generate_chunk(chunk, *args)):
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done, company)
+                    yield company, email_content
+            return
+
+        pending = deque()  # (chunk, future) in input order
+        reported = set()
+        # only a bounded window of chunks is submitted ahead, so the input can be streamed
+        window = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            try:
+                while True:
+                    while len(pending) < window:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            break
+                        pending.append((chunk, executor.submit(self._generate_chunk, chunk, *args)))
+                    if not pending:
+                        return
+
+                    if not pending[0][1].done():
+                        wait([future for _, future in pending if future not in reported], return_when=FIRST_COMPLETED)
+                    for chunk, future in pending:
+                        if future.done() and future not in reported:
+                            reported.add(future)
+                            for company in chunk:
+                                done += 1
+                                if progress_callback:
+                                    progress_callback(done, company)
+
+                    # hand out finished results from the head so the output order is the input order
+                    while pending and pending[0][1] in reported:
+                        chunk, future = pending.popleft()
+                        reported.discard(future)
+                        yield from zip(chunk, future.result())
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
     def process_companies(self, 
                       csv_input_path: str, 
                       csv_file_name: str,
                       user_company_name: str,
                       user_company_description: str,
                       additional_instructions: str = "",
-                      delimiter:str="|") -> None:
-        """Process all companies and generate personalized emails."""
-        # Read company data
-        companies = self.read_company_data(csv_input_path)
+                      delimiter:str="|",
+                      resume: bool = True) -> int:
+        """
+        Process all companies and generate personalized emails.
+        Each email is appended to the output CSV as soon as it is composed. With resume=True an
+        existing output file is the checkpoint: companies already in it are skipped.
+        Returns the number of emails composed by this call. Its LLM usage goes to <output>_usage.json.
+        """
+        output_folder_name = "composed_emails"
+        os.makedirs(output_folder_name, exist_ok=True)
+        csv_output_path = os.path.join(output_folder_name, csv_file_name)
 
-        # Create output data structure
-        output_data = []
+        self.usage.reset()
+        cache_stats = {"llm": llm_cache_stats()}
+        with ComposedEmailsCSV(csv_output_path, name_column='Company', delimiter=delimiter, resume=resume) as output:
+            if output.done:
+                print(f"↩️ Resuming: {len(output.done)} emails already in {csv_output_path}")
 
-        # Process each company
-        for company in companies:
-            if not company.get('Email'):
-                continue
-                
-            email_content = self.generate_email(
-                company,
-                user_company_name,
-                user_company_description,
-                additional_instructions
-
-            )
-            
-            output_data.append([
+            # Read company data lazily, only companies with an email that are not composed yet
+            companies = (company for company in self.iter_company_data(csv_input_path)
+                         if company.get('Email') and not output.is_done(company))
+
+            # Compose concurrently, results come back in input order
+            composed = 0
+            for company, email_content in self.generate_emails(
+                    companies,
+                    user_company_name,
+                    user_company_description,
+                    additional_instructions,
+                    progress_callback=lambda done, company: print(f"✉️ Composed {done}: {company.get('Name', '')}")):
+                output.write(company, email_content)
+                composed += 1
+
+        print(f"✅ Generated {composed} emails and saved to {csv_output_path}")
+        self.write_usage(csv_output_path)
+        print(f"Cache use of this run:\n{format_cache_stats(cache_stats, {'llm': llm_cache_stats()})}")
+        return composed
+
+    def write_usage(self, output_csv_path: str) -> str:
+        """Write the LLM usage since the last usage.reset() next to the output CSV. Returns the file path."""
+        summary = self.usage.summary()
+        path = usage_path(output_csv_path)
+        write_usage(path, summary)
+        print(f"LLM usage:\n{format_usage(summary)}")
+        return path
+
+
+class ComposedEmailsCSV:
+    """
+    Append-only composed emails CSV that doubles as the resume checkpoint. Rows are flushed
+    as they are written, so a crash only loses the emails still being composed.
+    """
+    def __init__(self, path: str, name_column: str = 'Company', delimiter: str = '|', resume: bool = True):
+        self.path = path
+        self.name_column = name_column
+        self.delimiter = delimiter
+        self.header = [name_column, 'Email', 'Subject', 'Body']
+        self.done = set()
+
+        if resume and os.path.exists(path) and os.path.getsize(path) > 0:
+            self._load_checkpoint()
+            self.file = open(path, 'a', newline='', encoding='utf-8')
+            self.writer = csv.writer(self.file, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL)
+        else:
+            self.file = open(path, 'w', newline='', encoding='utf-8')
+            self.writer = csv.writer(self.file, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL)
+            self.writer.writerow(self.header)
+            self.file.flush()
+
+    @staticmethod
+    def _key(name: str, email: str) -> Tuple[str, str]:
+        return name.strip().lower(), email.strip().lower()
+
+    def _load_checkpoint(self):
+        """Collect the companies already composed, dropping a row cut off by a crash"""
+        with open(self.path, 'r', newline='', encoding='utf-8') as file:
+            complete = file.read().endswith('\n')
+            file.seek(0)
+            rows = [row for row in csv.reader(file, delimiter=self.delimiter)]
+        if not rows:
+            return
+        header, rows = rows[0], rows[1:]
+        if not complete and rows:
+            rows = rows[:-1]
+            # rewrite without the partial last row before appending to it
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file, delimiter=self.delimiter, quoting=csv.QUOTE_MINIMAL)
+                writer.writerow(header)
+                writer.writerows(rows)
+            os.replace(tmp_path, self.path)
+        for row in rows:
+            if len(row) == len(header):
+                record = dict(zip(header, row))
+                self.done.add(self._key(record.get(self.name_column, ''), record.get('Email', '')))
+
+    def is_done(self, company: Dict) -> bool:
+        return self._key(company.get('Name', ''), company.get('Email', '')) in self.done
+
+    def write(self, company: Dict, email_content: Dict):
+        with span("csv_write", file="emails") as trace:
+            self.writer.writerow([
                 company.get('Name', ''),
                 company.get('Email', ''),
                 email_content.get('subject', ''),
                 email_content.get('body', '')
             ])
+            self.file.flush()
+            trace.set(rows=1)
+        self.done.add(self._key(company.get('Name', ''), company.get('Email', '')))
 
-        # Write to CSV with custom delimiter
-        output_folder_name = "composed_emails"
-        os.makedirs(output_folder_name, exist_ok=True)
-        csv_output_path = os.path.join(output_folder_name, csv_file_name)
-        with open(csv_output_path, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file, delimiter=delimiter, quoting=csv.QUOTE_MINIMAL)
-            writer.writerow(['Company', 'Email', 'Subject', 'Body'])
-            writer.writerows(output_data)
+    def close(self):
+        self.file.close()
 
-        print(f"✅ Generated {len(output_data)} emails and saved to {csv_output_path}")
+    def __enter__(self):
+        return self
 
+    def __exit__(self, *exc):
+        self.close()
 
 
 def pretty_print_emails(csv_file_path: str, delimiter='|'):
@@ -1,43 +1,262 @@
 # send_mails.py
 import smtplib
 import csv
+import queue
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
 from email.message import EmailMessage
 import os
 from dotenv import load_dotenv
+from utils.send_scheduler import DailyLimitReached, FailedEmailsCSV, SendScheduler, get_account_limiter, is_permanent_failure
+from utils.send_queue import DEAD, PENDING, SENDING, SENT, SEND_QUEUE_PATH, SEND_QUEUE_STALE_MINUTES, SendQueue
+from utils.telemetry import count, span
 load_dotenv()
 
 FAKE_RECEIVER_EMAIL_ID=os.getenv("FAKE_RECEIVER_EMAIL_ID","fake_account@email.com")
 REDIRECT_EMAILS_TO_FAKE_RECEIVER=os.getenv("REDIRECT_EMAILS_TO_FAKE_RECEIVER","true")
 REDIRECT_EMAILS_TO_FAKE_RECEIVER = REDIRECT_EMAILS_TO_FAKE_RECEIVER.lower()=="true"
 
-def send_emails_from_csv(csv_path: str, sender_email: str, sender_password: str, smtp_server='smtp.gmail.com', smtp_port=587):
+# reconnect after this many messages on one connection, providers cap messages per session
+SMTP_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MESSAGES_PER_CONNECTION", "100"))
+
+
+class SMTPConnectionPool:
+    """
+    Pool of up to `size` authenticated SMTP connections. Connections are opened on first use
+    and reused for up to messages_per_connection messages. A connection the server has
+    dropped (SMTPServerDisconnected or a 421 reply) is reopened and the message retried once.
+    """
+    def __init__(self, smtp_server: str, smtp_port: int, sender_email: str, sender_password: str,
+                 use_tls: bool = True, size: int = 1, messages_per_connection: int = SMTP_MESSAGES_PER_CONNECTION,
+                 timeout: float = 30):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.use_tls = use_tls
+        self.messages_per_connection = max(1, messages_per_connection)
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._lock = threading.Lock()
+        # idle slots: [connection or None, messages sent on it]
+        self._idle = queue.LifoQueue()
+        for _ in range(max(1, size)):
+            self._idle.put([None, 0])
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return server
+
+    @staticmethod
+    def _disconnect(server: Optional[smtplib.SMTP]):
+        if server is None:
+            return
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    @contextmanager
+    def _slot(self):
+        slot = self._idle.get()
+        try:
+            yield slot
+        finally:
+            self._idle.put(slot)
+
+    def send(self, msg: EmailMessage):
+        """Send one message on an idle connection, blocking while all connections are busy"""
+        with span("smtp_send") as trace, self._slot() as slot:
+            for attempt in (1, 2):
+                if slot[0] is None or slot[1] >= self.messages_per_connection:
+                    self._disconnect(slot[0])
+                    slot[0], slot[1] = self._connect(), 0
+                    count("smtp_connections")
+                try:
+                    slot[0].send_message(msg)
+                    slot[1] += 1
+                    trace.set(attempts=attempt)
+                    return
+                except (smtplib.SMTPServerDisconnected, smtplib.SMTPResponseException) as e:
+                    dropped = isinstance(e, smtplib.SMTPServerDisconnected) or e.smtp_code == 421
+                    if not dropped:
+                        raise
+                    self._disconnect(slot[0])
+                    slot[0], slot[1] = None, 0
+                    if attempt == 2:
+                        raise
+
+    def close(self):
+        while True:
+            try:
+                slot = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._disconnect(slot[0])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def recipient_address(row: Dict[str, str]) -> str:
+    """Address a composed emails CSV row is actually sent to"""
+    # check if emails are to send to actula receiver emial accouts
+    if REDIRECT_EMAILS_TO_FAKE_RECEIVER:
+        return FAKE_RECEIVER_EMAIL_ID # ----------->for development purpose
+    return row['Email'] #------------>for production: sends to real emails.
+
+
+def build_message(recipient: str, subject: str, body: str, sender_email: str, key: str = "") -> EmailMessage:
+    """Build one email. key (the send queue idempotency key) gives a stable Message-ID, so a resend is recognisable."""
+    msg = EmailMessage()
+    msg['From'] = sender_email
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    if key:
+        msg['Message-ID'] = f"<{key[:32]}@{sender_email.rsplit('@', 1)[-1] or 'localhost'}>"
+    msg.set_content(body)
+    return msg
+
+
+def send_emails_from_csv(csv_path: str, sender_email: str, sender_password: str, smtp_server='smtp.gmail.com', smtp_port=587,
+                         use_tls: bool = True, connections: int = 1,
+                         messages_per_connection: int = SMTP_MESSAGES_PER_CONNECTION,
+                         rate_limit: bool = True, queue_path: str = SEND_QUEUE_PATH,
+                         progress_callback: Optional[Callable[[int, int, str], None]] = None) -> int:
+    """
+    Send every email in a composed emails CSV ('|' delimited) over a pool of reused SMTP connections.
+    connections > 1 sends that many messages in parallel. use_tls=False is only meant for local test
+    SMTP servers. Returns the number of emails sent.
+
+    Rows are loaded into the durable send queue at queue_path first and every delivery is recorded
+    there, so running again with the same CSV (after a crash, or to send what the daily limit held
+    back) only sends what has not gone out yet.
+
+    With rate_limit=True sends stay within the account's per-minute and per-day limits (SMTP_RATE_* in .env).
+    Temporary (4xx) failures are retried with backoff. Rows that failed for good are written to <csv>_failed.csv.
+
+    progress_callback(processed, total, message) is called after each queued email is sent or failed.
+    """
+    campaign = os.path.abspath(csv_path)
+    root, ext = os.path.splitext(csv_path)
+    send_queue = SendQueue(queue_path)
+
     with open(csv_path, 'r', encoding='utf-8') as file:
         reader = csv.DictReader(file, delimiter='|')
-        for idx, row in enumerate(reader, start=1):
-            recipient = row['Email']
-            subject = row['Subject']
-            body = row['Body']
+        fieldnames = reader.fieldnames or []
+        loaded = send_queue.enqueue_many(campaign, sender_email, (
+            {"recipient": recipient_address(row), "subject": row['Subject'], "body": row['Body'],
+             "company": row.get(fieldnames[0], '') if fieldnames else '', "email": row['Email']}
+            for row in reader))
+    recovered = send_queue.recover_stale(campaign)
+    if loaded.get(SENT) or loaded.get(DEAD) or recovered:
+        print(f"↩️ Resuming: {loaded.get(SENT, 0)} already sent, {loaded.get(DEAD, 0)} failed before, "
+              f"{recovered} interrupted sends queued again")
 
-            msg = EmailMessage()
-            msg['From'] = sender_email
+    total = send_queue.counts(campaign).get(PENDING, 0)
+    processed = 0
+    sent = 0
+    sent_lock = threading.Lock()
 
-            # check if emails are to send to actula receiver emial accouts
-            if REDIRECT_EMAILS_TO_FAKE_RECEIVER:
-                msg["To"]=FAKE_RECEIVER_EMAIL_ID # ----------->for development purpose
-            else:
-                msg['To'] = recipient #------------>for production: sends to real emails.
+    def report(message: str):
+        nonlocal processed
+        with sent_lock:
+            processed += 1
+            done = processed
+        if progress_callback:
+            progress_callback(done, total, message)
+    daily_limit_reached = threading.Event()
+    stopped = threading.Event()
+    failed = FailedEmailsCSV(f"{root}_failed{ext or '.csv'}", fieldnames)
 
-            msg['Subject'] = subject
-            msg.set_content(body)
+    with SMTPConnectionPool(smtp_server, smtp_port, sender_email, sender_password, use_tls=use_tls,
+                            size=connections, messages_per_connection=messages_per_connection) as pool:
+        limiter = None
+        if rate_limit:
+            # the daily quota is per account, not per run: sends of earlier runs today count against it
+            limiter = get_account_limiter(sender_email, send_queue.sent_since(sender_email, time.time() - 86400))
+        scheduler = SendScheduler(pool, limiter)
 
+        def send_one(message: Dict):
+            nonlocal sent
+            if stopped.is_set():
+                send_queue.release(message['key'], "run stopped")
+                return
             try:
-                with smtplib.SMTP(smtp_server, smtp_port) as server:
-                    server.starttls()
-                    server.login(sender_email, sender_password)
-                    server.send_message(msg)
-                print(f"✅ Sent email {idx} to {recipient}")
+                scheduler.send(build_message(message['recipient'], message['subject'], message['body'],
+                                             sender_email, key=message['key']))
+            except DailyLimitReached as e:
+                daily_limit_reached.set()
+                stopped.set()
+                send_queue.release(message['key'], str(e))
+                return
             except Exception as e:
-                print(f"❌ Failed to send email to {recipient}: {e}")
+                if not is_permanent_failure(e):
+                    # the server or the account is the problem, not this message: keep it and stop
+                    send_queue.release(message['key'], str(e))
+                    if not stopped.is_set():
+                        stopped.set()
+                        print(f"❌ Stopped sending, {message['email']} failed with: {e}")
+                    return
+                print(f"❌ Failed to send email to {message['email']}: {e}")
+                send_queue.mark_dead(message['key'], str(e))
+                failed.write({fieldnames[0] if fieldnames else 'Company': message['company'], 'Email': message['email'],
+                              'Subject': message['subject'], 'Body': message['body']}, str(e))
+                report(f"Failed to send to {message['email']}")
+                return
+            send_queue.mark_sent(message['key'])
+            with sent_lock:
+                sent += 1
+                idx = sent
+            print(f"✅ Sent email {idx} to {message['email']}")
+            report(f"Sent email to {message['email']}")
+
+        def worker(name: str):
+            # claim small batches so parallel workers share the queue evenly
+            while not stopped.is_set():
+                batch = send_queue.claim(campaign, name, batch_size=10)
+                if not batch:
+                    return
+                for message in batch:
+                    send_one(message)
+
+        try:
+            if connections <= 1:
+                worker("worker-0")
+            else:
+                with ThreadPoolExecutor(max_workers=connections) as executor:
+                    for future in [executor.submit(worker, f"worker-{i}") for i in range(connections)]:
+                        future.result()
+        finally:
+            failed.close()
+
+    counts = send_queue.counts(campaign)
+    send_queue.close()
+    print(f"📨 Sent {sent} emails over {pool.connections_opened} SMTP connection(s)")
+    if failed.count:
+        print(f"❌ {failed.count} emails failed permanently, see {failed.path}")
+    if counts.get(PENDING):
+        reason = "Daily send limit reached" if daily_limit_reached.is_set() else "Sending stopped"
+        print(f"⏸️ {reason}, {counts[PENDING]} emails left for the next run with this CSV")
+    if counts.get(SENDING):
+        print(f"⏳ {counts[SENDING]} emails are still marked as being sent, by another run or by one that stopped less "
+              f"than {SEND_QUEUE_STALE_MINUTES:g} minutes ago. A later run sends them again after that.")
+    return sent
 
 if __name__=="__main__":
     # Example usage
@@ -0,0 +1,50 @@
+# utils/concurrency.py
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+# limits on LLM and search API calls in flight at once, across all threads of the process.
+# batch_runner.py replaces them with semaphores shared by all of its processes. configure it from .env
+load_dotenv()
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "0"))  # -----------> 0 means unlimited
+SEARCH_MAX_CONCURRENCY = int(os.getenv("SEARCH_MAX_CONCURRENCY", "0"))
+
+LLM, SEARCH = "llm", "search"
+DEFAULT_LIMITS = {LLM: LLM_MAX_CONCURRENCY, SEARCH: SEARCH_MAX_CONCURRENCY}
+
+_budgets: Dict[str, Optional[object]] = {}
+_budgets_lock = threading.Lock()
+
+
+def set_budget(name: str, semaphore):
+    """
+    Use semaphore as the budget for name. Anything with acquire()/release() works, e.g. a
+    multiprocessing Manager semaphore shared with other processes. None removes the limit.
+    """
+    with _budgets_lock:
+        _budgets[name] = semaphore
+
+
+def get_budget(name: str):
+    """The semaphore limiting name, created from the .env limit on first use (None when unlimited)"""
+    with _budgets_lock:
+        if name not in _budgets:
+            limit = DEFAULT_LIMITS.get(name, 0)
+            _budgets[name] = threading.BoundedSemaphore(limit) if limit > 0 else None
+        return _budgets[name]
+
+
+@contextmanager
+def budget(name: str):
+    """Hold one slot of the name budget for the duration of the block"""
+    semaphore = get_budget(name)
+    if semaphore is None:
+        yield
+        return
+    semaphore.acquire()
+    try:
+        yield
+    finally:
+        semaphore.release()
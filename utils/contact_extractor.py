@@ -0,0 +1,213 @@
+# utils/contact_extractor.py
+import re
+import json
+import html
+from typing import List, Dict, Tuple
+from urllib.parse import unquote, urlparse
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+MAILTO_RE = re.compile(r"mailto:([^\"'?<>\s)\]]+)", re.IGNORECASE)
+TEL_RE = re.compile(r"tel:([^\"'<>\s)\]]+)", re.IGNORECASE)
+CFEMAIL_RE = re.compile(r"data-cfemail=[\"']([0-9a-fA-F]+)[\"']")
+JSON_LD_RE = re.compile(r"<script[^>]*type=[\"']application/ld\+json[\"'][^>]*>(.*?)</script>", re.IGNORECASE | re.DOTALL)
+OBFUSCATED_EMAIL_RE = re.compile(
+    r"([A-Za-z0-9._%+-]+)\s*[\[\(\{<]\s*at\s*[\]\)\}>]\s*"
+    r"([A-Za-z0-9-]+(?:\s*(?:[\[\(\{<]\s*dot\s*[\]\)\}>]|\.)\s*[A-Za-z0-9-]+)+)",
+    re.IGNORECASE,
+)
+OBFUSCATED_DOT_RE = re.compile(r"\s*[\[\(\{<]\s*dot\s*[\]\)\}>]\s*", re.IGNORECASE)
+# the lookahead skips runs of years ("2024 2025 2026") that have the shape of a phone number
+PHONE_RE = re.compile(r"(?<![\w+])(?!(?:19|20)\d\d[\s.-](?:19|20)\d\d\b)(?:\+\d{1,3}[\s.-]?)?(?:\(\d{2,4}\)[\s.-]?|\d{2,4}[\s.-])\d{3,4}[\s.-]?\d{3,4}(?![\w])")
+
+# emails that show up in page source but are never a business contact
+JUNK_EMAIL_DOMAINS = {"example.com", "example.org", "domain.com", "email.com", "yourdomain.com",
+                      "sentry.io", "wixpress.com", "sentry-next.wixpress.com", "sentry.wixpress.com"}
+JUNK_EMAIL_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".css", ".js")
+
+# directories and review sites: their own addresses (support@, privacy@) show up in listings and snippets
+LISTING_DOMAINS = {"yelp.com", "buildzoom.com", "yellowpages.com", "bbb.org", "angi.com", "angieslist.com",
+                   "homeadvisor.com", "houzz.com", "thumbtack.com", "porch.com", "manta.com", "mapquest.com",
+                   "nextdoor.com", "facebook.com", "linkedin.com", "instagram.com", "google.com"}
+
+# words ignored when matching a company name against an email domain
+NAME_STOPWORDS = {"the", "and", "inc", "llc", "ltd", "limited", "co", "corp", "corporation", "company",
+                  "group", "services", "service", "solutions", "pvt", "private", "plc", "gmbh", "of"}
+
+# trade and descriptive words that many unrelated companies share: a domain matching only these
+# (peakconstruction.com for "Summit Construction") belongs to another company as often as not
+GENERIC_NAME_WORDS = {
+    "construction", "constructions", "builders", "builder", "building", "contractors", "contractor",
+    "contracting", "roofing", "roofers", "plumbing", "plumbers", "electric", "electrical", "electricians",
+    "hvac", "heating", "cooling", "air", "landscaping", "landscape", "painting", "painters", "remodeling",
+    "renovation", "renovations", "restoration", "homes", "home", "design", "designs", "engineering",
+    "architects", "architecture", "concrete", "paving", "cleaning", "law", "legal", "attorneys", "lawyers",
+    "dental", "dentistry", "medical", "clinic", "health", "realty", "real", "estate", "properties",
+    "property", "insurance", "accounting", "consulting", "consultants", "marketing", "media", "studio",
+    "tech", "technologies", "technology", "systems", "software", "digital", "global", "international",
+    "national", "pros", "pro", "experts", "partners", "associates", "enterprises", "industries",
+}
+
+
+def _clean_email(email: str) -> str:
+    email = unquote(email).strip().strip(".,;:").lower()
+    if not EMAIL_RE.fullmatch(email):
+        return ""
+    domain = email.split("@", 1)[1]
+    if domain in JUNK_EMAIL_DOMAINS or email.endswith(JUNK_EMAIL_SUFFIXES):
+        return ""
+    return email
+
+
+def _clean_phone(phone: str) -> str:
+    phone = unquote(phone).strip()
+    digits = re.sub(r"\D", "", phone)
+    if not 7 <= len(digits) <= 15:
+        return ""
+    return phone
+
+
+def _decode_cfemail(encoded: str) -> str:
+    """Decode a Cloudflare obfuscated email (the `[email protected]` placeholders)"""
+    try:
+        key = int(encoded[:2], 16)
+        return "".join(chr(int(encoded[i:i + 2], 16) ^ key) for i in range(2, len(encoded), 2))
+    except ValueError:
+        return ""
+
+
+def _json_ld_contacts(text: str) -> Tuple[List[str], List[str]]:
+    """Collect email/telephone values from schema.org JSON-LD blocks (Organization, ContactPoint, ...)"""
+    emails, phones = [], []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "email" and isinstance(value, str):
+                    emails.append(value.replace("mailto:", ""))
+                elif key == "telephone" and isinstance(value, str):
+                    phones.append(value)
+                else:
+                    walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    for block in JSON_LD_RE.findall(text):
+        try:
+            walk(json.loads(html.unescape(block).strip()))
+        except ValueError:
+            continue
+    return emails, phones
+
+
+def _unique(values: List[str]) -> List[str]:
+    seen = set()
+    return [v for v in values if v and not (v in seen or seen.add(v))]
+
+
+def extract_contacts(text: str) -> Dict[str, List[str]]:
+    """
+    Extract contact details from raw HTML or markdown without calling an LLM
+
+    Args:
+        text (str): raw HTML, markdown or search result snippets
+
+    Returns:
+        dict: {"emails": [...], "phones": [...]} - unique values, structured sources
+              (JSON-LD, mailto:/tel: links) first and free text matches last
+    """
+    if not text:
+        return {"emails": [], "phones": []}
+
+    ld_emails, ld_phones = _json_ld_contacts(text)
+    emails = ld_emails + MAILTO_RE.findall(text)
+    emails += [_decode_cfemail(encoded) for encoded in CFEMAIL_RE.findall(text)]
+    emails += EMAIL_RE.findall(text)
+    emails += [f"{user}@{OBFUSCATED_DOT_RE.sub('.', domain)}" for user, domain in OBFUSCATED_EMAIL_RE.findall(text)]
+
+    phones = ld_phones + TEL_RE.findall(text)
+    phones += PHONE_RE.findall(text)
+
+    return {
+        "emails": _unique([_clean_email(e) for e in emails]),
+        "phones": _unique([_clean_phone(p) for p in phones]),
+    }
+
+
+def _matches_company(email: str, company_name: str) -> bool:
+    """
+    The email's domain names this company: it holds the whole name (summitconstruction.com) or all
+    of its distinctive words (summit-co.com), and no trade word the name lacks (denverplumbing.com
+    is not "Denver Roofing Pros")
+    """
+    domain_label = re.sub(r"[^a-z0-9]", "", email.split("@", 1)[1].rsplit(".", 1)[0])
+    words = re.findall(r"[a-z0-9]+", company_name.lower())
+    names = [w for w in words if w not in NAME_STOPWORDS]
+    if not names:
+        return False
+    if "".join(names) in domain_label or "".join(words) in domain_label:
+        return True
+    distinctive = [w for w in names if w not in GENERIC_NAME_WORDS]
+    if not any(len(w) >= 3 for w in distinctive) or not all(w in domain_label for w in distinctive):
+        return False
+    return not any(w in domain_label for w in GENERIC_NAME_WORDS if len(w) >= 4 and w not in names)
+
+
+def _host(url: str) -> str:
+    host = (urlparse(url if "//" in url else "//" + url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def _same_site(domain: str, host: str) -> bool:
+    return bool(host) and (domain == host or domain.endswith("." + host) or host.endswith("." + domain))
+
+
+def _is_listing(domain: str) -> bool:
+    return any(_same_site(domain, listing) for listing in LISTING_DOMAINS)
+
+
+def find_contact(text: str, company_name: str = "", site_url: str = "") -> Tuple[str, str]:
+    """
+    Deterministic first pass for a single company's email and phone
+
+    Args:
+        text (str): raw HTML, markdown or search result snippets
+        company_name (str): the email's domain must match the company name...
+        site_url (str): ...or the site the text was scraped from
+
+    Returns:
+        tuple: (email, phone). ("", "") when nothing was found or the result is ambiguous,
+               in which case the caller should fall back to the LLM.
+    """
+    contacts = extract_contacts(text)
+    site = _host(site_url) if site_url else ""
+    # a lone address on somebody else's domain (support@ of a directory) is not the company's
+    emails = [e for e in contacts["emails"] if not _is_listing(e.split("@", 1)[1])
+              and ((company_name and _matches_company(e, company_name)) or _same_site(e.split("@", 1)[1], site)
+                   or not (company_name or site))]
+    # several addresses on the company's own domain (info@, sales@) are fine, any mix is not
+    if not emails or len({e.split("@", 1)[1] for e in emails}) > 1:
+        return "", ""
+
+    return emails[0], _nearest_phone(text, emails[0], contacts["phones"])
+
+
+def _nearest_phone(text: str, email: str, phones: List[str]) -> str:
+    """Pick the phone written closest to the email, so listing pages don't mix up companies"""
+    if len(phones) <= 1:
+        return phones[0] if phones else ""
+    anchor = text.lower().find(email)
+    if anchor == -1:
+        return phones[0]
+    positions = {phone: text.find(phone) for phone in phones}
+    return min((p for p in phones if positions[p] != -1), key=lambda p: abs(positions[p] - anchor), default=phones[0])
+
+
+if __name__ == "__main__":
+    sample = """
+    <a href="mailto:info@techsolutions-example.net">Email us</a>
+    <a href="tel:+1-555-123-4567">Call</a>
+    <p>sales [at] techsolutions-example [dot] net</p>
+    """
+    print(extract_contacts(sample))
+    print(find_contact(sample, "TechSolutions Inc."))
@@ -0,0 +1,166 @@
+# utils/content_reducer.py
+import re
+import hashlib
+from typing import Callable, List, Sequence, TypeVar
+
+T = TypeVar("T")
+
+# rough chars-per-token ratio, good enough for budgeting across providers
+CHARS_PER_TOKEN = 4
+
+LINK_RE = re.compile(r"(!?)\[([^\]]*)\]\(([^)\s]*)(?:\s+\"[^\"]*\")?\)")
+LINK_ONLY_LINE_RE = re.compile(r"^\s*(?:[*+-]|\d+\.)?\s*(?:\[[^\]]*\]\([^)]*\)[\s|,·•/-]*)+$")
+BOILERPLATE_RE = re.compile(
+    r"\b(we use cookies|accept (all )?cookies|cookie (policy|settings|preferences|consent)|privacy policy|"
+    r"terms (of|&) (use|service|conditions)|all rights reserved|skip to (main )?content|"
+    r"(sign up for|subscribe to) our newsletter|follow us on|share on (facebook|twitter|linkedin|x)|"
+    r"log ?in|sign ?in|back to top|javascript is (disabled|required))\b",
+    re.IGNORECASE,
+)
+# lines longer than this are real content even if they mention a boilerplate phrase
+BOILERPLATE_MAX_CHARS = 120
+# a run of this many lines holding nothing but links is a menu / link farm
+LINK_FARM_MIN_LINES = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap, provider independent token estimate"""
+    return len(text or "") // CHARS_PER_TOKEN
+
+
+def _simplify_link(match: re.Match) -> str:
+    """Keep the text of a markdown link and drop the URL, unless the URL is a contact detail"""
+    is_image, text, target = match.group(1), match.group(2).strip(), match.group(3)
+    if is_image:
+        return text
+    if target.lower().startswith(("mailto:", "tel:")):
+        contact = target.split(":", 1)[1].split("?", 1)[0]
+        return text if contact in text else f"{text} ({contact})".strip()
+    return text
+
+
+def reduce_content(markdown: str) -> str:
+    """
+    Shrink page markdown before it is sent to the LLM
+
+    Drops boilerplate lines (cookie banners, login, newsletter...), runs of link-only lines
+    (menus, tag clouds, link farms) and blocks repeated elsewhere on the page, and replaces
+    links by their text. mailto:/tel: targets are kept since they are what we are after.
+
+    Args:
+        markdown (str): markdown content
+
+    Returns:
+        str: reduced markdown content
+    """
+    lines = (markdown or "").splitlines()
+
+    # runs of link-only lines
+    link_only = [bool(LINK_ONLY_LINE_RE.match(line)) and "mailto:" not in line and "tel:" not in line for line in lines]
+    drop = [False] * len(lines)
+    i = 0
+    while i < len(lines):
+        if not link_only[i]:
+            i += 1
+            continue
+        j = i
+        while j < len(lines) and (link_only[j] or not lines[j].strip()):
+            j += 1
+        if sum(link_only[i:j]) >= LINK_FARM_MIN_LINES:
+            drop[i:j] = [True] * (j - i)
+        i = j
+
+    kept = []
+    for line, dropped in zip(lines, drop):
+        if dropped:
+            continue
+        if len(line) <= BOILERPLATE_MAX_CHARS and BOILERPLATE_RE.search(line):
+            continue
+        kept.append(LINK_RE.sub(_simplify_link, line).rstrip())
+
+    # dedupe repeated blocks
+    blocks, seen = [], set()
+    for block in re.split(r"\n\s*\n", "\n".join(kept)):
+        normalized = re.sub(r"\s+", " ", block).strip().lower()
+        if not normalized:
+            continue
+        digest = hashlib.md5(normalized.encode("utf-8")).hexdigest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        blocks.append(block.strip("\n"))
+
+    return "\n\n".join(blocks)
+
+
+def _split_oversized(block: str, max_chars: int) -> List[str]:
+    """Split a block that does not fit a chunk on its own, by lines and then hard by size"""
+    pieces, current = [], ""
+    for line in block.splitlines():
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if current and len(current) + len(line) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_content(text: str, max_tokens: int) -> List[str]:
+    """
+    Split content into chunks of at most max_tokens (estimated), on block boundaries where possible
+
+    Args:
+        text (str): content to split
+        max_tokens (int): token budget per chunk
+
+    Returns:
+        list: chunks, a single one when the content already fits
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks, current = [], ""
+    for block in text.split("\n\n"):
+        parts = _split_oversized(block, max_chars) if len(block) > max_chars else [block]
+        for part in parts:
+            if current and len(current) + len(part) + 2 > max_chars:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{part}" if current else part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def pack_by_tokens(items: Sequence[T], size: Callable[[T], int], max_tokens: int, max_items: int) -> List[List[T]]:
+    """
+    Group items, in order, into batches of at most max_tokens (as measured by size) and max_items
+
+    Args:
+        items (list): items to pack
+        size (callable): estimated tokens of an item
+        max_tokens (int): token budget per batch. An item over the budget gets a batch of its own
+        max_items (int): items per batch
+
+    Returns:
+        list: batches of items
+    """
+    batches, current, current_tokens = [], [], 0
+    for item in items:
+        tokens = size(item)
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(item)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
@@ -0,0 +1,174 @@
+# utils/dedup.py
+import os
+import re
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# optional index of companies already collected by earlier campaigns. configure it from .env
+load_dotenv()
+COMPANY_INDEX_ENABLED = os.getenv("COMPANY_INDEX_ENABLED", "false").lower() == "true"
+COMPANY_INDEX_PATH = os.getenv("COMPANY_INDEX_PATH", os.path.join("extractions", "company_index.sqlite"))
+
+# an email at one of these says nothing about which company it belongs to
+FREE_MAIL_DOMAINS = {
+    "gmail.com", "googlemail.com", "yahoo.com", "ymail.com", "hotmail.com", "outlook.com", "live.com", "msn.com",
+    "aol.com", "icloud.com", "me.com", "mac.com", "comcast.net", "att.net", "verizon.net", "sbcglobal.net",
+    "protonmail.com", "proton.me", "gmx.com", "mail.com", "zoho.com", "yandex.com",
+}
+
+# words that do not tell two companies apart: "Acme Construction, Inc." == "acme construction"
+NAME_NOISE = {"the", "inc", "incorporated", "llc", "l", "ltd", "limited", "co", "corp", "corporation", "company", "pllc", "lp", "llp"}
+
+
+def normalize_name(name: str) -> str:
+    words = re.sub(r"[^a-z0-9 ]+", " ", name.lower().replace("&", " and ")).split()
+    return " ".join(word for word in words if word not in NAME_NOISE)
+
+
+def email_domain(email: str) -> str:
+    domain = email.strip().lower().rsplit("@", 1)[-1] if "@" in email else ""
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return "" if domain in FREE_MAIL_DOMAINS else domain
+
+
+def phone_digits(phone: str) -> str:
+    digits = re.sub(r"\D", "", phone)
+    # compare the last 10 digits so +1 (303) 555-0101 and 303.555.0101 match
+    return digits[-10:] if len(digits) >= 7 else ""
+
+
+def company_keys(company: Dict[str, str]) -> List[str]:
+    """Dedup keys of a company: email domain (not free mail), normalized name and phone digits"""
+    keys = []
+    domain = email_domain(company.get("email", "") or "")
+    name = normalize_name(company.get("name", "") or "")
+    phone = phone_digits(company.get("phone", "") or "")
+    if domain:
+        keys.append(f"domain:{domain}")
+    if name:
+        keys.append(f"name:{name}")
+    if phone:
+        keys.append(f"phone:{phone}")
+    return keys
+
+
+def same_company(keys: List[str], other_keys: List[str]) -> bool:
+    """
+    A shared email domain, or the same name plus one other shared key. A phone alone is not
+    enough: directory listings print their own number next to every company. A record with
+    nothing but a name has no second key to offer, so for it the name is enough.
+    """
+    shared = set(keys) & set(other_keys)
+    if any(key.startswith("domain:") for key in shared):
+        return True
+    if not any(key.startswith("name:") for key in shared):
+        return False
+    return len(shared) > 1 or len(keys) == 1 or len(other_keys) == 1
+
+
+class CompanyIndex:
+    """
+    Finds the same company across listing pages (see same_company), duplicates are merged into
+    the first record seen. With a path, companies remembered via remember() are also skipped
+    by later campaigns.
+    """
+    NEW, DUPLICATE, KNOWN = "new", "duplicate", "known"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._entries: Dict[str, List[Dict[str, str]]] = {}  # key -> records with that key
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS companies (
+                    key TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    email TEXT NOT NULL,
+                    phone TEXT NOT NULL,
+                    campaign TEXT NOT NULL,
+                    stored_at REAL NOT NULL
+                )""")
+
+    def _is_known(self, keys: List[str]) -> bool:
+        if self._conn is None or not keys:
+            return False
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn.execute(f"SELECT DISTINCT name, email, phone FROM companies WHERE key IN ({placeholders})", keys)
+        return any(same_company(keys, company_keys({"name": name, "email": email, "phone": phone}))
+                   for name, email, phone in rows)
+
+    def _find(self, keys: List[str], exclude: Optional[Dict[str, str]] = None) -> Optional[Dict[str, str]]:
+        for key in keys:
+            for entry in self._entries.get(key, []):
+                if entry is not exclude and same_company(keys, company_keys(entry)):
+                    return entry
+        return None
+
+    def _index(self, entry: Dict[str, str]):
+        for key in company_keys(entry):
+            entries = self._entries.setdefault(key, [])
+            if not any(other is entry for other in entries):
+                entries.append(entry)
+
+    @staticmethod
+    def _merge(entry: Dict[str, str], company: Dict[str, str]):
+        for field, value in company.items():
+            if value and not entry.get(field):
+                entry[field] = value
+
+    def add(self, company: Dict[str, str]) -> Tuple[Dict[str, str], str]:
+        """
+        Index a company. Returns (record, status): the company itself and NEW, the record it was
+        merged into and DUPLICATE, or the company and KNOWN when an earlier campaign has it.
+        """
+        keys = company_keys(company)
+        with self._lock:
+            entry = self._find(keys)
+            if entry is not None:
+                self._merge(entry, company)
+                self._index(entry)
+                return entry, self.DUPLICATE
+            if self._is_known(keys):
+                return company, self.KNOWN
+            self._index(company)
+            return company, self.NEW
+
+    def update(self, entry: Dict[str, str]) -> Tuple[Dict[str, str], str]:
+        """
+        Re-index a record after fields were filled in (e.g. a found email). Returns (record, status)
+        like add(): the other record it turned out to duplicate and DUPLICATE, the record and KNOWN
+        when an earlier campaign has it, or the record and NEW.
+        """
+        keys = company_keys(entry)
+        with self._lock:
+            self._index(entry)
+            other = self._find(keys, exclude=entry)
+            if other is not None:
+                return other, self.DUPLICATE
+            if self._is_known(keys):
+                return entry, self.KNOWN
+            return entry, self.NEW
+
+    def remember(self, company: Dict[str, str], campaign: str = ""):
+        """Persist a collected company so later campaigns skip it (no-op without a path)"""
+        if self._conn is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO companies (key, name, email, phone, campaign, stored_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(key, company.get("name", ""), company.get("email", ""), company.get("phone", ""), campaign, now)
+                 for key in company_keys(company)])
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
@@ -0,0 +1,175 @@
+# utils/disk_cache.py
+import os
+import time
+import sqlite3
+import hashlib
+import weakref
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Optional, Tuple
+
+
+def hash_key(*parts: str) -> str:
+    """Stable content hash used as cache key"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+_open_caches = weakref.WeakSet()
+_inherited_connections = []  # kept referenced: closing them in a forked child would touch the parent's database
+
+
+def _reopen_after_fork():
+    for cache in list(_open_caches):
+        cache._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reopen_after_fork)
+
+
+class DiskCache:
+    """
+    Small persistent key/value cache on top of SQLite.
+
+    Values are strings (callers store JSON). Entries carry the time they were stored, so
+    callers can decide what is fresh, and the time they were last read, which drives the
+    LRU eviction once the total size goes over max_bytes. Safe to share between threads,
+    and between processes since SQLite does the file locking. A forked process (the batch runner's
+    job pool) opens its own connection on first use instead of the one it inherited.
+    """
+    def __init__(self, path: str, max_bytes: int = 500 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+        self._connection: Optional[sqlite3.Connection] = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._open()
+        _open_caches.add(self)
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries(accessed_at)")
+        self._connection = conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._open()
+        return self._connection
+
+    def _after_fork(self):
+        """In a forked child: SQLite connections must not be carried across fork, open a new one when used"""
+        if self._connection is not None:
+            _inherited_connections.append(self._connection)
+        self._connection = None
+        self._lock = threading.Lock()  # the parent may have held it while forking
+
+    def get_entry(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return (value, age in seconds) regardless of freshness, or None. Does not touch the stats."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0], now - row[1]
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """Return the value if present and younger than max_age seconds (None = never expires)"""
+        entry = self.get_entry(key)
+        if entry is None or (max_age is not None and entry[1] > max_age):
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return entry[0]
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self.stats["stores"] += 1
+            self._evict()
+
+    def touch(self, key: str):
+        """Mark an entry as freshly stored (e.g. after a successful revalidation)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE entries SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes (lock held)"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        self.stats["evictions"] += len(evicted)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls: while a call for a key is running, other
+    callers asking for the same key wait for its result instead of repeating it.
+    """
+    def __init__(self):
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: str, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        if not leader:
+            self.stats["coalesced"] += 1
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
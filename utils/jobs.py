@@ -0,0 +1,101 @@
+# utils/jobs.py
+import time
+import uuid
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Job:
+    """
+    A unit of background work. The job function gets the Job as its first argument and reports
+    progress through update(), which is safe to call from any thread; the UI reads snapshot().
+    """
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = QUEUED
+        self.done = 0
+        self.total = 0
+        self.message = "Waiting to start..."
+        self.result: Any = None
+        self.error = ""
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def update(self, done: Optional[int] = None, total: Optional[int] = None, message: Optional[str] = None):
+        with self._lock:
+            if done is not None:
+                self.done = done
+            if total is not None:
+                self.total = total
+            if message is not None:
+                self.message = message
+
+    def progress_callback(self, done: int, total: int, message: str = ""):
+        """Adapter for the (done, total, message) progress callbacks of the scraper and the sender"""
+        self.update(done, total, message or None)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            fraction = min(1.0, self.done / self.total) if self.total else 0.0
+            elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+            return {"id": self.id, "name": self.name, "status": self.status, "done": self.done, "total": self.total,
+                    "fraction": fraction, "message": self.message, "error": self.error, "elapsed": elapsed}
+
+
+class JobManager:
+    """
+    Runs jobs on a thread pool so long scrape/compose/send runs do not block the UI thread.
+    Keeps the most recent max_history jobs so their status and result can still be read.
+    """
+    def __init__(self, max_workers: int = 4, max_history: int = 50):
+        self.max_history = max_history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, fn: Callable[..., Any], *args, **kwargs) -> Job:
+        job = Job(name)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_history:
+                oldest = next(iter(self._jobs.values()))
+                if not oldest.finished:
+                    break
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    @staticmethod
+    def _run(job: Job, fn: Callable[..., Any], args, kwargs):
+        job.started_at = time.time()
+        job.status = RUNNING
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = DONE
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: Optional[str]) -> Optional[Job]:
+        if not job_id:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,114 @@
+# utils/json_stream.py
+import re
+import json
+from typing import Dict, List, Optional
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def loads_tolerant(text: str) -> Optional[object]:
+    """json.loads that also accepts the usual LLM slips: trailing commas and raw newlines/tabs in strings"""
+    for candidate in (text, _TRAILING_COMMA.sub(r"\1", text)):
+        try:
+            return json.loads(candidate, strict=False)
+        except ValueError:
+            continue
+    return None
+
+
+class JSONObjectStream:
+    """
+    Pull JSON objects out of text as it streams in, e.g. the items of an array an LLM is still writing.
+    feed() returns the objects completed by each piece of text. The items of a top level array, or of an
+    array inside a top level object ({"companies": [...]}), are returned one by one as soon as each
+    closes. A top level object holding no such array is returned whole. Everything around the objects
+    (brackets, commas, keys, code fences, prose) is skipped, and an item that does not parse even after
+    repair is dropped on its own, so one malformed or truncated item does not cost the others.
+    """
+    def __init__(self):
+        self._text = ""  # text from self._offset on, kept while an object is open
+        self._offset = 0
+        self._stack: List[str] = []  # open "{" and "["
+        self._in_string = False
+        self._escape = False
+        self._item: Optional[int] = None  # start of the array item being read
+        self._item_depth = 0
+        self._top: Optional[int] = None  # start of the top level object
+        self._top_has_items = False
+        self.dropped = 0  # items that could not be parsed
+
+    def feed(self, text: str) -> List[Dict]:
+        objects = []
+        stack = self._stack
+        base = self._offset + len(self._text)
+        self._text += text
+        for i, char in enumerate(text, base):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                # quotes in prose around the JSON do not open strings
+                self._in_string = bool(stack)
+            elif char == "{" or char == "[":
+                if not stack:
+                    if char == "{":
+                        self._top, self._top_has_items = i, False
+                elif char == "{" and self._item is None and stack[-1] == "[" and len(stack) <= 2:
+                    self._item, self._item_depth = i, len(stack)
+                stack.append(char)
+            elif (char == "}" or char == "]") and stack:
+                stack.pop()
+                if self._item is not None and len(stack) == self._item_depth:
+                    objects.extend(self._parse(self._slice(self._item, i + 1)))
+                    self._item, self._top_has_items = None, True
+                elif not stack:
+                    if self._top is not None and not self._top_has_items:
+                        objects.extend(self._parse(self._slice(self._top, i + 1)))
+                    self._top = None
+        # keep only the text of what is still open
+        start = self._item
+        if start is None and not self._top_has_items:
+            start = self._top
+        if start is None:
+            self._offset, self._text = base + len(text), ""
+        elif start > self._offset:
+            self._text = self._text[start - self._offset:]
+            self._offset = start
+        return objects
+
+    def close(self) -> bool:
+        """End of the text. Returns True when it stopped inside an object (a truncated answer)."""
+        truncated = bool(self._stack)
+        if self._item is not None or (self._top is not None and not self._top_has_items):
+            # the unfinished item, the items already returned are kept
+            self.dropped += 1
+        self._text, self._offset, self._stack = "", 0, []
+        self._in_string = self._escape = self._top_has_items = False
+        self._item = self._top = None
+        return truncated
+
+    def _slice(self, start: int, end: int) -> str:
+        return self._text[start - self._offset:end - self._offset]
+
+    def _parse(self, text: str) -> List[Dict]:
+        value = loads_tolerant(text)
+        if not isinstance(value, dict):
+            self.dropped += 1
+            return []
+        if "name" not in value and any(isinstance(items, list) for items in value.values()):
+            # a wrapper whose array held no objects, e.g. {"companies": []}
+            return [item for items in value.values() if isinstance(items, list)
+                    for item in items if isinstance(item, dict)]
+        return [value]
+
+
+def parse_json_objects(text: str) -> List[Dict]:
+    """All JSON objects that can be recovered from a complete answer, see JSONObjectStream"""
+    stream = JSONObjectStream()
+    objects = stream.feed(text or "")
+    stream.close()
+    return objects
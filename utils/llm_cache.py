@@ -0,0 +1,181 @@
+# utils/llm_cache.py
+import os
+import json
+import time
+from typing import Dict, Iterator, List, Optional
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, BaseMessage
+from utils.disk_cache import DiskCache, SingleFlight, hash_key
+from utils.rate_limit import TokenBucket
+from utils.concurrency import LLM, budget
+from utils.llm_usage import UsageTracker, token_usage
+from utils.content_reducer import estimate_tokens
+from utils.telemetry import span
+
+# LLM response cache shared by the scraper and the email composer. configure it from .env
+load_dotenv()
+LLM_STREAMING = os.getenv("LLM_STREAMING", "false").lower() == "true"  # -----------> stream stage 1 extraction, companies are used as soon as they are parsed
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".cache")
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "720"))  # -----------> responses younger than this are reused
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "200"))
+llm_cache = DiskCache(os.path.join(LLM_CACHE_DIR, "llm.sqlite"), max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024)) if LLM_CACHE_ENABLED else None
+
+# identical requests running at the same time share one LLM call
+_in_flight = SingleFlight()
+
+# model attributes that change the completion, part of the cache key when the client has them
+GENERATION_PARAMS = ("temperature", "max_tokens", "max_output_tokens", "num_predict", "top_p", "top_k",
+                     "frequency_penalty", "presence_penalty", "seed", "stop", "response_format")
+
+
+def _generation_params(llm) -> Dict:
+    params = {}
+    for name in GENERATION_PARAMS:
+        value = getattr(llm, name, None)
+        if value is not None:
+            params[name] = value
+    return params
+
+
+class CachedLLM:
+    """
+    Wraps a LangChain chat model so invoke() is answered from the on-disk LLM cache when the
+    same request was made before. The key covers provider, model, the full message content and
+    the generation parameters. stream() shares the cache with invoke(), everything else is
+    passed through to the model.
+    Calls that actually reach the provider first wait on rate_limiter, when one is given.
+    Every invoke() is recorded in usage under its stage label: tokens, wall latency and cache hits.
+    """
+    def __init__(self, llm, provider: str, model_name: str, enabled: bool = True, rate_limiter: Optional[TokenBucket] = None,
+                 usage: Optional[UsageTracker] = None):
+        self.llm = llm
+        self.provider = provider
+        self.model_name = model_name
+        self.enabled = enabled
+        self.rate_limiter = rate_limiter
+        self.usage = usage if usage is not None else UsageTracker(provider, model_name)
+
+    def _key(self, messages: List[BaseMessage], kwargs: Dict) -> str:
+        payload = [[message.type, message.content] for message in messages]
+        params = {**_generation_params(self.llm), **kwargs}
+        return hash_key(self.provider, self.model_name,
+                        json.dumps(payload, sort_keys=True, default=str),
+                        json.dumps(params, sort_keys=True, default=str))
+
+    def _invoke_llm(self, messages: List[BaseMessage], **kwargs) -> BaseMessage:
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        with budget(LLM):
+            return self.llm.invoke(messages, **kwargs)
+
+    def invoke(self, messages: List[BaseMessage], stage: str = "", retry: bool = False, **kwargs) -> BaseMessage:
+        """
+        stage labels the call in the usage summary (e.g. "extract", "generate_email"), retry=True
+        marks a call that repeats an earlier one whose answer was unusable
+        """
+        started = time.perf_counter()
+        paid = []  # stays empty when the answer came from the cache or from an identical call in flight
+
+        def call_llm():
+            response = self._invoke_llm(messages, **kwargs)
+            paid.append(True)
+            return response
+
+        with span("llm_call", provider=self.usage.provider, model=self.usage.model_name, stage=stage or "other") as trace:
+            try:
+                response = self._invoke(messages, kwargs, call_llm)
+            except Exception:
+                self.usage.record(stage, latency=time.perf_counter() - started, retry=retry, error=True)
+                raise
+            self.usage.record(stage, response, latency=time.perf_counter() - started, cache_hit=not paid, retry=retry)
+            trace.label(cache="miss" if paid else "hit")
+            if paid:
+                trace.set(**token_usage(response))
+            return response
+
+    def stream(self, messages: List[BaseMessage], stage: str = "", retry: bool = False, **kwargs) -> Iterator[str]:
+        """
+        Like invoke(), but yield the completion text as it arrives. A cached answer is yielded in
+        one piece. Only complete answers are cached; the tokens of a stream the caller stops reading
+        early are still recorded. Identical streams running at the same time are not coalesced.
+        """
+        started = time.perf_counter()
+        key = self._key(messages, kwargs) if self.enabled and llm_cache is not None else None
+        with span("llm_stream", provider=self.provider, model=self.model_name, stage=stage or "other") as trace:
+            if key is not None:
+                cached = llm_cache.get(key, max_age=LLM_CACHE_TTL_HOURS * 3600)
+                if cached is not None:
+                    trace.label(cache="hit")
+                    self.usage.record(stage, latency=time.perf_counter() - started, cache_hit=True, retry=retry)
+                    yield json.loads(cached)["content"]
+                    return
+
+            trace.label(cache="miss")
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            response, text, completed, error = None, [], False, False
+            try:
+                with budget(LLM):
+                    for chunk in self.llm.stream(messages, **kwargs):
+                        if response is None:
+                            trace.set(first_chunk_seconds=time.perf_counter() - started)
+                        response = chunk if response is None else response + chunk
+                        if isinstance(chunk.content, str) and chunk.content:
+                            text.append(chunk.content)
+                            yield chunk.content
+                completed = True
+            except Exception:
+                error = True
+                raise
+            finally:
+                content = "".join(text)
+                reported = response is not None and any(token_usage(response).values())
+                if not reported and (response is not None or not error):
+                    # not every provider reports usage on streams
+                    input_tokens = sum(estimate_tokens(str(message.content)) for message in messages)
+                    output_tokens = estimate_tokens(content)
+                    response = AIMessage(content=content, usage_metadata={
+                        "input_tokens": input_tokens, "output_tokens": output_tokens,
+                        "total_tokens": input_tokens + output_tokens})
+                self.usage.record(stage, response, latency=time.perf_counter() - started, retry=retry, error=error)
+                if response is not None:
+                    trace.set(**token_usage(response))
+                trace.label(outcome="ok" if completed else "error" if error else "stopped")
+                if completed and key is not None:
+                    llm_cache.set(key, json.dumps({
+                        "content": content,
+                        "response_metadata": json.loads(json.dumps(response.response_metadata, default=str)),
+                    }))
+
+    def _invoke(self, messages: List[BaseMessage], kwargs: Dict, call_llm) -> BaseMessage:
+        if not self.enabled or llm_cache is None:
+            return call_llm()
+
+        key = self._key(messages, kwargs)
+
+        def load():
+            cached = llm_cache.get(key, max_age=LLM_CACHE_TTL_HOURS * 3600)
+            if cached is not None:
+                data = json.loads(cached)
+                return AIMessage(content=data["content"], response_metadata={**data["response_metadata"], "cache_hit": True})
+            response = call_llm()
+            if isinstance(response.content, str):
+                llm_cache.set(key, json.dumps({
+                    "content": response.content,
+                    "response_metadata": json.loads(json.dumps(response.response_metadata, default=str)),
+                }))
+            return response
+
+        return _in_flight.do(key, load)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+
+def llm_cache_stats() -> Dict[str, int]:
+    """LLM cache counters for this process: hits, misses (paid calls), coalesced, stores, evictions"""
+    stats = {"coalesced": _in_flight.stats["coalesced"]}
+    if llm_cache is not None:
+        stats.update({k: llm_cache.stats[k] for k in ("hits", "misses", "stores", "evictions")})
+    return stats
@@ -0,0 +1,50 @@
+# utils/llm_clients.py
+import importlib
+import threading
+from typing import Dict, Optional, Tuple
+from utils.disk_cache import hash_key
+
+# provider -> (package, chat model class, name of its api key argument). packages are imported
+# only when a provider is first used: together they take over a second to import
+PROVIDERS = {
+    "openai": ("langchain_openai", "ChatOpenAI", "openai_api_key"),
+    "ollama": ("langchain_ollama", "ChatOllama", None),
+    "deepseek": ("langchain_deepseek", "ChatDeepSeek", "api_key"),
+    "groq": ("langchain_groq", "ChatGroq", "api_key"),
+    "google": ("langchain_google_genai", "ChatGoogleGenerativeAI", "api_key"),
+}
+
+# one chat client per (provider, model, api key) for the whole process. the clients keep their
+# HTTP connection pools, so reusing them across scraper/generator instances and Streamlit
+# reruns skips client setup and new TLS handshakes
+_clients: Dict[Tuple[str, str, str], object] = {}
+_clients_lock = threading.Lock()
+
+
+def _create_chat_model(provider: str, model_name: str, api_key: Optional[str]):
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unsupported provider: {provider}")
+    module_name, class_name, key_argument = PROVIDERS[provider]
+    chat_model_class = getattr(importlib.import_module(module_name), class_name)
+    kwargs = {"model": model_name}
+    if key_argument:
+        kwargs[key_argument] = api_key
+    return chat_model_class(**kwargs)
+
+
+def get_chat_model(provider: str, model_name: str, api_key: Optional[str] = None):
+    """Shared LangChain chat model for provider/model/api key, created on first use"""
+    # the key is only kept as a hash
+    key = (provider, model_name, hash_key(api_key or ""))
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _create_chat_model(provider, model_name, api_key)
+            _clients[key] = client
+        return client
+
+
+def clear_chat_models():
+    """Drop all shared clients, e.g. after an API key was revoked"""
+    with _clients_lock:
+        _clients.clear()
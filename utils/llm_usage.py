@@ -0,0 +1,160 @@
+# utils/llm_usage.py
+import os
+import json
+import time
+import threading
+from typing import Dict, Iterable, Optional
+from dotenv import load_dotenv
+
+# USD per million input / output tokens, used for the cost estimate in usage summaries.
+# add or override models with LLM_PRICES in .env, e.g. LLM_PRICES='{"gpt-4o-mini": [0.15, 0.6]}'
+load_dotenv()
+DEFAULT_LLM_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "deepseek-chat": (0.27, 1.10),
+}
+LLM_PRICES = {**DEFAULT_LLM_PRICES, **{model: tuple(price) for model, price in json.loads(os.getenv("LLM_PRICES", "{}")).items()}}
+
+COUNTERS = ("calls", "cache_hits", "retries", "errors", "input_tokens", "output_tokens")
+
+
+def token_usage(response) -> Dict[str, int]:
+    """Input/output tokens of a chat model response, from usage_metadata or the provider's response metadata"""
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage:
+        return {"input_tokens": usage.get("input_tokens", 0) or 0, "output_tokens": usage.get("output_tokens", 0) or 0}
+    metadata = getattr(response, "response_metadata", None) or {}
+    usage = metadata.get("token_usage") or metadata.get("usage") or {}
+    return {"input_tokens": usage.get("prompt_tokens", usage.get("input_tokens", 0)) or 0,
+            "output_tokens": usage.get("completion_tokens", usage.get("output_tokens", 0)) or 0}
+
+
+def _empty_stage() -> Dict:
+    return {**{name: 0 for name in COUNTERS}, "latency_s": 0.0, "max_latency_s": 0.0}
+
+
+class UsageTracker:
+    """
+    Thread-safe per stage totals of the LLM calls of one model: calls, cache hits (answered from
+    the LLM cache or by an identical call in flight), retries, errors, tokens and wall latency.
+    """
+    def __init__(self, provider: str, model_name: str):
+        self.provider = provider
+        self.model_name = model_name
+        self._stages: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def record(self, stage: str, response=None, latency: float = 0.0, cache_hit: bool = False,
+               retry: bool = False, error: bool = False):
+        tokens = token_usage(response) if response is not None and not cache_hit else {}
+        with self._lock:
+            totals = self._stages.setdefault(stage or "other", _empty_stage())
+            totals["calls"] += 1
+            totals["cache_hits"] += int(cache_hit)
+            totals["retries"] += int(retry)
+            totals["errors"] += int(error)
+            totals["input_tokens"] += tokens.get("input_tokens", 0)
+            totals["output_tokens"] += tokens.get("output_tokens", 0)
+            totals["latency_s"] += latency
+            totals["max_latency_s"] = max(totals["max_latency_s"], latency)
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+            self.started_at = time.time()
+
+    def summary(self) -> Dict:
+        """Per stage and total usage with the estimated cost in USD (None for models without a known price)"""
+        with self._lock:
+            stages = {stage: dict(totals) for stage, totals in self._stages.items()}
+        price = LLM_PRICES.get(self.model_name)
+        for totals in stages.values():
+            totals["cost_usd"] = _cost(totals, price)
+        return _with_total({"provider": self.provider, "model": self.model_name, "started_at": self.started_at,
+                            "finished_at": time.time(), "stages": stages})
+
+
+def _cost(totals: Dict, price) -> Optional[float]:
+    if price is None:
+        return None
+    return round((totals["input_tokens"] * price[0] + totals["output_tokens"] * price[1]) / 1_000_000, 6)
+
+
+def _add(into: Dict, totals: Dict):
+    for name in COUNTERS:
+        into[name] += totals.get(name, 0)
+    into["latency_s"] += totals.get("latency_s", 0.0)
+    into["max_latency_s"] = max(into["max_latency_s"], totals.get("max_latency_s", 0.0))
+    # the cost is unknown as soon as one part of it is
+    known = into.get("cost_usd", 0.0) is not None and totals.get("cost_usd", 0.0) is not None
+    into["cost_usd"] = round(into.get("cost_usd", 0.0) + totals.get("cost_usd", 0.0), 6) if known else None
+
+
+def _with_total(summary: Dict) -> Dict:
+    total = _empty_stage()
+    for totals in summary["stages"].values():
+        _add(total, totals)
+    total.setdefault("cost_usd", 0.0)
+    summary["total"] = total
+    return summary
+
+
+def merge_usage(summaries: Iterable[Dict]) -> Dict:
+    """Add up usage summaries, e.g. of the scrape and compose steps or of all jobs of a campaign"""
+    merged = {"models": [], "stages": {}}
+    for summary in summaries:
+        if not summary:
+            continue
+        model = f"{summary.get('provider', '')}/{summary.get('model', '')}"
+        if model not in merged["models"]:
+            merged["models"].append(model)
+        for stage, totals in summary.get("stages", {}).items():
+            _add(merged["stages"].setdefault(stage, _empty_stage()), totals)
+    return _with_total(merged)
+
+
+def usage_path(output_path: str) -> str:
+    """Run summary file written next to a step's output CSV"""
+    return os.path.splitext(output_path)[0] + "_usage.json"
+
+
+def write_usage(path: str, summary: Dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+
+def read_usage(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def format_usage(summary: Dict) -> str:
+    """Plain text table of a usage summary, for logs and the CLI"""
+    lines = [f"{'stage':26} {'calls':>6} {'cached':>7} {'retries':>8} {'in tok':>9} {'out tok':>9} {'avg s':>7} {'cost $':>9}"]
+    for stage, totals in list(summary["stages"].items()) + [("total", summary["total"])]:
+        average = totals["latency_s"] / totals["calls"] if totals["calls"] else 0.0
+        cost = "n/a" if totals.get("cost_usd") is None else f"{totals['cost_usd']:.4f}"
+        lines.append(f"{stage:26} {totals['calls']:>6} {totals['cache_hits']:>7} {totals['retries']:>8} "
+                     f"{totals['input_tokens']:>9} {totals['output_tokens']:>9} {average:>7.2f} {cost:>9}")
+    return "\n".join(lines)
+
+
+def format_cache_stats(before: Dict[str, Dict[str, int]], after: Dict[str, Dict[str, int]]) -> str:
+    """
+    One line per cache with its counters since `before`, for run summaries. Both are
+    {cache name: page_cache_stats() / search_cache_stats() / llm_cache_stats()} snapshots.
+    """
+    lines = []
+    for name, stats in after.items():
+        if not stats:
+            lines.append(f"{name:8} off")
+            continue
+        previous = before.get(name, {})
+        lines.append(f"{name:8} " + ", ".join(f"{value - previous.get(key, 0)} {key}" for key, value in stats.items()))
+    return "\n".join(lines)
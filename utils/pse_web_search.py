@@ -1,53 +1,83 @@
 # utils/pse_web_search.py
 from typing import Optional
-from langchain.tools import Tool
 import requests
+from requests.adapters import HTTPAdapter
 import json
+from utils.search_cache import cached_search_page, fetch_pages
 
 class WebSearch:
     def __init__(
         self,
         pse_api_key: str,
         pse_cx: str,
+        max_workers: int = 10,
     ):
         self.pse_api_key = pse_api_key
         self.pse_cx = pse_cx
+        # keep-alive connection pool shared by all page requests (and stage 2 workers)
+        self.max_workers = max_workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def run(self, query: str, exact_term:str="", start_page: int = 1, end_page: int = 1,) -> str:
-        all_results = []
-        for page in range(start_page, end_page + 1):
-            start = 1 + (page - 1) * 10
-            url = f"https://www.googleapis.com/customsearch/v1?q={query}&key={self.pse_api_key}&cx={self.pse_cx}&start={start}&key={exact_term}"
-            response = requests.get(url)
-            data = response.json()
+        """
+        Fetch result pages start_page..end_page over a pooled session, see fetch_pages: the
+        other pages are only requested (concurrently) when the first one comes back full.
+        """
+        fetch = lambda page: cached_search_page("pse", query, exact_term, page,
+                                                lambda: self._fetch_page(query, exact_term, page))
+        return fetch_pages(fetch, list(range(start_page, end_page + 1)), self.max_workers)
+
+    def _fetch_page(self, query: str, exact_term: str, page: int) -> Optional[list]:
+        """Request a single result page from the API. Returns None on an API error."""
+        start = 1 + (page - 1) * 10
+        url = f"https://www.googleapis.com/customsearch/v1?q={query}&key={self.pse_api_key}&cx={self.pse_cx}&start={start}&key={exact_term}"
+        response = self.session.get(url, timeout=10)
+        data = response.json()
+        
+        # print error if exitsts
+        if "error" in data:
+            if data['error']['message']:
+                print(f"Error in google PSE search api: {data['error']['message']}")
+            return None
             
-            # print error if exitsts
-            if "error" in data:
-                if data['error']['message']:
-                    print(f"Error in google PSE search api: {data['error']['message']}")
-                
-            items = data.get("items", [])
-            for item in items:
-                all_results.append({
-                    "title": item.get("title", ""),
-                    "snippet": item.get("snippet", ""),
-                    "url": item.get("link", "")
-                })
-        return all_results
-
-
-
-# initalize the web search tool with your API keys
+        items = data.get("items", [])
+        return [{
+            "title": item.get("title", ""),
+            "snippet": item.get("snippet", ""),
+            "url": item.get("link", "")
+        } for item in items]
+
+
+
+# initalize the web search tool with your API keys (on first use, not at import)
 import os
+import threading
 from dotenv import load_dotenv
 load_dotenv()
-pse_api_key = os.getenv("PSE_API_KEY")
-pse_cx = os.getenv("PSE_ENGINE_ID")
-web_search = WebSearch(pse_api_key=pse_api_key, pse_cx=pse_cx)
+_web_search = None
+_web_search_lock = threading.Lock()
+
+def get_web_search() -> WebSearch:
+    """Shared search client configured from .env"""
+    global _web_search
+    with _web_search_lock:
+        if _web_search is None:
+            _web_search = WebSearch(pse_api_key=os.getenv("PSE_API_KEY"), pse_cx=os.getenv("PSE_ENGINE_ID"))
+        return _web_search
+
+def __getattr__(name):
+    # keeps `from utils.pse_web_search import web_search` working
+    if name == "web_search":
+        return get_web_search()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__=="__main__":
     query = "best construction company in hyderabad"
     exact_term = "hyderabad"
-    results=web_search.run(query = query,exact_term = "hyderabad",start_page=3,end_page=3)
+    results=get_web_search().run(query = query,exact_term = "hyderabad",start_page=3,end_page=3)
 
     from pprint import pprint
     pprint(results)
@@ -0,0 +1,77 @@
+# utils/rate_limit.py
+import os
+import time
+import threading
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# default LLM requests per minute per provider (free tier limits). 0 means unlimited.
+# override with LLM_RPM_<PROVIDER>, e.g. LLM_RPM_OPENAI="500"
+DEFAULT_LLM_RPM = {
+    "google": 30,
+    "groq": 30,
+}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: holds up to `capacity` tokens and refills at `rate` tokens per
+    second. acquire() blocks until enough tokens are available. It starts full unless `tokens` is given.
+    """
+    def __init__(self, rate: float, capacity: Optional[float] = None, tokens: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity if tokens is None else max(0.0, min(self.capacity, tokens))
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """Take tokens if available. Returns 0 on success, otherwise the seconds to wait before retrying."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1):
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+_provider_limiters: Dict[str, Optional[TokenBucket]] = {}
+_provider_lock = threading.Lock()
+
+
+def provider_rpm(provider: str) -> float:
+    """Requests per minute allowed for provider (0 = unlimited)"""
+    return float(os.getenv(f"LLM_RPM_{provider.upper()}", DEFAULT_LLM_RPM.get(provider, 0)))
+
+
+def get_provider_limiter(provider: str) -> Optional[TokenBucket]:
+    """Shared per-provider request limiter (None when the provider is not rate limited)"""
+    with _provider_lock:
+        if provider not in _provider_limiters:
+            rpm = provider_rpm(provider)
+            # capacity of one token: requests are spaced out evenly instead of bursting
+            _provider_limiters[provider] = TokenBucket(rate=rpm / 60, capacity=1) if rpm > 0 else None
+        return _provider_limiters[provider]
+
+
+def set_provider_limiter(provider: str, limiter):
+    """
+    Use limiter for provider from now on, e.g. a TokenBucket hosted by a multiprocessing Manager
+    so several processes share one provider quota. Only clients created afterwards pick it up.
+    """
+    with _provider_lock:
+        _provider_limiters[provider] = limiter
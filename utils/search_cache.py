@@ -0,0 +1,96 @@
+# utils/search_cache.py
+import os
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from utils.disk_cache import DiskCache, SingleFlight, hash_key
+from utils.concurrency import SEARCH, budget
+from utils.telemetry import span
+
+# search results cache shared by both search backends. configure it from .env
+load_dotenv()
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+SEARCH_CACHE_DIR = os.getenv("SEARCH_CACHE_DIR", ".cache")
+SEARCH_CACHE_TTL_HOURS = float(os.getenv("SEARCH_CACHE_TTL_HOURS", "72"))  # -----------> results younger than this are reused without an API call
+SEARCH_CACHE_MAX_MB = float(os.getenv("SEARCH_CACHE_MAX_MB", "50"))
+search_cache = DiskCache(os.path.join(SEARCH_CACHE_DIR, "search.sqlite"), max_bytes=int(SEARCH_CACHE_MAX_MB * 1024 * 1024)) if SEARCH_CACHE_ENABLED else None
+
+# identical searches running at the same time (e.g. stage 2 workers) share one request
+_in_flight = SingleFlight()
+
+
+def normalize_query(query: str) -> str:
+    """Lower case and collapse whitespace so trivially different queries share a cache entry"""
+    return re.sub(r"\s+", " ", query or "").strip().lower()
+
+
+def cached_search_page(provider: str, query: str, exact_term: str, page: int,
+                       fetch: Callable[[], Optional[List[Dict[str, str]]]]) -> List[Dict[str, str]]:
+    """
+    Return one page of search results, calling fetch() only on a cache miss
+
+    Args:
+        provider (str): search backend name, part of the cache key
+        query (str): search query
+        exact_term (str): exact term filter
+        page (int): result page number
+        fetch (callable): performs the API request, returns the result items or None on an API error
+
+    Returns:
+        list: result items ([] on error). Errors are never cached.
+    """
+    key = hash_key(provider, normalize_query(query), normalize_query(exact_term), page)
+
+    with span("search_page", provider=provider, cache="hit", outcome="ok") as trace:
+        def load():
+            if search_cache is not None:
+                cached = search_cache.get(key, max_age=SEARCH_CACHE_TTL_HOURS * 3600)
+                if cached is not None:
+                    return json.loads(cached)
+            trace.label(cache="miss")
+            with budget(SEARCH):
+                items = fetch()
+            if items is None:
+                trace.label(outcome="api_error")
+                return []
+            if search_cache is not None:
+                search_cache.set(key, json.dumps(items))
+            return items
+
+        items = _in_flight.do(key, load)
+        trace.set(items=len(items))
+        return items
+
+
+def fetch_pages(fetch: Callable[[int], List[Dict[str, str]]], pages: List[int], max_workers: int,
+                page_size: int = 10) -> List[Dict[str, str]]:
+    """
+    Fetch result pages and merge them in page order, stopping at the first page with no items.
+    The first page is requested on its own and the others only when it came back full
+    (page_size items), then concurrently; pages still queued after an empty page are cancelled.
+    """
+    if not pages:
+        return []
+    all_results = list(fetch(pages[0]))
+    if len(all_results) < page_size or len(pages) == 1:
+        return all_results
+    with ThreadPoolExecutor(max_workers=min(len(pages) - 1, max_workers)) as executor:
+        futures = [executor.submit(fetch, page) for page in pages[1:]]
+        for future in futures:
+            items = future.result()
+            if not items:
+                for pending in futures:
+                    pending.cancel()
+                break
+            all_results.extend(items)
+    return all_results
+
+
+def search_cache_stats() -> Dict[str, int]:
+    """Search cache counters for this process: hits, misses (paid API requests), coalesced, stores, evictions"""
+    stats = {"coalesced": _in_flight.stats["coalesced"]}
+    if search_cache is not None:
+        stats.update({k: search_cache.stats[k] for k in ("hits", "misses", "stores", "evictions")})
+    return stats
@@ -0,0 +1,225 @@
+# utils/send_queue.py
+import os
+import time
+import socket
+import sqlite3
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List
+from dotenv import load_dotenv
+from utils.disk_cache import hash_key
+
+# durable outbox of emails to send and what happened to each. configure it from .env
+load_dotenv()
+SEND_QUEUE_PATH = os.getenv("SEND_QUEUE_PATH", os.path.join("outbox", "send_queue.sqlite"))
+SEND_QUEUE_STALE_MINUTES = float(os.getenv("SEND_QUEUE_STALE_MINUTES", "15"))  # -----------> 'sending' this long = crashed run
+
+# message states: pending -> sending -> sent | dead (permanent failure), or back to pending to retry later
+PENDING, SENDING, SENT, DEAD = "pending", "sending", "sent", "dead"
+
+
+def message_key(sender: str, recipient: str, subject: str, body: str) -> str:
+    """Idempotency key: the same content from one account to the same address is only ever sent once"""
+    return hash_key(sender.strip().lower(), recipient.strip().lower(), subject, body)
+
+
+def _legacy_message_key(recipient: str, subject: str, body: str) -> str:
+    """Key of rows queued before the sender was part of it"""
+    return hash_key(recipient.strip().lower(), subject, body)
+
+
+def claimer_id(worker: str) -> str:
+    """What claim() records in claimed_by: host, process id and worker name"""
+    return f"{socket.gethostname()}:{os.getpid()}:{worker}"
+
+
+def _claimer_gone(claimed_by: str) -> bool:
+    """The process that claimed a message ran on this host and has exited"""
+    host, _, rest = claimed_by.partition(":")
+    pid = rest.partition(":")[0]
+    # os.kill(pid, 0) only probes on posix, on Windows it would terminate the process
+    if os.name != "posix" or host != socket.gethostname() or not pid.isdigit() or int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False
+    return False
+
+
+class SendQueue:
+    """
+    Persistent send queue on SQLite. Every message is keyed by message_key, so loading the
+    same composed emails again only adds what is new, and delivered messages are skipped with a
+    primary key lookup. Workers claim batches of pending messages of a campaign and report the
+    outcome; every state change is also appended to the events table.
+    """
+    def __init__(self, path: str = SEND_QUEUE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                key TEXT PRIMARY KEY,
+                campaign TEXT NOT NULL,
+                sender TEXT NOT NULL,
+                recipient TEXT NOT NULL,
+                company TEXT NOT NULL DEFAULT '',
+                email TEXT NOT NULL DEFAULT '',
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT NOT NULL DEFAULT '',
+                claimed_by TEXT NOT NULL DEFAULT '',
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS messages_campaign_state ON messages(campaign, state)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS messages_sender_state ON messages(sender COLLATE NOCASE, state)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS events (
+                key TEXT NOT NULL,
+                state TEXT NOT NULL,
+                error TEXT NOT NULL DEFAULT '',
+                at REAL NOT NULL
+            )""")
+
+    def _transaction(self, fn):
+        """Run fn() in one write transaction (lock held)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _log(self, keys: List[str], state: str, error: str = "", now: float = None):
+        now = now or time.time()
+        self._conn.executemany("INSERT INTO events (key, state, error, at) VALUES (?, ?, ?, ?)",
+                               [(key, state, error, now) for key in keys])
+
+    def enqueue_many(self, campaign: str, sender: str, messages: Iterable[Dict[str, str]]) -> Dict[str, int]:
+        """
+        Add messages (dicts with recipient, subject, body and optionally company, email) in one
+        transaction. Known messages keep their state; pending ones move to this campaign.
+        Returns how many were new and how many were already known per state.
+        """
+        def enqueue():
+            now = time.time()
+            counts = Counter()
+            added = []
+            for m in messages:
+                key = message_key(sender, m["recipient"], m["subject"], m["body"])
+                row = self._conn.execute("SELECT state FROM messages WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    row = self._rekey_legacy(key, sender, m)
+                if row is None:
+                    self._conn.execute(
+                        "INSERT INTO messages (key, campaign, sender, recipient, company, email, subject, body, state,"
+                        " created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, campaign, sender, m["recipient"], m.get("company", ""), m.get("email", ""),
+                         m["subject"], m["body"], PENDING, now, now))
+                    added.append(key)
+                    counts["new"] += 1
+                else:
+                    if row["state"] == PENDING:
+                        self._conn.execute("UPDATE messages SET campaign = ?, sender = ? WHERE key = ?", (campaign, sender, key))
+                    counts[row["state"]] += 1
+            self._log(added, PENDING, now=now)
+            return dict(counts)
+
+        return self._transaction(enqueue)
+
+    def _rekey_legacy(self, key: str, sender: str, m: Dict[str, str]):
+        """Move a row queued under the old key (without the sender) by the same sender to key (transaction held)"""
+        legacy = _legacy_message_key(m["recipient"], m["subject"], m["body"])
+        row = self._conn.execute("SELECT state FROM messages WHERE key = ? AND sender = ? COLLATE NOCASE",
+                                 (legacy, sender.strip())).fetchone()
+        if row is not None:
+            self._conn.execute("UPDATE messages SET key = ? WHERE key = ?", (key, legacy))
+            self._conn.execute("UPDATE events SET key = ? WHERE key = ?", (key, legacy))
+        return row
+
+    def recover_stale(self, campaign: str, older_than: float = SEND_QUEUE_STALE_MINUTES * 60) -> int:
+        """
+        Put messages left in 'sending' by a crashed run back to pending: those claimed by a process of
+        this host that no longer runs, and any claimed longer than older_than ago. Such a message may
+        or may not have gone out, so this is at-least-once for that handful of messages.
+        """
+        def recover():
+            now = time.time()
+            keys = [row["key"] for row in self._conn.execute(
+                "SELECT key, claimed_by, updated_at FROM messages WHERE campaign = ? AND state = ?", (campaign, SENDING))
+                if row["updated_at"] < now - older_than or _claimer_gone(row["claimed_by"])]
+            self._conn.executemany("UPDATE messages SET state = ?, claimed_by = '', updated_at = ? WHERE key = ?",
+                                   [(PENDING, now, key) for key in keys])
+            self._log(keys, PENDING, "recovered after crash", now)
+            return len(keys)
+
+        return self._transaction(recover)
+
+    def claim(self, campaign: str, worker: str, batch_size: int = 10) -> List[Dict]:
+        """Atomically move up to batch_size pending messages of the campaign to 'sending' for this worker"""
+        claimed_by = claimer_id(worker)
+
+        def claim_batch():
+            now = time.time()
+            rows = [dict(row) for row in self._conn.execute(
+                "SELECT key, recipient, company, email, subject, body, attempts FROM messages"
+                " WHERE campaign = ? AND state = ? ORDER BY created_at, rowid LIMIT ?",
+                (campaign, PENDING, batch_size))]
+            self._conn.executemany(
+                "UPDATE messages SET state = ?, claimed_by = ?, attempts = attempts + 1, updated_at = ? WHERE key = ?",
+                [(SENDING, claimed_by, now, row["key"]) for row in rows])
+            self._log([row["key"] for row in rows], SENDING, now=now)
+            return rows
+
+        return self._transaction(claim_batch)
+
+    def _set_state(self, key: str, state: str, error: str = ""):
+        def update():
+            now = time.time()
+            self._conn.execute("UPDATE messages SET state = ?, last_error = ?, claimed_by = '', updated_at = ? WHERE key = ?",
+                               (state, error, now, key))
+            self._log([key], state, error, now)
+
+        self._transaction(update)
+
+    def mark_sent(self, key: str):
+        self._set_state(key, SENT)
+
+    def mark_dead(self, key: str, error: str):
+        """Permanent failure, never retried"""
+        self._set_state(key, DEAD, error)
+
+    def release(self, key: str, reason: str = ""):
+        """Give a claimed message back, it is sent by a later run"""
+        self._set_state(key, PENDING, reason)
+
+    def sent_since(self, sender: str, since: float) -> int:
+        """Messages the sender account delivered since the given time, over all campaigns"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE sender = ? COLLATE NOCASE AND state = ? AND updated_at >= ?",
+                (sender.strip(), SENT, since)).fetchone()[0]
+
+    def counts(self, campaign: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) AS n FROM messages WHERE campaign = ? GROUP BY state",
+                                      (campaign,)).fetchall()
+        return {row["state"]: row["n"] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,155 @@
+# utils/send_scheduler.py
+import os
+import re
+import csv
+import time
+import random
+import smtplib
+import threading
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from utils.rate_limit import TokenBucket
+
+# send limits per sender account. configure it from .env
+load_dotenv()
+SMTP_RATE_PER_MINUTE = float(os.getenv("SMTP_RATE_PER_MINUTE", "20"))  # -----------> 0 means unlimited
+SMTP_RATE_PER_DAY = float(os.getenv("SMTP_RATE_PER_DAY", "500"))  # -----------> gmail allows 500 a day for regular accounts
+SMTP_MAX_RETRIES = int(os.getenv("SMTP_MAX_RETRIES", "4"))
+SMTP_BACKOFF_SECONDS = float(os.getenv("SMTP_BACKOFF_SECONDS", "2"))
+SMTP_BACKOFF_MAX_SECONDS = float(os.getenv("SMTP_BACKOFF_MAX_SECONDS", "120"))
+
+
+class DailyLimitReached(Exception):
+    """The sender account has used up its daily sending quota"""
+
+
+class AccountRateLimiter:
+    """
+    Per-minute and per-day token buckets for one sender account. Sends are spaced out to stay
+    under the per-minute rate; once the daily quota is used up acquire() raises DailyLimitReached
+    instead of blocking until tomorrow. sent_last_day (emails the account sent in the last 24 hours,
+    from the send queue) is taken off the daily quota, so a new process does not start with a full day.
+    """
+    def __init__(self, per_minute: float = SMTP_RATE_PER_MINUTE, per_day: float = SMTP_RATE_PER_DAY,
+                 sent_last_day: int = 0):
+        self.minute = TokenBucket(rate=per_minute / 60, capacity=max(1.0, per_minute / 6)) if per_minute > 0 else None
+        self.day = TokenBucket(rate=per_day / 86400, capacity=per_day, tokens=per_day - sent_last_day) if per_day > 0 else None
+
+    def acquire(self):
+        if self.day is not None and self.day.try_acquire() > 0:
+            raise DailyLimitReached("daily send limit reached for this account")
+        if self.minute is not None:
+            self.minute.acquire()
+
+
+_account_limiters: Dict[str, AccountRateLimiter] = {}
+_account_lock = threading.Lock()
+
+
+def get_account_limiter(account: str, sent_last_day: int = 0) -> AccountRateLimiter:
+    """
+    Shared rate limiter for a sender account, so parallel sends from one account share its quota.
+    sent_last_day only seeds the limiter the first time it is created in this process; after that
+    it counts the sends itself.
+    """
+    with _account_lock:
+        key = account.strip().lower()
+        if key not in _account_limiters:
+            _account_limiters[key] = AccountRateLimiter(sent_last_day=sent_last_day)
+        return _account_limiters[key]
+
+
+def smtp_error_code(error: Exception) -> Optional[int]:
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code
+    if isinstance(error, smtplib.SMTPRecipientsRefused) and error.recipients:
+        return max(code for code, _ in error.recipients.values())
+    return None
+
+
+def is_transient(error: Exception) -> bool:
+    """4xx replies and dropped connections are worth retrying, 5xx replies are permanent"""
+    code = smtp_error_code(error)
+    if code is not None:
+        return 400 <= code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError))
+
+
+# enhanced status codes (RFC 3463) about the sending account rather than the message: 5.4.5 is a used up
+# sending quota (gmail: "550 5.4.5 Daily user sending limit exceeded")
+ACCOUNT_STATUS_RE = re.compile(r"\b5\.4\.5\b")
+
+
+def is_account_failure(error: Exception) -> bool:
+    """Login failures, a refused sender (MAIL FROM, e.g. 5.7.x policy) and quota replies stop the whole run"""
+    if isinstance(error, (smtplib.SMTPAuthenticationError, smtplib.SMTPSenderRefused)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        reply = error.smtp_error.decode("utf-8", "replace") if isinstance(error.smtp_error, bytes) else str(error.smtp_error)
+        return bool(ACCOUNT_STATUS_RE.search(reply))
+    return False
+
+
+def is_permanent_failure(error: Exception) -> bool:
+    """A 5xx reply about this message (bad recipient, rejected content), not about the account"""
+    code = smtp_error_code(error)
+    return code is not None and code >= 500 and not is_account_failure(error)
+
+
+class SendScheduler:
+    """
+    Sends messages through an SMTPConnectionPool within the account's rate limits, retrying
+    transient failures with exponential backoff and jitter.
+    """
+    def __init__(self, pool, limiter: Optional[AccountRateLimiter] = None, max_retries: int = SMTP_MAX_RETRIES,
+                 backoff: float = SMTP_BACKOFF_SECONDS, max_backoff: float = SMTP_BACKOFF_MAX_SECONDS):
+        self.pool = pool
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def send(self, msg):
+        """Send one message. Raises the last error once retries are used up or on a permanent failure."""
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                self.pool.send(msg)
+                return
+            except Exception as e:
+                if not is_transient(e) or attempt >= self.max_retries:
+                    raise
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+                attempt += 1
+                print(f"⏳ Temporary failure sending to {msg['To']} ({e}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+
+class FailedEmailsCSV:
+    """Thread-safe '|' delimited CSV of rows that were not sent, with the reason in an Error column"""
+    def __init__(self, path: str, fieldnames: List[str]):
+        self.path = path
+        self.fieldnames = list(fieldnames) + ['Error']
+        self.count = 0
+        self._file = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def write(self, row: Dict[str, str], error: str):
+        with self._lock:
+            if self._file is None:
+                # created on first failure so a clean run leaves no empty file behind, appended to by later runs
+                is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+                self._file = open(self.path, 'a', newline='', encoding='utf-8')
+                self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, delimiter='|', extrasaction='ignore')
+                if is_new:
+                    self._writer.writeheader()
+            self._writer.writerow({**row, 'Error': error})
+            self._file.flush()
+            self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
@@ -1,48 +1,79 @@
 import os
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Optional
 from dotenv import load_dotenv
+from utils.search_cache import cached_search_page, fetch_pages
 
 class WebSearch:
-    def __init__(self, serper_api_key: str):
+    def __init__(self, serper_api_key: str, max_workers: int = 10):
         self.serper_api_key = serper_api_key
         self.api_url = "https://google.serper.dev/search"
+        # keep-alive connection pool shared by all page requests (and stage 2 workers)
+        self.max_workers = max_workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def run(self, query: str, exact_term: str = "", start_page: int = 1, end_page: int = 1) -> list:
+        """
+        Fetch result pages start_page..end_page over a pooled session, see fetch_pages: the
+        other pages are only requested (concurrently) when the first one comes back full.
+        """
+        fetch = lambda page: cached_search_page("serper", query, exact_term, page,
+                                                lambda: self._fetch_page(query, exact_term, page))
+        return fetch_pages(fetch, list(range(start_page, end_page + 1)), self.max_workers)
+
+    def _fetch_page(self, query: str, exact_term: str, page: int) -> Optional[list]:
+        """Request a single result page from the API. Returns None on an API error."""
         headers = {
             "X-API-KEY": self.serper_api_key,
             "Content-Type": "application/json"
         }
-        all_results = []
-        for page in range(start_page, end_page + 1):
-            search_query = f'{query} in {exact_term}' if exact_term else query
-            payload = {
-                "q": search_query,
-                "page": page
-            }
-            response = requests.post(self.api_url, headers=headers, json=payload)
-            data = response.json()
-
-            if "error" in data:
-                print(f"Error in Serper API: {data['error']}")
-                continue
-
-            for item in data.get("organic", []):
-                all_results.append({
-                    "title": item.get("title", ""),
-                    "snippet": item.get("snippet", ""),
-                    "url": item.get("link", "")
-                })
-
-        return all_results
-
-# Load Serper API key
+        search_query = f'{query} in {exact_term}' if exact_term else query
+        payload = {
+            "q": search_query,
+            "page": page
+        }
+        response = self.session.post(self.api_url, headers=headers, json=payload, timeout=10)
+        data = response.json()
+
+        if "error" in data:
+            print(f"Error in Serper API: {data['error']}")
+            return None
+
+        return [{
+            "title": item.get("title", ""),
+            "snippet": item.get("snippet", ""),
+            "url": item.get("link", "")
+        } for item in data.get("organic", [])]
+
+# Load Serper API key (the client is created on first use, not at import)
 load_dotenv()
-serper_api_key = os.getenv("SERPER_API_KEY")
-web_search = WebSearch(serper_api_key=serper_api_key)
+_web_search = None
+_web_search_lock = threading.Lock()
+
+
+def get_web_search() -> WebSearch:
+    """Shared search client configured from .env"""
+    global _web_search
+    with _web_search_lock:
+        if _web_search is None:
+            _web_search = WebSearch(serper_api_key=os.getenv("SERPER_API_KEY"))
+        return _web_search
+
+
+def __getattr__(name):
+    # keeps `from utils.serper_web_search import web_search` working
+    if name == "web_search":
+        return get_web_search()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Test
 if __name__ == "__main__":
-    results = web_search.run(query="best construction company", exact_term="hyderabad", start_page=1, end_page=1)
+    results = get_web_search().run(query="best construction company", exact_term="hyderabad", start_page=1, end_page=1)
     from pprint import pprint
     pprint(results)
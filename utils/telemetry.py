@@ -0,0 +1,284 @@
+# utils/telemetry.py
+import os
+import json
+import time
+import atexit
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# spans and metrics of the pipeline, off unless enabled. configure it from .env
+load_dotenv()
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "false").lower() == "true"
+TELEMETRY_JSONL_PATH = os.getenv("TELEMETRY_JSONL_PATH", "")  # -----------> one JSON line per span, empty = no span log
+TELEMETRY_PROMETHEUS_PORT = int(os.getenv("TELEMETRY_PROMETHEUS_PORT", "0"))  # -----------> serves /metrics on this port, 0 = off
+TELEMETRY_METRICS_PATH = os.getenv("TELEMETRY_METRICS_PATH", "")  # -----------> Prometheus text file written at exit, empty = off
+
+METRIC_PREFIX = "coldmailer_"
+
+# histogram buckets by the unit at the end of the metric name
+BUCKETS = {
+    "seconds": (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+    "bytes": (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000, 10_000_000),
+    "chars": (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000, 10_000_000),
+    "tokens": (100, 250, 500, 1_000, 2_000, 4_000, 8_000, 16_000, 32_000),
+    "items": (0, 1, 2, 5, 10, 20, 50, 100, 500),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _buckets_for(name: str) -> Tuple[float, ...]:
+    for unit, buckets in BUCKETS.items():
+        if name.endswith(unit) or name.endswith(unit + "_in") or name.endswith(unit + "_out"):
+            return buckets
+    return BUCKETS["tokens"] if "tokens" in name else BUCKETS["items"]
+
+
+def _escape(value: str) -> str:
+    """Label value escaping of the Prometheus text format"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """Thread-safe in-memory counters and histograms, rendered in the Prometheus text format"""
+    def __init__(self):
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], List] = {}  # -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, labels: Labels = ()):
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Labels = ()):
+        buckets = _buckets_for(name)
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = [[0] * len(buckets), 0.0, 0]
+            index = bisect.bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _labels(labels: Labels, extra: str = "") -> str:
+        parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, [list(h[0]), h[1], h[2]]) for key, h in self._histograms.items())
+        lines, typed = [], set()
+        for (name, labels), value in counters:
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{self._labels(labels)} {value:g}")
+        for (name, labels), (counts, total, count) in histograms:
+            metric = METRIC_PREFIX + name
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(_buckets_for(name), counts):
+                cumulative += bucket_count
+                bucket_labels = self._labels(labels, 'le="%g"' % bound)
+                lines.append(f"{metric}_bucket{bucket_labels} {cumulative}")
+            bucket_labels = self._labels(labels, 'le="+Inf"')
+            lines.append(f"{metric}_bucket{bucket_labels} {count}")
+            lines.append(f"{metric}_sum{self._labels(labels)} {total:g}")
+            lines.append(f"{metric}_count{self._labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+_enabled = False
+_local = threading.local()
+_jsonl_file = None
+_jsonl_lock = threading.Lock()
+_server: Optional[ThreadingHTTPServer] = None
+_exit_metrics_path = ""  # written at exit, see configure()
+_exit_hook_registered = False
+
+
+class Span:
+    """
+    One timed operation. Labels (low cardinality strings: stage, provider, cache...) become metric labels,
+    numeric values set with set() (bytes, items, tokens) are observed as <name>_<value> histograms.
+    """
+    __slots__ = ("name", "labels", "values", "trace_id", "span_id", "parent_id", "_start", "_wall_start")
+
+    def __init__(self, name: str, labels: Dict[str, str]):
+        self.name = name
+        self.labels = labels
+        self.values: Dict[str, object] = {}
+
+    def set(self, **values):
+        self.values.update(values)
+
+    def label(self, **labels):
+        self.labels.update(labels)
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        parent = stack[-1] if stack else None
+        self.trace_id = parent.trace_id if parent else os.urandom(8).hex()
+        self.span_id = os.urandom(4).hex()
+        self.parent_id = parent.span_id if parent else None
+        stack.append(self)
+        self._wall_start = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        stack = _local.stack
+        # a span held by a generator can end after spans opened later on the same thread
+        if stack and stack[-1] is self:
+            stack.pop()
+        elif self in stack:
+            stack.remove(self)
+        labels = tuple(sorted((key, str(value)) for key, value in self.labels.items()))
+        metrics.observe(f"{self.name}_seconds", duration, labels)
+        if exc_type is not None:
+            metrics.inc(f"{self.name}_errors_total", labels=labels)
+        for key, value in self.values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                metrics.observe(f"{self.name}_{key}", value, labels)
+        if _jsonl_file is not None:
+            _write_span({"trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+                         "name": self.name, "start": self._wall_start, "duration_s": round(duration, 6),
+                         "labels": self.labels, "values": self.values,
+                         "error": f"{exc_type.__name__}: {exc}" if exc_type is not None else None,
+                         "pid": os.getpid(), "thread": threading.current_thread().name})
+        return False
+
+
+class _NoopSpan:
+    """What span() returns while telemetry is disabled: no clock reads, ids or metric updates"""
+    __slots__ = ()
+
+    def set(self, **values):
+        pass
+
+    def label(self, **labels):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **labels):
+    """with span("fetch") as s: ... s.set(bytes=len(html)). A shared no-op object while telemetry is disabled."""
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, labels)
+
+
+def count(name: str, value: float = 1, **labels):
+    """Add value to the counter <name>_total"""
+    if _enabled:
+        metrics.inc(f"{name}_total", value, tuple(sorted((key, str(v)) for key, v in labels.items())))
+
+
+def _write_span(record: Dict):
+    line = json.dumps(record, default=str) + "\n"
+    with _jsonl_lock:
+        if _jsonl_file is not None:
+            _jsonl_file.write(line)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics in the Prometheus text format on a daemon thread (once per process)"""
+    global _server
+    if _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        # e.g. another process of a batch run already serves the port
+        print(f"⚠️ Telemetry: cannot serve metrics on port {port}: {e}")
+        return None
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"📈 Telemetry: metrics on http://{host}:{port}/metrics")
+    return _server
+
+
+def write_metrics(path: str):
+    """Write the current metrics in the Prometheus text format, e.g. for the node exporter textfile collector"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(metrics.prometheus_text())
+
+
+def configure(enabled: bool = TELEMETRY_ENABLED, jsonl_path: str = TELEMETRY_JSONL_PATH,
+              prometheus_port: int = TELEMETRY_PROMETHEUS_PORT, metrics_path: str = TELEMETRY_METRICS_PATH):
+    """Turn telemetry on or off and choose the exports. Called at import with the .env settings."""
+    global _enabled, _jsonl_file, _exit_metrics_path, _exit_hook_registered
+    with _jsonl_lock:
+        if _jsonl_file is not None:
+            _jsonl_file.close()
+            _jsonl_file = None
+        if enabled and jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+            # line buffered appends, several processes can share the file
+            _jsonl_file = open(jsonl_path, "a", encoding="utf-8", buffering=1)
+    _enabled = enabled
+    if enabled and prometheus_port:
+        start_metrics_server(prometheus_port)
+    _exit_metrics_path = metrics_path if enabled else ""
+    if _exit_metrics_path and not _exit_hook_registered:
+        atexit.register(_write_metrics_at_exit)
+        _exit_hook_registered = True
+
+
+def _write_metrics_at_exit():
+    if _exit_metrics_path:
+        write_metrics(_exit_metrics_path)
+
+
+configure()
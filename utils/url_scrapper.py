@@ -1,7 +1,35 @@
 # utils/url_scrapper.py
-from bs4 import BeautifulSoup
+import os
+import json
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.element import PreformattedString
 import html2text
 import requests
+from dotenv import load_dotenv
+from utils.disk_cache import DiskCache, hash_key
+from utils.telemetry import span
+
+# on-disk page cache shared by every run/campaign. configure it from .env
+load_dotenv()
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "true").lower() == "true"
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", ".cache")
+PAGE_CACHE_TTL_HOURS = float(os.getenv("PAGE_CACHE_TTL_HOURS", "24"))  # -----------> pages younger than this are served without any request
+PAGE_CACHE_MAX_MB = float(os.getenv("PAGE_CACHE_MAX_MB", "500"))  # -----------> least recently used pages are evicted above this size
+page_cache = DiskCache(os.path.join(PAGE_CACHE_DIR, "pages.sqlite"), max_bytes=int(PAGE_CACHE_MAX_MB * 1024 * 1024)) if PAGE_CACHE_ENABLED else None
+
+# lxml is optional: it parses several times faster than the pure python html.parser
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# -----------> html parser backend: "lxml" or "html.parser"
+HTML_PARSER = os.getenv("HTML_PARSER", "lxml" if lxml is not None else "html.parser")
+
+# elements dropped before conversion
+UNWANTED_TAGS = ['script', 'style', 'iframe', 'nav', 'footer']
+
 def clean_content( soup):
     """
     Clean HTML content by removing unwanted elements
@@ -13,57 +41,220 @@ def clean_content( soup):
         BeautifulSoup: Cleaned HTML
     """
     # Remove script and style elements
-    for element in soup(['script', 'style', 'iframe', 'nav', 'footer']):
+    for element in soup(UNWANTED_TAGS):
         element.decompose()
     return soup
 
-def html_to_markdown(html_content):
+def _soup_events(soup):
     """
-    Convert HTML content to markdown
+    Walk a (cleaned) BeautifulSoup tree and yield parser events
     
     Args:
-        html_content (str): HTML content
+        soup (BeautifulSoup): Parsed HTML
+        
+    Yields:
+        tuple: ("start", tag, attrs), ("data", text) or ("end", tag)
+    """
+    stack = [(None, iter(soup.contents))]
+    while stack:
+        name, children = stack[-1]
+        node = next(children, None)
+        if node is None:
+            stack.pop()
+            if name is not None:
+                yield "end", name, None
+            continue
+        if isinstance(node, Tag):
+            attrs = [(k, " ".join(v) if isinstance(v, list) else v) for k, v in node.attrs.items()]
+            yield "start", node.name, attrs
+            stack.append((node.name, iter(node.contents)))
+        elif isinstance(node, NavigableString) and not isinstance(node, PreformattedString):
+            # PreformattedString covers comments, doctype, CDATA and processing instructions
+            yield "data", str(node), None
+
+def _lxml_events(root):
+    """
+    Walk a (cleaned) lxml tree and yield parser events
+    
+    Args:
+        root (lxml.html.HtmlElement): Parsed HTML
+        
+    Yields:
+        tuple: ("start", tag, attrs), ("data", text) or ("end", tag)
+    """
+    for event, element in lxml.etree.iterwalk(root, events=("start", "end", "comment", "pi")):
+        if event in ("comment", "pi"):
+            # only the text after them is content
+            if element.tail:
+                yield "data", element.tail, None
+            continue
+        if event == "start":
+            yield "start", element.tag, list(element.attrib.items())
+            if element.text:
+                yield "data", element.text, None
+        else:
+            yield "end", element.tag, None
+            if element.tail and element is not root:
+                yield "data", element.tail, None
+
+def _events_to_markdown(events):
+    """
+    Feed parser events straight into html2text, skipping the serialize/re-parse round trip
+    
+    Args:
+        events (iterable): events from _soup_events or _lxml_events
         
     Returns:
         str: Markdown content
     """
-    # Parse HTML
-    soup = BeautifulSoup(html_content, 'html.parser')
+    converter = html2text.HTML2Text()
+    converter.start = True
+    for kind, value, attrs in events:
+        if kind == "start":
+            converter.handle_starttag(value, attrs)
+        elif kind == "end":
+            converter.handle_endtag(value)
+        else:
+            converter.handle_data(value)
+    markdown = converter.optwrap(converter.finish())
+    if converter.pad_tables:
+        markdown = html2text.utils.pad_tables_in_text(markdown)
+    return markdown
+
+def _parse_lxml(html_content):
+    try:
+        return lxml.html.document_fromstring(html_content)
+    except ValueError:
+        # str input with an <?xml encoding=...?> declaration
+        return lxml.html.document_fromstring(html_content.encode("utf-8"))
+
+def html_to_markdown(html_content, parser=None):
+    """
+    Convert HTML content to markdown
     
-    # Extract title
-    title = soup.title.string if soup.title else "No Title"
+    The page is parsed once, pruned in place and the pruned tree is converted directly.
     
-    # Clean content
-    cleaned_soup = clean_content(soup)
+    Args:
+        html_content (str): HTML content
+        parser (str): "lxml" or "html.parser", defaults to HTML_PARSER
+        
+    Returns:
+        str: Markdown content
+    """
+    parser = parser or HTML_PARSER
+    with span("html_to_markdown", parser=parser) as trace:
+        markdown = _html_to_markdown(html_content, parser)
+        trace.set(chars_in=len(html_content), chars_out=len(markdown))
+        return markdown
+
+def _html_to_markdown(html_content, parser):
     
-    # Convert to markdown
-    markdown = html2text.HTML2Text().handle(str(cleaned_soup))
+    if parser == "lxml" and lxml is not None:
+        try:
+            root = _parse_lxml(html_content)
+        except lxml.etree.ParserError:
+            # e.g. empty documents, let the forgiving parser deal with them
+            return _html_to_markdown(html_content, "html.parser")
+        
+        # Extract title
+        title_element = root.find(".//title")
+        title = title_element.text if title_element is not None else "No Title"
+        
+        # Clean content
+        for element in list(root.iter(*UNWANTED_TAGS)):
+            element.drop_tree()
+        
+        # Convert to markdown
+        markdown = _events_to_markdown(_lxml_events(root))
+    else:
+        # Parse HTML
+        soup = BeautifulSoup(html_content, 'html.parser')
+        
+        # Extract title
+        title = soup.title.string if soup.title else "No Title"
+        
+        # Clean content
+        cleaned_soup = clean_content(soup)
+        
+        # Convert to markdown
+        markdown = _events_to_markdown(_soup_events(cleaned_soup))
     
     # Add title as heading
     markdown = f"# {title}\n\n{markdown}"
     
     return markdown
 
-def scrape_page(url):
+def page_cache_stats():
     """
-    Scrape a single page and convert to markdown
+    Page cache counters for this process
+    
+    Returns:
+        dict: hits (served from disk), revalidated (304 from a conditional GET), stale (old copy
+              served because revalidation failed), misses (full download), stores, evictions
+    """
+    if page_cache is None:
+        return {}
+    return {k: page_cache.stats[k] for k in ("hits", "revalidated", "stale", "misses", "stores", "evictions")}
+
+def fetch_html(url):
+    """
+    Fetch a single page and return its raw HTML
+    
+    Pages are served from the on-disk cache while younger than PAGE_CACHE_TTL_HOURS. Older
+    entries are revalidated with a conditional GET (ETag / Last-Modified), so an unchanged
+    page costs a 304 instead of a full download. When revalidation fails (network error or a
+    5xx/429 reply) the stale copy is served.
     
     Args:
-        url (str): URL to scrape
+        url (str): URL to fetch
         
     Returns:
-        tuple: (markdown_content, links) - the markdown content and extracted links
+        str: raw HTML, or None if the page could not be fetched or is not HTML
     """
+    with span("fetch") as trace:
+        return _fetch_html(url, trace)
+
+def _fetch_html(url, trace):
+    key = hash_key(url)
+    cached = None
+    if page_cache is not None:
+        entry = page_cache.get_entry(key)
+        if entry is not None:
+            cached = json.loads(entry[0])
+            if entry[1] <= PAGE_CACHE_TTL_HOURS * 3600:
+                page_cache.stats["hits"] += 1
+                trace.label(cache="hit", outcome="ok")
+                print(f"Scraping (cached): {url}")
+                return cached["html"]
     
     try:
-        # Fetch page content
+        # Fetch page content, conditionally if we hold a stale copy
         print(f"Scraping: {url}")
-        response = requests.Session().get(url, timeout=10)
+        headers = {}
+        if cached is not None:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        response = requests.Session().get(url, headers=headers, timeout=10)
+        trace.set(bytes=len(response.content))
+        
+        if response.status_code == 304 and cached is not None:
+            page_cache.stats["revalidated"] += 1
+            page_cache.touch(key)
+            trace.label(cache="revalidated", outcome="ok")
+            return cached["html"]
+        if cached is not None and (response.status_code >= 500 or response.status_code == 429):
+            return _serve_stale(url, cached, trace, f"HTTP status code {response.status_code}")
+        if page_cache is not None:
+            page_cache.stats["misses"] += 1
+        trace.label(cache="miss" if page_cache is not None else "off")
         
         # Check status code
         if response.status_code != 200:
             print(f"Error scraping {url}: HTTP status code {response.status_code}")
-            return None, []
+            trace.label(outcome="http_error")
+            return None
             
         # Some sites may not properly set content-type header
         content_type = response.headers.get('Content-Type', '').lower()
@@ -71,20 +262,59 @@ def scrape_page(url):
         # Try to detect if content is HTML, even if content-type isn't set correctly
         if 'text/html' not in content_type and '<html' not in response.text.lower()[:1000]:
             print(f"Skipping {url} - content doesn't appear to be HTML (Content-Type: {content_type})")
-            return None, []
-            
-        # Convert to markdown
-        markdown_content = html_to_markdown(response.text)
+            trace.label(outcome="not_html")
+            return None
         
-        # Extract links for further crawling
-        soup = BeautifulSoup(response.text, 'html.parser')
-        # links = extract_links(soup, url)
+        if page_cache is not None:
+            page_cache.set(key, json.dumps({
+                "url": url,
+                "html": response.text,
+                "etag": response.headers.get("ETag", ""),
+                "last_modified": response.headers.get("Last-Modified", ""),
+            }))
         
-        return markdown_content
+        trace.label(outcome="ok")
+        return response.text
         
     except requests.exceptions.RequestException as e:
+        if cached is not None:
+            return _serve_stale(url, cached, trace, e)
         print(f"Request error for {url}: {e}")
+        trace.label(outcome="request_error")
+        return None
+    except Exception as e:
+        print(f"Error fetching {url}: {e}")
+        trace.label(outcome="error")
+        return None
+
+def _serve_stale(url, cached, trace, error):
+    """A stale page beats no page: the site being down for a moment does not lose its companies"""
+    print(f"Revalidation failed for {url} ({error}), using the cached copy")
+    page_cache.stats["stale"] += 1
+    trace.label(cache="stale", outcome="ok")
+    return cached["html"]
+
+def scrape_page(url):
+    """
+    Scrape a single page and convert to markdown
+    
+    Args:
+        url (str): URL to scrape
+        
+    Returns:
+        tuple: (markdown_content, links) - the markdown content and extracted links
+    """
+    
+    html_content = fetch_html(url)
+    if html_content is None:
         return None, []
+    
+    try:
+        # Convert to markdown
+        markdown_content = html_to_markdown(html_content)
+        
+        return markdown_content
+        
     except Exception as e:
         print(f"Error processing {url}: {e}")
-        return None, []
\ No newline at end of file
+        return None, []